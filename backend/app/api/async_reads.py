@@ -0,0 +1,157 @@
+"""
+async def versions of the hot read endpoints, mounted ahead of the sync ones
+when settings.ASYNC_DB is on. Paths, parameters and responses are the same,
+so both stacks can be benchmarked against identical load.
+"""
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+
+from app.api.chapters import _accepts_gzip, _list_not_modified, chapter_fields
+from app.api.conditional import make_etag, not_modified
+from app.api.merge_requests import merge_request_fields
+from app.api.novels import NOVEL_SORT_DESCRIPTION, NovelSort, novel_fields
+from app.api.search import _KINDS
+from app.core.compression import gzip_json_with_content
+from app.core.database import get_async_db
+from app.crud import aio
+from app.models.merge_request import MergeStatus
+from app.schemas.chapter import ChapterResponse, ChapterSummary
+from app.schemas.merge_request import MergeRequestSummary
+from app.schemas.novel import Novel, NovelSummary
+from app.schemas.pagination import Page
+from app.schemas.search import SearchResult
+
+router = APIRouter()
+
+
+@router.get("/novels", response_model=Page[NovelSummary], response_model_exclude_unset=True)
+async def read_novels_async(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    fields: List[str] = Depends(novel_fields),
+    sort: NovelSort = Query("created_at", description=NOVEL_SORT_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
+    novels, next_cursor = await aio.get_novels(db, cursor=cursor, limit=limit, fields=fields, sort=sort)
+    return Page(items=novels, next_cursor=next_cursor)
+
+
+@router.get("/novels/{novel_id}", response_model=Novel)
+async def read_novel_async(
+    novel_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = await aio.get_novel_version(db, novel_id=novel_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Novel not found")
+    cached = not_modified(request, response, make_etag("novel", novel_id, version.updated_at), version.updated_at)
+    if cached:
+        return cached
+
+    # The body is at least as new as the ETag above, even if this worker's cache is not yet invalidated
+    novel = await aio.get_novel(db, novel_id=novel_id, version=version.updated_at)
+    if not novel:
+        raise HTTPException(status_code=404, detail="Novel not found")
+    return novel
+
+
+@router.get("/novels/{novel_id}/chapters", response_model=Page[ChapterSummary], response_model_exclude_unset=True)
+async def read_novel_chapters_async(
+    novel_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    fields: List[str] = Depends(chapter_fields),
+    db: AsyncSession = Depends(get_async_db)
+):
+    cached = _list_not_modified(request, response, await aio.get_novel_chapters_version(db, novel_id))
+    if cached:
+        return cached
+    chapters, next_cursor = await aio.get_chapters_by_novel(
+        db, novel_id=novel_id, cursor=cursor, limit=limit, fields=fields
+    )
+    return Page(items=chapters, next_cursor=next_cursor)
+
+
+@router.get("/novels/{novel_id}/chapters/main", response_model=List[ChapterSummary], response_model_exclude_unset=True)
+async def read_main_chapters_async(
+    novel_id: int,
+    request: Request,
+    response: Response,
+    fields: List[str] = Depends(chapter_fields),
+    db: AsyncSession = Depends(get_async_db)
+):
+    version = await aio.get_novel_chapters_version(db, novel_id)
+    cached = _list_not_modified(request, response, version)
+    if cached:
+        return cached
+    return await aio.get_main_chapters(db, novel_id=novel_id, fields=fields, version=version)
+
+
+@router.get("/chapters/{chapter_id}", response_model=ChapterResponse)
+async def read_chapter_async(
+    chapter_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = await aio.get_chapter_version(db, chapter_id=chapter_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    gzip = _accepts_gzip(request)
+    last_modified = max(filter(None, (version.updated_at, version.parent_updated_at)), default=None)
+    etag = make_etag("chapter", chapter_id, *version, "gzip" if gzip else "identity")
+    cached = not_modified(request, response, etag, last_modified, vary="Accept-Encoding")
+    if cached:
+        return cached
+
+    if gzip:
+        parts = await aio.get_chapter_gzip_parts(db, chapter_id=chapter_id)
+        if parts:
+            metadata = json.dumps(jsonable_encoder(parts["metadata"]), ensure_ascii=False, separators=(",", ":"))
+            tail = ('",' + metadata[1:]).encode("utf-8")
+            return StreamingResponse(
+                gzip_json_with_content(parts["segments"], parts["crc"], parts["size"], tail),
+                media_type="application/json",
+                headers={**response.headers, "Content-Encoding": "gzip"},
+            )
+    chapter = await aio.get_chapter_detail(db, chapter_id=chapter_id)
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    return chapter
+
+
+@router.get(
+    "/novels/{novel_id}/merge-requests",
+    response_model=Page[MergeRequestSummary],
+    response_model_exclude_unset=True
+)
+async def read_merge_requests_async(
+    novel_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    status: Optional[List[MergeStatus]] = Query(None, description="Only requests in these states (repeatable)"),
+    fields: List[str] = Depends(merge_request_fields),
+    db: AsyncSession = Depends(get_async_db)
+):
+    mrs, next_cursor = await aio.get_merge_requests_by_novel(
+        db, novel_id=novel_id, cursor=cursor, limit=limit, fields=fields, statuses=status
+    )
+    return Page(items=mrs, next_cursor=next_cursor)
+
+
+@router.get("/search", response_model=Page[SearchResult])
+async def search_async(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[Literal["novel", "chapter"]] = None,
+    novel_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    items, next_cursor = await aio.search(
+        db, q, kind=_KINDS.get(kind), novel_id=novel_id, cursor=cursor, limit=limit
+    )
+    return Page(items=items, next_cursor=next_cursor)
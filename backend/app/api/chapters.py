@@ -1,43 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
+from app.core.compression import gzip_json_with_content
 from app.core.database import get_db
-from app.api.deps import get_current_user
-from app.schemas.chapter import Chapter, ChapterCreate, ChapterUpdate, ChapterResponse
+from app.api.conditional import make_etag, not_modified
+from app.api.deps import get_current_user, field_selector
+from app.schemas.chapter import (
+    Chapter, ChapterCreate, ChapterUpdate, ChapterResponse, ChapterSummary, ChapterTree, ReadingPath
+)
+from app.schemas.pagination import Page
 from app.schemas.user import User
 from app.crud.chapter import (
-    get_chapter, get_chapters_by_novel, get_main_chapters,
+    CHAPTER_FIELDS, CHAPTER_SUMMARY_FIELDS,
+    get_chapter, get_chapter_detail, get_chapter_gzip_parts, get_chapters_by_novel, get_main_chapters,
+    get_chapter_version, get_novel_chapters_version, get_child_chapters_version,
     create_chapter, update_chapter, delete_chapter, fork_chapter,
-    get_fork_chapters, get_merged_chapters, get_merged_chapters_for_parent
+    get_fork_chapters, get_merged_chapters, get_merged_chapters_for_parent,
+    get_chapter_tree, get_novel_chapter_tree, get_reading_path
 )
+from app.crud.novel import get_novel
 
 router = APIRouter()
 
+# Listings return ChapterSummary rows; the body is only sent when `content` is requested
+chapter_fields = field_selector(CHAPTER_FIELDS, CHAPTER_SUMMARY_FIELDS)
+
 
-@router.get("/novels/{novel_id}/chapters", response_model=List[ChapterResponse])
-def read_novel_chapters(novel_id: int, db: Session = Depends(get_db)):
-    chapters = get_chapters_by_novel(db, novel_id=novel_id)
-    # Add author username and parent chapter title
-    result = []
-    for chapter in chapters:
-        chapter_dict = ChapterResponse.model_validate(chapter).model_dump()
-        chapter_dict["author_username"] = chapter.author.username
-        if chapter.parent_chapter:
-            chapter_dict["parent_chapter_title"] = chapter.parent_chapter.title
-        result.append(ChapterResponse(**chapter_dict))
-    return result
+def _list_not_modified(request: Request, response: Response, version) -> Optional[Response]:
+    """Conditional GET for a chapter listing whose rows are covered by `version`"""
+    count, last_updated = version
+    # The query string (fields, cursor, limit) shapes the payload as well
+    etag = make_etag(request.url.path, str(request.query_params), count, last_updated)
+    return not_modified(request, response, etag, last_updated)
 
 
-@router.get("/novels/{novel_id}/chapters/main", response_model=List[ChapterResponse])
-def read_main_chapters(novel_id: int, db: Session = Depends(get_db)):
-    chapters = get_main_chapters(db, novel_id=novel_id)
-    result = []
-    for chapter in chapters:
-        chapter_dict = ChapterResponse.model_validate(chapter).model_dump()
-        chapter_dict["author_username"] = chapter.author.username
-        result.append(ChapterResponse(**chapter_dict))
-    return result
+@router.get(
+    "/novels/{novel_id}/chapters",
+    response_model=Page[ChapterSummary],
+    response_model_exclude_unset=True
+)
+def read_novel_chapters(
+    novel_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    fields: List[str] = Depends(chapter_fields),
+    db: Session = Depends(get_db)
+):
+    cached = _list_not_modified(request, response, get_novel_chapters_version(db, novel_id))
+    if cached:
+        return cached
+    # Author username and parent chapter title are joined in by the crud query
+    chapters, next_cursor = get_chapters_by_novel(
+        db, novel_id=novel_id, cursor=cursor, limit=limit, fields=fields
+    )
+    return Page(items=chapters, next_cursor=next_cursor)
+
+
+@router.get(
+    "/novels/{novel_id}/chapters/main",
+    response_model=List[ChapterSummary],
+    response_model_exclude_unset=True
+)
+def read_main_chapters(
+    novel_id: int,
+    request: Request,
+    response: Response,
+    fields: List[str] = Depends(chapter_fields),
+    db: Session = Depends(get_db)
+):
+    version = get_novel_chapters_version(db, novel_id)
+    cached = _list_not_modified(request, response, version)
+    if cached:
+        return cached
+    # 缓存按版本命中：其他 worker 刚提交的修改不会以旧内容 + 新 ETag 的形式返回
+    return get_main_chapters(db, novel_id=novel_id, fields=fields, version=version)
 
 
 @router.post("/novels/{novel_id}/chapters", response_model=Chapter)
@@ -50,16 +93,42 @@ def create_chapter_endpoint(
     return create_chapter(db=db, chapter=chapter, novel_id=novel_id, author_id=current_user.id)
 
 
+def _accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
 @router.get("/chapters/{chapter_id}", response_model=ChapterResponse)
-def read_chapter(chapter_id: int, db: Session = Depends(get_db)):
-    chapter = get_chapter(db, chapter_id=chapter_id)
+def read_chapter(chapter_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = get_chapter_version(db, chapter_id=chapter_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    gzip = _accepts_gzip(request)
+    last_modified = max(filter(None, (version.updated_at, version.parent_updated_at)), default=None)
+    # gzip and identity bodies differ byte for byte, so they get different strong ETags
+    etag = make_etag("chapter", chapter_id, *version, "gzip" if gzip else "identity")
+    cached = not_modified(request, response, etag, last_modified, vary="Accept-Encoding")
+    if cached:
+        return cached
+
+    if gzip:
+        # Send the stored paragraph segments as they are, wrapped into one gzip stream
+        parts = get_chapter_gzip_parts(db, chapter_id=chapter_id)
+        if parts:
+            metadata = json.dumps(jsonable_encoder(parts["metadata"]), ensure_ascii=False, separators=(",", ":"))
+            tail = ('",' + metadata[1:]).encode("utf-8")
+            return StreamingResponse(
+                gzip_json_with_content(parts["segments"], parts["crc"], parts["size"], tail),
+                media_type="application/json",
+                headers={**response.headers, "Content-Encoding": "gzip"},
+            )
+    chapter = get_chapter_detail(db, chapter_id=chapter_id)
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
-    chapter_dict = ChapterResponse.model_validate(chapter).model_dump()
-    chapter_dict["author_username"] = chapter.author.username
-    if chapter.parent_chapter:
-        chapter_dict["parent_chapter_title"] = chapter.parent_chapter.title
-    return ChapterResponse(**chapter_dict)
+    return chapter
 
 
 @router.put("/chapters/{chapter_id}", response_model=Chapter)
@@ -106,49 +175,117 @@ def fork_chapter_endpoint(
     return fork_chapter(db, chapter_id, current_user.id, title, content)
 
 
-@router.get("/chapters/{chapter_id}/forks", response_model=List[ChapterResponse])
-def read_fork_chapters(chapter_id: int, db: Session = Depends(get_db)):
+@router.get(
+    "/chapters/{chapter_id}/forks",
+    response_model=List[ChapterSummary],
+    response_model_exclude_unset=True
+)
+def read_fork_chapters(
+    chapter_id: int,
+    request: Request,
+    response: Response,
+    fields: List[str] = Depends(chapter_fields),
+    db: Session = Depends(get_db)
+):
     """Get all fork chapters of a parent chapter (unmerged)"""
-    parent_chapter = get_chapter(db, chapter_id=chapter_id)
-    if not parent_chapter:
+    version = get_child_chapters_version(db, parent_chapter_id=chapter_id)
+    # The version covers the parent itself, so an empty set means it does not exist
+    if not version[0]:
         raise HTTPException(status_code=404, detail="Chapter not found")
+    cached = _list_not_modified(request, response, version)
+    if cached:
+        return cached
 
-    chapters = get_fork_chapters(db, parent_chapter_id=chapter_id)
-    result = []
-    for chapter in chapters:
-        chapter_dict = ChapterResponse.model_validate(chapter).model_dump()
-        chapter_dict["author_username"] = chapter.author.username
-        chapter_dict["parent_chapter_title"] = parent_chapter.title
-        result.append(ChapterResponse(**chapter_dict))
-    return result
+    return get_fork_chapters(db, parent_chapter_id=chapter_id, fields=fields)
 
 
-@router.get("/novels/{novel_id}/chapters/merged", response_model=List[ChapterResponse])
-def read_merged_chapters(novel_id: int, db: Session = Depends(get_db)):
+@router.get(
+    "/novels/{novel_id}/chapters/merged",
+    response_model=List[ChapterSummary],
+    response_model_exclude_unset=True
+)
+def read_merged_chapters(
+    novel_id: int,
+    request: Request,
+    response: Response,
+    fields: List[str] = Depends(chapter_fields),
+    db: Session = Depends(get_db)
+):
     """Get all merged chapters for a novel"""
-    chapters = get_merged_chapters(db, novel_id=novel_id)
-    result = []
-    for chapter in chapters:
-        chapter_dict = ChapterResponse.model_validate(chapter).model_dump()
-        chapter_dict["author_username"] = chapter.author.username
-        if chapter.parent_chapter:
-            chapter_dict["parent_chapter_title"] = chapter.parent_chapter.title
-        result.append(ChapterResponse(**chapter_dict))
-    return result
-
-
-@router.get("/chapters/{chapter_id}/merged", response_model=List[ChapterResponse])
-def read_merged_chapters_for_parent(chapter_id: int, db: Session = Depends(get_db)):
+    cached = _list_not_modified(request, response, get_novel_chapters_version(db, novel_id))
+    if cached:
+        return cached
+    return get_merged_chapters(db, novel_id=novel_id, fields=fields)
+
+
+@router.get(
+    "/chapters/{chapter_id}/merged",
+    response_model=List[ChapterSummary],
+    response_model_exclude_unset=True
+)
+def read_merged_chapters_for_parent(
+    chapter_id: int,
+    request: Request,
+    response: Response,
+    fields: List[str] = Depends(chapter_fields),
+    db: Session = Depends(get_db)
+):
     """Get all merged chapters that were forked from this parent chapter"""
-    parent_chapter = get_chapter(db, chapter_id=chapter_id)
-    if not parent_chapter:
+    version = get_child_chapters_version(db, parent_chapter_id=chapter_id)
+    # The version covers the parent itself, so an empty set means it does not exist
+    if not version[0]:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    cached = _list_not_modified(request, response, version)
+    if cached:
+        return cached
+
+    return get_merged_chapters_for_parent(db, parent_chapter_id=chapter_id, fields=fields)
+
+
+@router.get("/chapters/{chapter_id}/tree", response_model=ChapterTree)
+def read_chapter_tree(
+    chapter_id: int,
+    max_depth: int = Query(20, ge=0, le=100),
+    max_nodes: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Get the whole fork tree below a chapter (forks and merged branches, nested)"""
+    tree = get_chapter_tree(db, chapter_id=chapter_id, max_depth=max_depth, max_nodes=max_nodes)
+    if not tree["roots"]:
         raise HTTPException(status_code=404, detail="Chapter not found")
+    return tree
+
+
+@router.get("/novels/{novel_id}/chapters/tree", response_model=ChapterTree)
+def read_novel_chapter_tree(
+    novel_id: int,
+    max_depth: int = Query(20, ge=0, le=100),
+    max_nodes: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Get the fork trees of all top-level chapters of a novel"""
+    return get_novel_chapter_tree(db, novel_id=novel_id, max_depth=max_depth, max_nodes=max_nodes)
 
-    chapters = get_merged_chapters_for_parent(db, parent_chapter_id=chapter_id)
-    result = []
-    for chapter in chapters:
-        chapter_dict = ChapterResponse.model_validate(chapter).model_dump()
-        chapter_dict["author_username"] = chapter.author.username
-        chapter_dict["parent_chapter_title"] = parent_chapter.title
-        result.append(ChapterResponse(**chapter_dict))
-    return result
+
+# Most branch choices one path request may carry
+MAX_PATH_CHOICES = 200
+
+
+@router.get("/novels/{novel_id}/path", response_model=ReadingPath)
+def read_reading_path(
+    novel_id: int,
+    choices: Optional[str] = Query(
+        None, description="逗号分隔的分支章节 id（fork 或已接纳章节）；在其父章节处转入该分支，未选择时沿主线阅读"
+    ),
+    db: Session = Depends(get_db)
+):
+    """按读者的分支选择解析出完整的阅读顺序（含上一章 / 下一章），一次查询完成"""
+    try:
+        chosen = [int(part) for part in choices.split(",") if part.strip()] if choices else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="choices must be comma-separated chapter ids")
+    if len(chosen) > MAX_PATH_CHOICES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PATH_CHOICES} choices")
+    if not get_novel(db, novel_id=novel_id):
+        raise HTTPException(status_code=404, detail="Novel not found")
+    return get_reading_path(db, novel_id=novel_id, choices=chosen)
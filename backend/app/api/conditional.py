@@ -0,0 +1,62 @@
+"""
+Conditional GET support (ETag / Last-Modified).
+
+Endpoints work out a version for what they are about to send with a cheap
+metadata query, then call not_modified() before loading anything else. A
+client that already has that version gets an empty 304 back.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over everything the representation depends on"""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _http_date(value: datetime) -> str:
+    # Timestamps are stored as naive UTC (datetime.utcnow)
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(
+    request: Request, response: Response, etag: str, last_modified: Optional[datetime] = None,
+    vary: Optional[str] = None
+) -> Optional[Response]:
+    """Set validator headers on `response` and return a 304 if the client's copy is current
+
+    Returns None when the full representation has to be sent.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    if vary:
+        headers["Vary"] = vary
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, etag)
+    elif last_modified is not None and request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        fresh = last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    else:
+        fresh = False
+    return Response(status_code=304, headers=headers) if fresh else None
@@ -1,35 +1,101 @@
-from fastapi import Depends, HTTPException, status
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.core.security import decode_access_token
+from app.core.security import STREAM_TOKEN_SCOPE, decode_access_token
+from app.crud.cache import cached, token_cache
 from app.crud.user import get_user
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+
+def _verify_token(token: str, scope: Optional[str] = None) -> Optional[Tuple[int, float]]:
+    """(user_id, expires_at) of a valid token issued for `scope` (None: login tokens), or None"""
+    payload = decode_access_token(token)
+    if payload is None or payload.get("sub") is None or payload.get("scope") != scope:
+        return None
+    return int(payload["sub"]), float(payload.get("exp", "inf"))
 
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-        )
-    user_id = payload.get("sub")
-    if user_id is None:
+    return _user_for_token(db, credentials.credentials)
+
+
+def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    stream_token: Optional[str] = Query(
+        None, description="浏览器 EventSource 无法设置请求头时，传 POST /api/events/token 换来的短期 token"
+    ),
+    db: Session = Depends(get_db)
+):
+    """get_current_user for streaming endpoints: a stream token may come as ?stream_token= instead
+
+    Login tokens are only taken from the header, so they never end up in URLs and access logs.
+    """
+    if credentials:
+        return _user_for_token(db, credentials.credentials)
+    if not stream_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return _user_for_token(db, stream_token, STREAM_TOKEN_SCOPE)
+
+
+def _user_for_token(db: Session, token: str, scope: Optional[str] = None):
+    # 签名校验结果按 token 缓存，用户行走 user_cache：命中时不查库也不重复验签
+    verified = cached(db, token_cache, (token, scope), lambda: _verify_token(token, scope))
+    if verified is None or verified[1] <= time.time():
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-    user = get_user(db, user_id=int(user_id))
+    user = get_user(db, user_id=verified[0])
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user"
+        )
     return user
+
+
+def field_selector(allowed: Iterable[str], default: Iterable[str]):
+    """Build a dependency that parses a comma-separated `fields` query parameter
+
+    The returned field list always starts with `id` and is pushed down into the
+    SQL column selection by the crud listing functions.
+    """
+    allowed = tuple(allowed)
+    default = tuple(default)
+
+    def parse_fields(
+        fields: Optional[str] = Query(
+            None, description="Comma-separated fields to return: " + ", ".join(allowed)
+        )
+    ) -> List[str]:
+        if not fields:
+            return list(default)
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+        selected = ["id"]
+        for name in requested:
+            if name not in selected:
+                selected.append(name)
+        return selected
+
+    return parse_fields
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.events import RESET, event_broker
+from app.core.security import create_stream_token
+from app.api.deps import get_current_user, get_stream_user
+from app.schemas.user import StreamToken, User
+from app.crud.follow import get_followed_novel_ids
+
+router = APIRouter()
+
+
+def _format(event: dict) -> str:
+    data = {key: event[key] for key in ("type", "novel_id", "data", "published_at")}
+    return f"event: {event['type']}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/events/token", response_model=StreamToken)
+def create_events_token(current_user: User = Depends(get_current_user)):
+    """
+    换取打开事件流用的短期 token（EVENTS_TOKEN_EXPIRE_SECONDS 秒内有效，只能用于 GET /api/events）。
+    浏览器 EventSource 无法设置请求头，token 只能放进 URL，会出现在访问日志里，所以不用登录 token。
+    每次（重新）连接前都应换一个新的。
+    """
+    return StreamToken(
+        stream_token=create_stream_token(current_user.id), expires_in=settings.EVENTS_TOKEN_EXPIRE_SECONDS
+    )
+
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    novels: Optional[str] = Query(None, description="逗号分隔的小说 id，在关注的小说之外额外订阅"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    SSE 事件流：关注（或自己创建）的小说的合并请求创建 / 通过 / 拒绝与章节创建 / 更新 / 分支 / 删除，
+    以及发给自己的事件（自己的合并请求被审核、自己的章节被 fork）。
+
+    关注 / 取消关注会即时作用于已打开的流。流在客户端落后太多或打开满
+    EVENTS_STREAM_MAX_SECONDS 时发送 reset 事件并关闭：客户端应换一个新的 stream token 重连，
+    期间的事件不会补发，收到 reset 后应重新拉取页面数据。
+    """
+    try:
+        extra = {int(part) for part in novels.split(",") if part.strip()} if novels else set()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="novels must be comma-separated novel ids")
+    if event_broker.connections >= settings.EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(status_code=503, detail="Too many event streams", headers={"Retry-After": "5"})
+    followed = await run_in_threadpool(get_followed_novel_ids, db, current_user.id)
+    subscription = event_broker.subscribe(current_user.id, followed | extra)
+
+    async def stream():
+        deadline = time.monotonic() + settings.EVENTS_STREAM_MAX_SECONDS
+        try:
+            # 断线后客户端 3 秒后重连（用 stream token 的客户端需先换一个新的）
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield "event: reset\ndata: {}\n\n"
+                    break
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), min(settings.EVENTS_HEARTBEAT_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # 注释行作心跳，防止代理断开空闲连接
+                    yield ": ping\n\n"
+                    continue
+                if event is RESET:
+                    event_broker.resets += 1
+                    yield "event: reset\ndata: {}\n\n"
+                    break
+                event_broker.delivered_event(event)
+                yield _format(event)
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
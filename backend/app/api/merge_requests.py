@@ -1,43 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 from app.core.database import get_db
-from app.api.deps import get_current_user
-from app.schemas.merge_request import MergeRequest, MergeRequestCreate, MergeRequestUpdate
+from app.api.deps import get_current_user, field_selector
+from app.schemas.merge_request import (
+    MergeRequest, MergeRequestCreate, MergeRequestUpdate, MergeRequestSummary, MergeRequestDiff,
+    MergeRequestReview, MergeRequestReviewResult
+)
+from app.schemas.pagination import Page
 from app.schemas.user import User
 from app.crud.merge_request import (
-    get_merge_request, get_merge_requests_by_novel,
-    create_merge_request, approve_merge_request, reject_merge_request,
-    get_pending_merge_request_for_chapter
+    MERGE_REQUEST_FIELDS, get_merge_request, get_merge_requests_by_novel,
+    create_merge_request, approve_merge_request, reject_merge_request, review_merge_requests,
+    get_pending_merge_request_for_chapter, get_submission_states
 )
 from app.crud.novel import get_novel
 from app.crud.chapter import get_chapter
+from app.crud.chapter_diff import get_chapter_diff
 from app.models.chapter import BranchType
 from app.models.merge_request import MergeStatus
 
 router = APIRouter()
 
+merge_request_fields = field_selector(MERGE_REQUEST_FIELDS, MERGE_REQUEST_FIELDS)
+
 
 class CheckSubmissionResponse(BaseModel):
     can_submit: bool
     reason: str | None = None
 
 
-@router.get("/novels/{novel_id}/merge-requests", response_model=List[MergeRequest])
-def read_merge_requests(novel_id: int, db: Session = Depends(get_db)):
-    mrs = get_merge_requests_by_novel(db, novel_id=novel_id)
-    # Add chapter title and requester username
-    result = []
-    for mr in mrs:
-        mr_dict = MergeRequest.model_validate(mr).model_dump()
-        from_chapter = get_chapter(db, mr.from_chapter_id)
-        if from_chapter:
-            mr_dict["from_chapter_title"] = from_chapter.title
-        mr_dict["requester_username"] = mr.requester.username
-        result.append(MergeRequest(**mr_dict))
-    return result
+class CheckSubmissionBatchRequest(BaseModel):
+    chapter_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+
+class CheckSubmissionItem(BaseModel):
+    chapter_id: int
+    can_submit: bool
+    reason: str | None = None
+
+
+class CheckSubmissionBatchResponse(BaseModel):
+    items: List[CheckSubmissionItem]
+
+
+@router.get(
+    "/novels/{novel_id}/merge-requests",
+    response_model=Page[MergeRequestSummary],
+    response_model_exclude_unset=True
+)
+def read_merge_requests(
+    novel_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    status: Optional[List[MergeStatus]] = Query(None, description="Only requests in these states (repeatable)"),
+    fields: List[str] = Depends(merge_request_fields),
+    db: Session = Depends(get_db)
+):
+    # Chapter title and requester username are joined in by the crud query
+    mrs, next_cursor = get_merge_requests_by_novel(
+        db, novel_id=novel_id, cursor=cursor, limit=limit, fields=fields, statuses=status
+    )
+    return Page(items=mrs, next_cursor=next_cursor)
+
+
+@router.get("/merge-requests/{mr_id}/diff", response_model=MergeRequestDiff)
+def read_merge_request_diff(mr_id: int, db: Session = Depends(get_db)):
+    """Diff of the submitted fork chapter against the chapter it was forked from"""
+    mr = get_merge_request(db, mr_id=mr_id)
+    if not mr:
+        raise HTTPException(status_code=404, detail="Merge request not found")
+
+    chapter = get_chapter(db, chapter_id=mr.from_chapter_id)
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    if chapter.parent_chapter_id is None:
+        raise HTTPException(status_code=404, detail="Parent chapter not found")
+
+    # 已审核的请求不再缓存 diff（审核时已删除），偶尔查看时现算
+    diff = get_chapter_diff(
+        db, base_chapter_id=chapter.parent_chapter_id, head_chapter_id=chapter.id,
+        store=mr.status == MergeStatus.PENDING
+    )
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Parent chapter not found")
+
+    # 缓存里的 diff 原样返回，只在前面拼上 id，避免反复解析/校验大段 JSON
+    ids = json.dumps({
+        "merge_request_id": mr.id,
+        "base_chapter_id": chapter.parent_chapter_id,
+        "head_chapter_id": chapter.id,
+    })
+    return Response(content=ids[:-1] + "," + diff[1:], media_type="application/json")
 
 
 @router.post("/novels/{novel_id}/merge-requests", response_model=MergeRequest)
@@ -94,14 +152,13 @@ def approve_merge_request_endpoint(
     if novel.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only novel author can approve merge requests")
 
-    approved_mr = approve_merge_request(db, mr_id)
-
-    # Update the forked chapter to MERGED status
-    from app.crud.chapter import get_chapter, update_chapter
-    chapter = get_chapter(db, chapter_id=approved_mr.from_chapter_id)
-    if chapter:
-        update_chapter(db, chapter.id, {"branch_type": BranchType.MERGED})
-
+    # 审核状态和章节的 MERGED 标记在同一个事务里提交
+    approved_mr = approve_merge_request(db, mr)
+    if approved_mr is None:
+        if mr.status == MergeStatus.PENDING:
+            # 分支章节已被删除或已合并，请求保持待审核
+            raise HTTPException(status_code=409, detail="The forked chapter was deleted or already merged")
+        raise HTTPException(status_code=400, detail="Merge request is not pending")
     return approved_mr
 
 
@@ -120,19 +177,38 @@ def reject_merge_request_endpoint(
     if novel.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only novel author can reject merge requests")
 
-    return reject_merge_request(db, mr_id, review_comment)
+    rejected_mr = reject_merge_request(db, mr, review_comment)
+    if rejected_mr is None:
+        raise HTTPException(status_code=400, detail="Merge request is not pending")
+    return rejected_mr
 
 
-@router.get("/chapters/{chapter_id}/can-submit", response_model=CheckSubmissionResponse)
-def check_can_submit(
-    chapter_id: int,
+@router.post("/novels/{novel_id}/merge-requests/review", response_model=MergeRequestReviewResult)
+def review_merge_requests_endpoint(
+    novel_id: int,
+    review: MergeRequestReview,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Check if the current user can submit this chapter for review"""
-    chapter = get_chapter(db, chapter_id=chapter_id)
-    if not chapter:
-        raise HTTPException(status_code=404, detail="Chapter not found")
+    """批量通过/拒绝合并请求：全部在一个事务里完成，逐条返回结果（不满足条件的条目不影响其它条目）"""
+    novel = get_novel(db, novel_id=novel_id)
+    if not novel:
+        raise HTTPException(status_code=404, detail="Novel not found")
+    if novel.author_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Only novel author can review merge requests")
+
+    decisions = {"approve": MergeStatus.APPROVED, "reject": MergeStatus.REJECTED}
+    outcomes = review_merge_requests(db, novel_id, [
+        (item.id, decisions[item.decision], item.review_comment) for item in review.items
+    ])
+    return MergeRequestReviewResult(items=outcomes)
+
+
+def _submission_check(state, user_id: int) -> CheckSubmissionResponse:
+    """Whether a chapter can be submitted, from its get_submission_states() entry"""
+    if state is None:
+        return CheckSubmissionResponse(can_submit=False, reason="章节不存在")
+    chapter, mr_status = state
 
     # Only fork chapters can be submitted
     if chapter.branch_type != BranchType.FORK:
@@ -142,24 +218,49 @@ def check_can_submit(
         )
 
     # Only the author can submit
-    if chapter.author_id != current_user.id:
+    if chapter.author_id != user_id:
         return CheckSubmissionResponse(
             can_submit=False,
             reason="只有分支作者才能提交分支"
         )
 
     # Check if there's already a pending or approved merge request
-    existing_mr = get_pending_merge_request_for_chapter(db, chapter_id=chapter_id)
-    if existing_mr:
-        if existing_mr.status == MergeStatus.PENDING:
-            return CheckSubmissionResponse(
-                can_submit=False,
-                reason="该分支已经提交，等待审核中"
-            )
-        elif existing_mr.status == MergeStatus.APPROVED:
-            return CheckSubmissionResponse(
-                can_submit=False,
-                reason="该分支已被接纳"
-            )
+    if mr_status == MergeStatus.PENDING:
+        return CheckSubmissionResponse(
+            can_submit=False,
+            reason="该分支已经提交，等待审核中"
+        )
+    elif mr_status == MergeStatus.APPROVED:
+        return CheckSubmissionResponse(
+            can_submit=False,
+            reason="该分支已被接纳"
+        )
 
     return CheckSubmissionResponse(can_submit=True)
+
+
+@router.post("/chapters/can-submit", response_model=CheckSubmissionBatchResponse)
+def check_can_submit_batch(
+    request: CheckSubmissionBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """批量检查：一次查询判断多个章节能否提交（章节列表页不再逐个请求）"""
+    states = get_submission_states(db, request.chapter_ids)
+    return CheckSubmissionBatchResponse(items=[
+        CheckSubmissionItem(chapter_id=chapter_id, **_submission_check(states.get(chapter_id), current_user.id).model_dump())
+        for chapter_id in request.chapter_ids
+    ])
+
+
+@router.get("/chapters/{chapter_id}/can-submit", response_model=CheckSubmissionResponse)
+def check_can_submit(
+    chapter_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Check if the current user can submit this chapter for review"""
+    state = get_submission_states(db, [chapter_id]).get(chapter_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    return _submission_check(state, current_user.id)
@@ -1,20 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import codecs
+import json
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from urllib.parse import quote
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Iterable, List, Literal, Optional
 
-from app.core.database import get_db
-from app.api.deps import get_current_user
-from app.schemas.novel import Novel, NovelCreate, NovelUpdate
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.exporters import WRITERS
+from app.core.importers import READERS, ImportFormatError, ParsedChapter
+from app.api.conditional import make_etag, not_modified
+from app.api.deps import get_current_user, field_selector
+from app.schemas.novel import Novel, NovelCreate, NovelUpdate, NovelSummary
+from app.schemas.share import NovelShares
+from app.schemas.pagination import Page
 from app.schemas.user import User
-from app.crud.novel import get_novel, get_novels, create_novel, update_novel, delete_novel
+from app.crud.chapter import import_chapters, iter_main_chapters
+from app.crud.share import get_shares
+from app.crud.follow import follow_novel, unfollow_novel
+from app.crud.novel import (
+    NOVEL_FIELDS, get_novel, get_novel_version, get_novels, create_novel, update_novel, delete_novel
+)
 
 router = APIRouter()
 
+novel_fields = field_selector(NOVEL_FIELDS, NOVEL_FIELDS)
+# Keys of app.crud.novel.NOVEL_SORTS
+NovelSort = Literal["created_at", "chapter_count", "fork_count", "pending_merge_requests", "last_chapter_at"]
+NOVEL_SORT_DESCRIPTION = "created_at 按创建时间正序；其余按统计值倒序（最多 / 最近的在前）"
+
 
-@router.get("", response_model=List[Novel])
-def read_novels(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    novels = get_novels(db, skip=skip, limit=limit)
-    return novels
+@router.get("", response_model=Page[NovelSummary], response_model_exclude_unset=True)
+def read_novels(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    fields: List[str] = Depends(novel_fields),
+    sort: NovelSort = Query("created_at", description=NOVEL_SORT_DESCRIPTION),
+    db: Session = Depends(get_db)
+):
+    novels, next_cursor = get_novels(db, cursor=cursor, limit=limit, fields=fields, sort=sort)
+    return Page(items=novels, next_cursor=next_cursor)
 
 
 @router.post("", response_model=Novel)
@@ -27,8 +56,16 @@ def create_novel_endpoint(
 
 
 @router.get("/{novel_id}", response_model=Novel)
-def read_novel(novel_id: int, db: Session = Depends(get_db)):
-    novel = get_novel(db, novel_id=novel_id)
+def read_novel(novel_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = get_novel_version(db, novel_id=novel_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Novel not found")
+    cached = not_modified(request, response, make_etag("novel", novel_id, version.updated_at), version.updated_at)
+    if cached:
+        return cached
+
+    # 传入版本：本 worker 的缓存尚未收到失效通知时也不会把旧内容配上新 ETag
+    novel = get_novel(db, novel_id=novel_id, version=version.updated_at)
     if not novel:
         raise HTTPException(status_code=404, detail="Novel not found")
     return novel
@@ -62,3 +99,126 @@ def delete_novel_endpoint(
         raise HTTPException(status_code=403, detail="Not authorized to delete this novel")
     delete_novel(db, novel_id)
     return {"message": "Novel deleted successfully"}
+
+
+# Uploads up to this size stay in memory, larger ones spill to a temp file
+_UPLOAD_SPOOL_BYTES = 1024 * 1024
+
+
+def _import_events(novel_id: int, author_id: int, chapters: Iterable[ParsedChapter], upload):
+    """NDJSON lines for import_chapters(), run after the request's own session is closed"""
+    db = SessionLocal()
+    try:
+        for event in import_chapters(db, novel_id, author_id, chapters):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except ImportFormatError as exc:
+        db.rollback()
+        yield json.dumps({"event": "error", "detail": str(exc)}, ensure_ascii=False) + "\n"
+    finally:
+        db.close()
+        upload.close()
+
+
+@router.put("/{novel_id}/follow", status_code=status.HTTP_204_NO_CONTENT)
+def follow_novel_endpoint(
+    novel_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """关注小说：其合并请求与章节事件会推送到 GET /api/events"""
+    if not get_novel(db, novel_id=novel_id):
+        raise HTTPException(status_code=404, detail="Novel not found")
+    follow_novel(db, current_user.id, novel_id)
+
+
+@router.delete("/{novel_id}/follow", status_code=status.HTTP_204_NO_CONTENT)
+def unfollow_novel_endpoint(
+    novel_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    unfollow_novel(db, current_user.id, novel_id)
+
+
+@router.get("/{novel_id}/shares", response_model=NovelShares)
+def read_novel_shares(
+    novel_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="只返回持股最多的前 N 位（创始人总在第一位）"),
+    payout: Optional[int] = Query(None, ge=0, description="按持股比例分配的金额（分），各持股人所得为整数且总和等于该金额"),
+    db: Session = Depends(get_db)
+):
+    """股份表：创始人与贡献者的股数、稀释后的持股比例，可选按比例试算分红"""
+    shares = get_shares(db, novel_id, limit=limit, payout=payout)
+    if shares is None:
+        raise HTTPException(status_code=404, detail="Novel not found")
+    return shares
+
+
+@router.post("/{novel_id}/import")
+async def import_novel(
+    novel_id: int,
+    request: Request,
+    format: Literal["txt", "jsonl", "epub"] = Query(..., description="Format of the request body"),
+    encoding: str = Query("utf-8", description="Text encoding for txt/jsonl, e.g. gb18030"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    导入整本小说：请求体直接是文件内容（不是 multipart），章节追加到主线末尾。
+
+    返回 NDJSON 流：每插入一批输出一行 {"event": "progress", ...}，全部提交后输出
+    {"event": "done", ...}（含逐章错误）；文件无法解析时输出 {"event": "error"}。
+    整个导入在一个事务里，没有 done 就表示什么都没有导入。
+    """
+    db_novel = await run_in_threadpool(get_novel, db, novel_id)
+    if not db_novel:
+        raise HTTPException(status_code=404, detail="Novel not found")
+    if db_novel.author_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to import into this novel")
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise HTTPException(status_code=400, detail=f"Unknown encoding: {encoding}")
+
+    upload = tempfile.SpooledTemporaryFile(max_size=_UPLOAD_SPOOL_BYTES)
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > settings.IMPORT_MAX_BYTES:
+            upload.close()
+            raise HTTPException(status_code=413, detail=f"File larger than {settings.IMPORT_MAX_BYTES} bytes")
+        upload.write(chunk)
+    upload.seek(0)
+    return StreamingResponse(
+        _import_events(novel_id, current_user.id, READERS[format](upload, encoding), upload),
+        media_type="application/x-ndjson",
+    )
+
+
+def _export_chunks(novel_id: int, title: str, description: str, format: str):
+    """The export file in chunks, read in one transaction of its own so every chapter comes from the same snapshot"""
+    writer = WRITERS[format][0]
+    db = SessionLocal()
+    try:
+        yield from writer(novel_id, title, description, iter_main_chapters(db, novel_id))
+    finally:
+        db.close()
+
+
+@router.get("/{novel_id}/export")
+def export_novel(
+    novel_id: int,
+    format: Literal["txt", "jsonl", "epub"] = Query("txt", description="Output format"),
+    db: Session = Depends(get_db)
+):
+    """导出主线章节（按 chapter_number 排序），边读边写，内存占用与小说长度无关"""
+    novel = get_novel(db, novel_id=novel_id)
+    if not novel:
+        raise HTTPException(status_code=404, detail="Novel not found")
+    _, media_type, extension = WRITERS[format]
+    filename = quote(f"{novel.title}.{extension}")
+    return StreamingResponse(
+        _export_chunks(novel_id, novel.title, novel.description or "", format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=\"novel-{novel_id}.{extension}\"; filename*=UTF-8''{filename}"},
+    )
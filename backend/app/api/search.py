@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Literal, Optional
+
+from app.core.database import get_db
+from app.crud.search import search
+from app.models.search_index import CHAPTER_DOCUMENT, NOVEL_DOCUMENT
+from app.schemas.pagination import Page
+from app.schemas.search import SearchResult
+
+router = APIRouter()
+
+_KINDS = {"novel": NOVEL_DOCUMENT, "chapter": CHAPTER_DOCUMENT}
+
+
+@router.get("/search", response_model=Page[SearchResult])
+def search_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[Literal["novel", "chapter"]] = None,
+    novel_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Search novel titles/descriptions and chapter titles/content, most relevant first"""
+    items, next_cursor = search(
+        db, q, kind=_KINDS.get(kind), novel_id=novel_id, cursor=cursor, limit=limit
+    )
+    return Page(items=items, next_cursor=next_cursor)
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Literal, Optional
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.api.deps import get_current_user
+from app.crud.vote import get_leaderboard, month_key, month_label, parse_month, record_votes, vote_ingester
+from app.models.vote import ALL_TIME
+from app.schemas.user import User
+from app.schemas.vote import Leaderboard, VoteCreate, VoteResult
+
+router = APIRouter()
+
+# record_votes outcome -> (status code, detail)
+_REJECTIONS = {
+    "not_found": (404, "Novel not found"),
+    "own_novel": (403, "Cannot vote for your own novel"),
+    "cooldown": (429, "Already voted for this novel recently"),
+    "novel_limit": (400, "Monthly ticket limit for this novel reached"),
+    "monthly_limit": (400, "Monthly ticket limit reached"),
+}
+
+
+@router.get("/novels/leaderboard", response_model=Leaderboard)
+def read_leaderboard(
+    board: Literal["monthly", "all_time"] = "monthly",
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM，默认本月；仅 monthly"),
+    bracket: Literal["all", "new", "growing", "mature"] = Query("all", description="作品年龄段：new <3个月，growing 3-12个月，mature >12个月"),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """月票榜：每次汇总月票时预先算好，这里只读一次"""
+    if board == "all_time":
+        period, month = ALL_TIME, None
+    else:
+        try:
+            period = parse_month(month) if month else month_key(datetime.utcnow())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid month")
+        month = month_label(period)
+    items = get_leaderboard(db, period, bracket, limit)
+    return Leaderboard(
+        board=board, month=month, bracket=bracket,
+        generated_at=items[0]["generated_at"] if items else None, items=items,
+    )
+
+
+@router.post("/novels/{novel_id}/votes", response_model=VoteResult)
+async def vote_for_novel(
+    novel_id: int,
+    vote: VoteCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    给小说投月票。每位读者每月总额 TICKETS_PER_USER_MONTH 张、同一作品 TICKETS_PER_NOVEL_MONTH 张，
+    同一作品两次投票至少间隔 VOTE_COOLDOWN_SECONDS；不能给自己的作品投票。
+
+    投票由本 worker 的写入线程攒批写入（一个事务一批），月票榜在下次汇总后更新。
+    """
+    if settings.VOTE_BATCH_SIZE > 0:
+        result = await asyncio.wrap_future(vote_ingester.submit(current_user.id, novel_id, vote.tickets))
+    else:
+        result = (await run_in_threadpool(record_votes, db, [(current_user.id, novel_id, vote.tickets)]))[0]
+    if result["outcome"] in _REJECTIONS:
+        status_code, detail = _REJECTIONS[result["outcome"]]
+        headers = {"Retry-After": str(result["retry_after"])} if "retry_after" in result else None
+        raise HTTPException(status_code=status_code, detail=detail, headers=headers)
+    return VoteResult(
+        **result,
+        novel_remaining=settings.TICKETS_PER_NOVEL_MONTH - result["novel_used"],
+        monthly_remaining=settings.TICKETS_PER_USER_MONTH - result["monthly_used"],
+    )
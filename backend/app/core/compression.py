@@ -0,0 +1,77 @@
+"""
+Precompressed chapter bodies.
+
+Each paragraph is stored as a raw DEFLATE segment of its JSON-escaped text,
+ended with a sync flush. Such segments are byte-aligned and never final, so
+they can be concatenated as-is into one DEFLATE stream. A gzip response for
+GET /chapters/{id} is then the gzip header, the stored segments, a small
+freshly compressed tail holding the chapter metadata, and the gzip trailer.
+The CRC32 of the body part is computed once at write time, so serving a
+chapter neither decompresses nor recompresses its text.
+"""
+import json
+import struct
+import zlib
+from typing import Iterable, Iterator, List, Tuple
+
+# gzip member header: deflate, no flags, no mtime, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+# The body is written first so the stored checksum covers a fixed prefix
+JSON_CONTENT_PREFIX = b'{"content":"'
+
+
+def escape_json_text(text: str) -> bytes:
+    """UTF-8 bytes of `text` as it appears inside a JSON string literal"""
+    return json.dumps(text, ensure_ascii=False)[1:-1].encode("utf-8")
+
+
+def unescape_json_text(data: bytes) -> str:
+    return json.loads(b'"' + data + b'"')
+
+
+def deflate_segment(data: bytes) -> bytes:
+    """Compress `data` into a concatenable raw DEFLATE segment"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def inflate_segment(segment: bytes) -> bytes:
+    return zlib.decompressobj(-15).decompress(segment)
+
+
+PARAGRAPH_SEPARATOR = escape_json_text("\n")
+PREFIX_SEGMENT = deflate_segment(JSON_CONTENT_PREFIX)
+SEPARATOR_SEGMENT = deflate_segment(PARAGRAPH_SEPARATOR)
+
+
+def content_checksum(paragraphs: Iterable[str]) -> Tuple[int, int]:
+    """CRC32 and length of JSON_CONTENT_PREFIX plus the escaped, newline-joined paragraphs"""
+    crc = zlib.crc32(JSON_CONTENT_PREFIX)
+    size = len(JSON_CONTENT_PREFIX)
+    for i, text in enumerate(paragraphs):
+        if i:
+            crc = zlib.crc32(PARAGRAPH_SEPARATOR, crc)
+            size += len(PARAGRAPH_SEPARATOR)
+        escaped = escape_json_text(text)
+        crc = zlib.crc32(escaped, crc)
+        size += len(escaped)
+    return crc, size
+
+
+def gzip_json_with_content(segments: List[bytes], crc: int, size: int, tail: bytes) -> Iterator[bytes]:
+    """Yield a gzip stream of `{"content":"<body>` followed by `tail`
+
+    `segments` are the stored paragraph segments in order, `crc`/`size` the
+    values from content_checksum, and `tail` the rest of the JSON document
+    starting with the closing quote of the content string.
+    """
+    yield GZIP_HEADER
+    yield PREFIX_SEGMENT
+    for i, segment in enumerate(segments):
+        if i:
+            yield SEPARATOR_SEGMENT
+        yield segment
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    yield compressor.compress(tail) + compressor.flush()
+    yield struct.pack("<II", zlib.crc32(tail, crc) & 0xFFFFFFFF, (size + len(tail)) & 0xFFFFFFFF)
@@ -1,5 +1,38 @@
+import multiprocessing
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
+# Named engine tuning profiles, picked by Settings.DB_PROFILE (see app/core/database.py).
+# "off" keeps the driver defaults.
+SQLITE_PROFILES = {
+    "off": {},
+    # WAL lets readers in other workers run while one worker writes; NORMAL only
+    # fsyncs at checkpoints, which WAL keeps crash-safe (the last commits may roll back on power loss)
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # KiB when negative: 64 MiB per connection
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 10000,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+POSTGRES_PROFILES = {
+    "off": {},
+    # pool_size/max_overflow are derived from DB_MAX_CONNECTIONS and the worker count
+    "balanced": {"pool_pre_ping": True, "pool_recycle": 1800, "pool_timeout": 10},
+    "durable": {"pool_pre_ping": True, "pool_recycle": 900, "pool_timeout": 30},
+}
+
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "AI Vision Novel Platform"
@@ -7,11 +40,112 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./ai_vision.db"
+    # Serve the read endpoints with async def routes on an AsyncSession
+    # (aiosqlite/asyncpg). Writes stay on the sync engine either way.
+    ASYNC_DB: bool = False
+    # Defaults to DATABASE_URL with the async driver swapped in
+    ASYNC_DATABASE_URL: str = ""
+    # Engine tuning profile: off / balanced / durable
+    DB_PROFILE: str = "balanced"
+    # PostgreSQL connections this deployment may use in total, split across workers
+    DB_MAX_CONNECTIONS: int = 100
+    # Worker processes sharing the database; 0 means the gunicorn default (2 * CPUs + 1)
+    WORKERS: int = 0
 
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    # Argon2id parameters for new hashes; weaker stored hashes are upgraded on login
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 64 * 1024  # KiB
+    ARGON2_PARALLELISM: int = 4
+    # Processes per worker that hash/verify passwords (0 runs them inline)
+    PASSWORD_HASH_WORKERS: int = 2
+    # Password operations queued or running per worker before new ones get a 503
+    PASSWORD_HASH_QUEUE_LIMIT: int = 16
+
+    # Read-through cache (app/crud/cache.py)
+    CACHE_ENABLED: bool = True
+    CACHE_TTL_SECONDS: float = 60
+    # How often a worker checks for invalidations made by other workers
+    CACHE_POLL_INTERVAL_SECONDS: float = 1.0
+    # "database" shares invalidations through the cache_invalidations table;
+    # "local" keeps them in-process (single worker, tests)
+    CACHE_BACKEND: str = "database"
+    # How long an authenticated user (and its is_active flag) is served from cache;
+    # deactivation invalidates it immediately, this only bounds missed invalidations
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30
+
+    # Largest file accepted by POST /novels/{id}/import
+    IMPORT_MAX_BYTES: int = 100 * 1024 * 1024
+
+    # Monthly tickets (月票)
+    TICKETS_PER_USER_MONTH: int = 100
+    TICKETS_PER_NOVEL_MONTH: int = 10
+    # Minimum time between two votes of one reader for the same novel
+    VOTE_COOLDOWN_SECONDS: float = 3600
+    # Votes written per transaction by each worker's ingestion thread (0 writes each vote inline)
+    VOTE_BATCH_SIZE: int = 1000
+    # Votes waiting per worker before new ones get a 503
+    VOTE_QUEUE_LIMIT: int = 20000
+    # How often ledger rows are added to the totals and the leaderboards rebuilt
+    VOTE_FLUSH_INTERVAL_SECONDS: float = 5
+    LEADERBOARD_SIZE: int = 100
+
+    # Change events pushed by GET /api/events (app/core/events.py).
+    # "unix" fans them out to the other workers on this machine through
+    # datagram sockets in EVENTS_SOCKET_DIR; "local" keeps them in-process
+    EVENTS_BACKEND: str = "unix"
+    # Defaults to a directory under the system temp dir, one per DATABASE_URL
+    EVENTS_SOCKET_DIR: str = ""
+    # Events waiting per connection; a client that falls further behind is told to resync
+    EVENTS_QUEUE_SIZE: int = 256
+    EVENTS_HEARTBEAT_SECONDS: float = 15
+    # Streams end after this long and the browser reconnects, so a shutting-down
+    # worker is not held open by them and connections spread over new workers
+    EVENTS_STREAM_MAX_SECONDS: float = 300
+    # Open event streams per worker before new ones get a 503
+    EVENTS_MAX_CONNECTIONS: int = 1000
+    # Lifetime of the ?stream_token= that opens a stream (POST /api/events/token); it
+    # ends up in access logs, so it only has to last until the connection is made
+    EVENTS_TOKEN_EXPIRE_SECONDS: int = 60
+
+    # Community shares given to new novels (app/models/novel_share.py)
+    SHARE_BASE_TOTAL: int = 10000
+    # Founder's ratio at creation, and the floor it never dilutes below
+    SHARE_FOUNDER_RATIO: float = 0.30
+    SHARE_FOUNDER_FLOOR: float = 0.15
+    # Shares awarded per accepted (main or merged) chapter by another author
+    SHARES_PER_CHAPTER: int = 10
+
+    # Background jobs (app/models/job.py), run by python -m app.worker
+    JOBS_MAX_ATTEMPTS: int = 5
+    # Lease of a claimed job; past it the job is handed to another worker
+    JOBS_VISIBILITY_TIMEOUT_SECONDS: float = 300
+    # Retry delay after the n-th failed attempt: base * 2 ** (n - 1), capped
+    JOBS_RETRY_BACKOFF_SECONDS: float = 10
+    JOBS_RETRY_BACKOFF_MAX_SECONDS: float = 3600
+    # How long an idle worker waits before looking for jobs again
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0
+    # Finished (done or failed) jobs are deleted after this long
+    JOBS_RETENTION_HOURS: float = 24 * 7
+
+    @model_validator(mode="after")
+    def _check_shares(self) -> "Settings":
+        # New novels need a founder block smaller than SHARE_BASE_TOTAL, or there is no pool to award from
+        if self.SHARE_BASE_TOTAL <= 0:
+            raise ValueError("SHARE_BASE_TOTAL must be positive")
+        if not 0 <= self.SHARE_FOUNDER_FLOOR <= self.SHARE_FOUNDER_RATIO < 1:
+            raise ValueError("Need 0 <= SHARE_FOUNDER_FLOOR <= SHARE_FOUNDER_RATIO < 1")
+        floor = self.SHARE_FOUNDER_FLOOR
+        if round(self.SHARE_BASE_TOTAL * (self.SHARE_FOUNDER_RATIO - floor) / (1 - floor)) >= self.SHARE_BASE_TOTAL:
+            raise ValueError("SHARE_FOUNDER_RATIO leaves no shares to award out of SHARE_BASE_TOTAL")
+        return self
+
+    @property
+    def worker_count(self) -> int:
+        return self.WORKERS or multiprocessing.cpu_count() * 2 + 1
 
     class Config:
         env_file = "deployconfig/.env"
@@ -1,19 +1,109 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+
+from sqlalchemy import create_engine, event, insert, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from app.core.config import settings
+from app.core.config import POSTGRES_PROFILES, SQLITE_PROFILES, settings
+
+IS_SQLITE = settings.DATABASE_URL.startswith("sqlite")
+# 给 DBA / 迁移脚本留出的连接数，不分给 worker
+RESERVED_CONNECTIONS = 10
+
+
+def sqlite_pragmas() -> dict:
+    return SQLITE_PROFILES[settings.DB_PROFILE]
+
+
+def postgres_pool_options(engines: int = 1) -> dict:
+    """Pool settings for one engine, sized so all workers together stay within DB_MAX_CONNECTIONS"""
+    options = dict(POSTGRES_PROFILES[settings.DB_PROFILE])
+    if not options:
+        return options
+    budget = max(settings.DB_MAX_CONNECTIONS - RESERVED_CONNECTIONS, 1)
+    per_engine = max(budget // (settings.worker_count * engines), 2)
+    # Half kept open, half opened only under bursts
+    options["pool_size"] = max(per_engine // 2, 1)
+    options["max_overflow"] = per_engine - options["pool_size"]
+    return options
+
+
+def _install_pragmas(sync_engine, pragmas: dict):
+    """Run the profile's PRAGMAs on every new SQLite connection"""
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# 异步引擎（ASYNC_DB=true 时启用），与同步引擎指向同一个库
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+ENGINES_PER_WORKER = 2 if settings.ASYNC_DB else 1
+
+
+def async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    scheme, _, rest = settings.DATABASE_URL.partition("://")
+    # postgresql+psycopg2 -> postgresql -> postgresql+asyncpg
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
 
 # 根据数据库类型设置连接参数
-if settings.DATABASE_URL.startswith("sqlite"):
+if IS_SQLITE:
     engine = create_engine(
         settings.DATABASE_URL, connect_args={"check_same_thread": False}
     )
+    _install_pragmas(engine, sqlite_pragmas())
 else:
     # PostgreSQL 不需要 check_same_thread 参数
-    engine = create_engine(settings.DATABASE_URL)
+    engine = create_engine(settings.DATABASE_URL, **postgres_pool_options(ENGINES_PER_WORKER))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    if IS_SQLITE:
+        async_engine = create_async_engine(async_database_url())
+        _install_pragmas(async_engine.sync_engine, sqlite_pragmas())
+    else:
+        async_engine = create_async_engine(async_database_url(), **postgres_pool_options(ENGINES_PER_WORKER))
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+@lru_cache(maxsize=1)
+def engine_config() -> dict:
+    """The tuning in effect: PRAGMAs read back from SQLite, pool options as configured for PostgreSQL"""
+    config = {
+        "dialect": engine.dialect.name,
+        "profile": settings.DB_PROFILE,
+        "workers": settings.worker_count,
+        "async": settings.ASYNC_DB,
+    }
+    if IS_SQLITE:
+        with engine.connect() as conn:
+            config["pragmas"] = {
+                name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "temp_store")
+            }
+    else:
+        config["pool"] = {
+            "class": type(engine.pool).__name__,
+            # The options the engines were created with; SQLAlchemy's defaults where empty
+            **postgres_pool_options(ENGINES_PER_WORKER),
+            "engines_per_worker": ENGINES_PER_WORKER,
+            "max_connections": settings.DB_MAX_CONNECTIONS,
+        }
+    return config
+
+
 Base = declarative_base()
 
 
@@ -23,3 +113,58 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def lock_for_write(db):
+    """On SQLite, take the database write lock now instead of at the first write
+
+    Reads that a later write depends on then see no concurrent commits.
+    PostgreSQL callers lock rows (or advisory keys) instead.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return
+    connection = db.connection()
+    # pysqlite opens its own transaction only before the first write
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def insert_ignore(db, model, rows, index_elements):
+    """Insert rows, skipping any whose key already exists (e.g. written by another worker)"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        db.execute(insert(model), rows)
+        return
+    db.execute(dialect_insert(model).on_conflict_do_nothing(index_elements=index_elements), rows)
+
+
+def insert_or_add(db, model, rows, index_elements, counters):
+    """Insert rows, or add their `counters` columns onto the row already holding the same key"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"insert_or_add does not support {dialect}")
+    statement = dialect_insert(model)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={name: getattr(model, name) + statement.excluded[name] for name in counters}
+        ),
+        rows
+    )
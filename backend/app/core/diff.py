@@ -0,0 +1,102 @@
+"""
+Paragraph- and character-level diff between two chapter bodies.
+
+Paragraphs are compared by hash, so unchanged paragraphs are matched without
+looking at their text. Within a run of replaced paragraphs each old paragraph
+is paired with the next similar new one and diffed character by character,
+which also works for CJK text where there are no word boundaries to split on.
+"""
+from difflib import SequenceMatcher
+from typing import Dict, List, Sequence
+
+# Paired paragraphs longer than this (combined) are shown as delete + insert;
+# SequenceMatcher is quadratic in the worst case
+CHAR_DIFF_MAX_LENGTH = 4000
+# Paired paragraphs sharing less than this are shown as delete + insert
+CHAR_DIFF_MIN_RATIO = 0.4
+# How many head paragraphs ahead to look for a replaced base paragraph's counterpart
+PAIR_WINDOW = 8
+
+
+def _char_segments(base: str, head: str) -> List[dict]:
+    """Character-level edit of one paragraph, or [] when the two are too different"""
+    if len(base) + len(head) > CHAR_DIFF_MAX_LENGTH:
+        return []
+    # autojunk would treat common CJK characters as noise in long paragraphs
+    matcher = SequenceMatcher(None, base, head, autojunk=False)
+    # quick_ratio is a cheap upper bound, so most unrelated pairs stop here
+    if matcher.quick_ratio() < CHAR_DIFF_MIN_RATIO:
+        return []
+    opcodes = matcher.get_opcodes()
+    matched = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal")
+    if 2 * matched < CHAR_DIFF_MIN_RATIO * (len(base) + len(head)):
+        return []
+    segments = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            segments.append({"op": "equal", "text": base[i1:i2]})
+            continue
+        if i2 > i1:
+            segments.append({"op": "delete", "text": base[i1:i2]})
+        if j2 > j1:
+            segments.append({"op": "insert", "text": head[j1:j2]})
+    return segments
+
+
+def diff_paragraphs(
+    base_hashes: Sequence[str], head_hashes: Sequence[str], texts: Dict[str, str]
+) -> dict:
+    """Diff two bodies given as paragraph hash lists and the text behind each hash
+
+    Returns {"stats": ..., "paragraphs": [...]}, where each paragraph entry is
+    one of {"op": "equal" | "insert" | "delete", "text": ...} or
+    {"op": "change", "segments": [{"op": ..., "text": ...}, ...]}.
+    """
+    stats = {
+        "unchanged": 0, "changed": 0, "inserted": 0, "deleted": 0,
+        "chars_inserted": 0, "chars_deleted": 0,
+    }
+    paragraphs = []
+
+    def insert(text):
+        paragraphs.append({"op": "insert", "text": text})
+        stats["inserted"] += 1
+        stats["chars_inserted"] += len(text)
+
+    def delete(text):
+        paragraphs.append({"op": "delete", "text": text})
+        stats["deleted"] += 1
+        stats["chars_deleted"] += len(text)
+
+    matcher = SequenceMatcher(None, base_hashes, head_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for h in head_hashes[j1:j2]:
+                paragraphs.append({"op": "equal", "text": texts[h]})
+            stats["unchanged"] += j2 - j1
+            continue
+        base_run = [texts[h] for h in base_hashes[i1:i2]]
+        head_run = [texts[h] for h in head_hashes[j1:j2]]
+        # Pair each base paragraph with the next similar head paragraph, keeping order
+        j = 0
+        for base in base_run:
+            for k in range(j, min(j + PAIR_WINDOW, len(head_run))):
+                segments = _char_segments(base, head_run[k])
+                if segments:
+                    break
+            else:
+                delete(base)
+                continue
+            for head in head_run[j:k]:
+                insert(head)
+            j = k + 1
+            paragraphs.append({"op": "change", "segments": segments})
+            stats["changed"] += 1
+            for segment in segments:
+                if segment["op"] == "insert":
+                    stats["chars_inserted"] += len(segment["text"])
+                elif segment["op"] == "delete":
+                    stats["chars_deleted"] += len(segment["text"])
+        for head in head_run[j:]:
+            insert(head)
+    return {"stats": stats, "paragraphs": paragraphs}
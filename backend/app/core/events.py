@@ -0,0 +1,287 @@
+"""
+Change events (merge requests, chapters) pushed to open GET /api/events streams.
+
+Writers call publish() inside their transaction; the events go out once it
+commits, and are dropped if it rolls back. Each worker keeps its open
+streams as Subscriptions and delivers an event to those that follow its
+novel or that it is addressed to.
+
+Streams can be connected to any worker, so every published event is also
+sent to the other workers on the machine. The transport is picked by
+EVENTS_BACKEND:
+
+- UnixSocketTransport (default): each worker with open streams binds a
+  datagram socket in EVENTS_SOCKET_DIR and a thread dispatches what
+  arrives on it; publishing sends one datagram to every other socket in
+  the directory. No broker, no polling, and workers without streams are
+  not even sent anything.
+- LocalTransport keeps events in the current process, for a single
+  worker, tests, and platforms without Unix sockets.
+
+Delivery is best effort: a stream whose queue fills up is sent a "reset"
+event and closed, so the client reconnects and refetches what it shows.
+"""
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+_PENDING = "pending_events"
+# Largest datagram read; events are a few hundred bytes
+_MAX_DATAGRAM = 64 * 1024
+_EVENTS_PER_DATAGRAM = 50
+# Put on a subscription's queue when it overflowed
+RESET = object()
+
+
+def make_event(type: str, novel_id: Optional[int], data: dict, users: Iterable[int] = ()) -> dict:
+    """`users` also receive the event when they do not follow the novel (None: only them)"""
+    return {"type": type, "novel_id": novel_id, "data": data, "users": list(users), "published_at": time.time()}
+
+
+class Subscription:
+    """One open event stream: a bounded queue fed from any thread"""
+
+    def __init__(self, user_id: int, novel_ids: Set[int], queue_size: int):
+        self.user_id = user_id
+        self.novel_ids = set(novel_ids)
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue" = asyncio.Queue(maxsize=queue_size + 1)
+        self.queue_size = queue_size
+        self.overflowed = False
+
+    def wants(self, event: dict) -> bool:
+        return event["novel_id"] in self.novel_ids or self.user_id in event["users"]
+
+    def _offer(self, event: dict):
+        # Runs on the stream's event loop
+        if self.overflowed:
+            return
+        if event["type"] == "follow.changed":
+            # Addressed to this user only (novel_id None), so the stream follows along
+            if event["data"]["following"]:
+                self.novel_ids.add(event["data"]["novel_id"])
+            else:
+                self.novel_ids.discard(event["data"]["novel_id"])
+        if self.queue.qsize() >= self.queue_size:
+            self.overflowed = True
+            self.queue.put_nowait(RESET)
+            return
+        self.queue.put_nowait(event)
+
+
+class LocalTransport:
+    """Events stay in this process"""
+
+    def start(self, broker: "EventBroker"):
+        pass
+
+    def send(self, payload: bytes):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class UnixSocketTransport:
+    """Events reach the other workers on this machine through datagram sockets in one directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._path: Optional[str] = None
+        self._sender: Optional[socket.socket] = None
+        self._sender_pid: Optional[int] = None
+        self.forwarded = self.send_errors = self.received = 0
+
+    def start(self, broker: "EventBroker"):
+        """Bind this worker's socket and start receiving, once per process"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            self._path = os.path.join(self.directory, f"{os.getpid()}.sock")
+            if os.path.exists(self._path):
+                os.unlink(self._path)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(self._path)
+            self._pid = os.getpid()
+            atexit.register(self._cleanup, self._path)
+            threading.Thread(target=self._receive, args=(receiver, broker), name="event-receiver", daemon=True).start()
+
+    @staticmethod
+    def _cleanup(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _receive(self, receiver: socket.socket, broker: "EventBroker"):
+        while True:
+            try:
+                payload = receiver.recv(_MAX_DATAGRAM)
+                self.received += 1
+                for event in json.loads(payload):
+                    broker.dispatch(event)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def _peers(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        own = f"{os.getpid()}.sock"
+        return [os.path.join(self.directory, name) for name in names if name.endswith(".sock") and name != own]
+
+    def send(self, payload: bytes):
+        with self._lock:
+            if self._sender_pid != os.getpid():
+                # Not inherited across fork: each worker sends from its own socket
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.setblocking(False)
+                self._sender_pid = os.getpid()
+            sender = self._sender
+        for path in self._peers():
+            try:
+                sender.sendto(payload, path)
+                self.forwarded += 1
+            except ConnectionRefusedError:
+                # Left behind by a worker that exited without cleaning up
+                self._cleanup(path)
+            except OSError:
+                # Receiver's buffer full (or the socket went away): the event is lost for that worker
+                self.send_errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "socket_dir": self.directory,
+            "peers": len(self._peers()),
+            "forwarded": self.forwarded,
+            "received": self.received,
+            "send_errors": self.send_errors,
+        }
+
+
+class EventBroker:
+    """This worker's open streams, plus delivery counters and latency samples"""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        # Seconds from publish to being written to a stream, most recent deliveries
+        self._latencies = deque(maxlen=1000)
+        self.published = self.delivered = self.resets = 0
+
+    @property
+    def connections(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, user_id: int, novel_ids: Set[int]) -> Subscription:
+        """Open a stream; must be called on the event loop that will read it"""
+        self.transport.start(self)
+        subscription = Subscription(user_id, novel_ids, settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, event: dict):
+        """Hand an event to this worker's matching streams; callable from any thread"""
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.wants(event)]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, event)
+            except RuntimeError:
+                # The stream's loop has closed
+                self.unsubscribe(subscription)
+
+    def publish_now(self, events: List[dict]):
+        self.published += len(events)
+        for event in events:
+            self.dispatch(event)
+        # A large review batch goes out as several datagrams, each well under the size limit
+        for start in range(0, len(events), _EVENTS_PER_DATAGRAM):
+            self.transport.send(json.dumps(events[start:start + _EVENTS_PER_DATAGRAM], default=str).encode())
+
+    def delivered_event(self, event: dict):
+        self.delivered += 1
+        self._latencies.append(time.time() - event["published_at"])
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+        return {
+            "backend": type(self.transport).__name__,
+            "connections": self.connections,
+            "published": self.published,
+            "delivered": self.delivered,
+            "resets": self.resets,
+            "latency_ms": {
+                "samples": len(latencies),
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1] * 1000, 2) if latencies else None,
+            },
+            **self.transport.stats(),
+        }
+
+
+def _default_socket_dir() -> str:
+    # One directory per database, so two deployments on one machine never hear each other
+    digest = hashlib.sha1(settings.DATABASE_URL.encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"ai_vision-events-{digest}")
+
+
+def _make_transport():
+    if settings.EVENTS_BACKEND == "unix" and hasattr(socket, "AF_UNIX"):
+        return UnixSocketTransport(settings.EVENTS_SOCKET_DIR or _default_socket_dir())
+    return LocalTransport()
+
+
+event_broker = EventBroker(_make_transport())
+
+
+def publish(db: Session, *events: dict) -> None:
+    """Send events (see make_event) to the open streams once the current transaction commits"""
+    db.info.setdefault(_PENDING, []).extend(events)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _publish_pending_events(session):
+    events = session.info.pop(_PENDING, None)
+    if events:
+        try:
+            event_broker.publish_now(events)
+        except Exception:
+            # Never fail the request that already committed
+            traceback.print_exc(file=sys.stderr)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session):
+    session.info.pop(_PENDING, None)
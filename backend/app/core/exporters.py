@@ -0,0 +1,138 @@
+"""
+Writing a novel out as TXT, JSONL or EPUB, one chapter at a time.
+
+Each writer takes the novel's id, title and description and an iterator of chapter dicts
+(title, chapter_number, content) and yields bytes as soon as a chapter is
+encoded, so the output can be streamed without building the file first.
+Exports read back with app.core.importers.
+"""
+import html
+import io
+import json
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+
+
+def write_txt(novel_id: int, title: str, description: str, chapters: Iterable[dict]) -> Iterator[bytes]:
+    yield f"{title}\n\n{description}\n".encode("utf-8") if description else f"{title}\n".encode("utf-8")
+    for chapter in chapters:
+        yield f"\n{chapter['title']}\n\n{chapter['content']}\n".encode("utf-8")
+
+
+def write_jsonl(novel_id: int, title: str, description: str, chapters: Iterable[dict]) -> Iterator[bytes]:
+    for chapter in chapters:
+        line = {"title": chapter["title"], "chapter_number": chapter["chapter_number"], "content": chapter["content"]}
+        yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class _ZipChunks:
+    """File-like sink for ZipFile; take() hands over what was written since the last call
+
+    ZipFile seeks back to fill in each entry's local header once the entry is
+    written. As long as take() is only called between entries, those seeks
+    stay inside the part not yet handed over, so the archive needs no data
+    descriptors (which some EPUB readers reject on the mimetype entry).
+    """
+
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self._offset = 0
+
+    def write(self, data) -> int:
+        return self._buffer.write(data)
+
+    def tell(self) -> int:
+        return self._offset + self._buffer.tell()
+
+    def seek(self, position: int, whence: int = 0) -> int:
+        if whence == 0:
+            if position < self._offset:
+                raise OSError("cannot seek into data already sent")
+            self._buffer.seek(position - self._offset)
+        else:
+            self._buffer.seek(position, whence)
+        return self.tell()
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._offset += len(data)
+        self._buffer = io.BytesIO()
+        return data
+
+
+_CONTAINER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+    '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+    '</rootfiles></container>\n'
+)
+
+
+def _xhtml(title: str, body: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+        f"<head><meta charset=\"UTF-8\"/><title>{html.escape(title)}</title></head><body>{body}</body></html>\n"
+    )
+
+
+def _package(novel_id: int, title: str, description: str, items: List[Tuple[str, str]]) -> str:
+    escape = html.escape
+    manifest = "".join(
+        f'<item id="{item_id}" href="{item_id}.xhtml" media-type="application/xhtml+xml"/>' for item_id, _ in items
+    )
+    spine = "".join(f'<itemref idref="{item_id}"/>' for item_id, _ in items)
+    modified = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">'
+        '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f'<dc:identifier id="book-id">urn:ai-vision:novel:{novel_id}</dc:identifier>'
+        f"<dc:title>{escape(title)}</dc:title><dc:language>zh</dc:language>"
+        + (f"<dc:description>{escape(description)}</dc:description>" if description else "")
+        + f'<meta property="dcterms:modified">{modified}</meta></metadata>'
+        f'<manifest><item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>{manifest}</manifest>'
+        f"<spine>{spine}</spine></package>\n"
+    )
+
+
+def write_epub(novel_id: int, title: str, description: str, chapters: Iterable[dict]) -> Iterator[bytes]:
+    """EPUB 3 with one XHTML document per chapter
+
+    Chapter documents are written as they arrive; the package document and
+    table of contents, which list every chapter, go at the end of the archive.
+    Only the chapter titles are kept until then.
+    """
+    sink = _ZipChunks()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as book:
+        # The mimetype entry must come first and uncompressed
+        book.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        book.writestr("META-INF/container.xml", _CONTAINER)
+        yield sink.take()
+        items = []
+        for chapter in chapters:
+            item_id = f"chapter-{len(items) + 1}"
+            paragraphs = "".join(
+                f"<p>{html.escape(line)}</p>" for line in chapter["content"].split("\n") if line.strip()
+            )
+            book.writestr(
+                f"OEBPS/{item_id}.xhtml", _xhtml(chapter["title"], f"<h1>{html.escape(chapter['title'])}</h1>{paragraphs}")
+            )
+            items.append((item_id, chapter["title"]))
+            yield sink.take()
+        toc = "".join(f'<li><a href="{item_id}.xhtml">{html.escape(name)}</a></li>' for item_id, name in items)
+        book.writestr("OEBPS/nav.xhtml", _xhtml(title, f'<nav epub:type="toc"><ol>{toc}</ol></nav>'))
+        book.writestr("OEBPS/content.opf", _package(novel_id, title, description, items))
+    yield sink.take()
+
+
+# format -> (writer, media type, file extension)
+WRITERS = {
+    "txt": (write_txt, "text/plain; charset=utf-8", "txt"),
+    "jsonl": (write_jsonl, "application/x-ndjson", "jsonl"),
+    "epub": (write_epub, "application/epub+zip", "epub"),
+}
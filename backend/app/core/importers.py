@@ -0,0 +1,223 @@
+"""
+Splitting uploaded books into chapters for bulk import.
+
+Each reader takes a binary file object and yields ParsedChapter tuples one
+chapter at a time, so a large book is never held in memory as a whole. A
+chapter that cannot be used is yielded with `error` set and reading goes on
+with the next one; ImportFormatError means the file as a whole is unreadable.
+"""
+import io
+import json
+import posixpath
+import re
+import zipfile
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+# Chapter.title is a String(200)
+MAX_TITLE_LENGTH = 200
+# Longer chapters are reported as errors; this also bounds what a TXT file
+# without headings can make the reader buffer
+MAX_CHAPTER_CHARS = 500_000
+
+# 第十二章 / 第12回 / Chapter 12 and the usual unnumbered parts, alone on a line
+_HEADING_RE = re.compile(
+    r"^\s*(?:第[0-9０-９零〇一二两三四五六七八九十百千万]+[章节回卷]|chapter\s+\d+|序章|序言|楔子|引子|尾声|后记|番外)"
+    r"(?:[\s:：.、-].{0,60})?\s*$",
+    re.IGNORECASE,
+)
+_OPF_NS = {"opf": "http://www.idpf.org/2007/opf"}
+_CONTAINER_NS = {"c": "urn:oasis:names:tc:opendocument:xmlns:container"}
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file cannot be read in the requested format"""
+
+
+class ParsedChapter(NamedTuple):
+    # 1-based position in the file: line number for JSONL, chapter or spine index otherwise
+    position: int
+    title: str
+    content: str
+    error: Optional[str] = None
+
+
+def _checked(position: int, title: str, content: str) -> ParsedChapter:
+    title = " ".join(title.split())
+    content = content.strip("\n")
+    if not title:
+        return ParsedChapter(position, title, "", "Missing title")
+    if len(title) > MAX_TITLE_LENGTH:
+        return ParsedChapter(position, title[:MAX_TITLE_LENGTH], "", f"Title longer than {MAX_TITLE_LENGTH} characters")
+    if not content.strip():
+        return ParsedChapter(position, title, "", "Empty chapter")
+    if len(content) > MAX_CHAPTER_CHARS:
+        return ParsedChapter(position, title, "", f"Chapter longer than {MAX_CHAPTER_CHARS} characters")
+    return ParsedChapter(position, title, content)
+
+
+def _txt_chapter(position: int, title: str, lines: List[str], size: int) -> ParsedChapter:
+    if size > MAX_CHAPTER_CHARS:
+        return ParsedChapter(position, title, "", f"Chapter longer than {MAX_CHAPTER_CHARS} characters")
+    return _checked(position, title, "\n".join(lines))
+
+
+def read_txt(file: BinaryIO, encoding: str = "utf-8") -> Iterator[ParsedChapter]:
+    """Plain text, split at chapter heading lines (第N章, Chapter N, 序章 ...)
+
+    Text before the first heading becomes a chapter titled 前言.
+    """
+    # utf-8-sig also drops a byte order mark
+    codec = "utf-8-sig" if encoding.replace("-", "").lower() == "utf8" else encoding
+    stream = io.TextIOWrapper(file, encoding=codec, newline=None)
+    position = 0
+    title, lines, size = "前言", [], 0
+    try:
+        for line in stream:
+            line = line.rstrip("\n")
+            if _HEADING_RE.match(line):
+                if position or "".join(lines).strip():
+                    position += 1
+                    yield _txt_chapter(position, title, lines, size)
+                title, lines, size = line.strip(), [], 0
+                continue
+            size += len(line) + 1
+            # Past the limit the chapter is only counted, not kept
+            if size <= MAX_CHAPTER_CHARS:
+                lines.append(line)
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"The file is not valid {encoding} text; pass the right encoding (e.g. gb18030)")
+    finally:
+        # Leave the upload itself open for the caller
+        stream.detach()
+    if position or "".join(lines).strip():
+        position += 1
+        yield _txt_chapter(position, title, lines, size)
+
+
+def read_jsonl(file: BinaryIO, encoding: str = "utf-8") -> Iterator[ParsedChapter]:
+    """One JSON object per line: {"title": ..., "content": ...}"""
+    for position, raw in enumerate(file, 1):
+        try:
+            line = raw.decode(encoding).strip()
+        except UnicodeDecodeError:
+            yield ParsedChapter(position, "", "", f"Not valid {encoding}")
+            continue
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as exc:
+            yield ParsedChapter(position, "", "", f"Invalid JSON: {exc}")
+            continue
+        if not isinstance(item, dict) or not isinstance(item.get("title"), str) \
+                or not isinstance(item.get("content"), str):
+            yield ParsedChapter(position, "", "", 'Expected an object with string "title" and "content"')
+            continue
+        yield _checked(position, item["title"], item["content"])
+
+
+class _XHTMLText(HTMLParser):
+    """Paragraph text and first heading of an XHTML chapter document"""
+
+    BLOCKS = {"p", "div", "br", "li", "blockquote", "section", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+    HEADINGS = {"h1", "h2", "h3"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: List[str] = []
+        self.title = ""
+        self.heading = ""
+        self._current: List[str] = []
+        self._skip = 0
+        self._in_title = self._in_heading = False
+
+    def _end_paragraph(self):
+        text = " ".join("".join(self._current).split())
+        if text:
+            self.paragraphs.append(text)
+        self._current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "head"):
+            self._skip += 1
+        if tag == "title":
+            self._in_title = True
+        if tag in self.BLOCKS:
+            self._end_paragraph()
+        if tag in self.HEADINGS and not self.heading:
+            self._in_heading = True
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "head"):
+            self._skip = max(self._skip - 1, 0)
+        if tag == "title":
+            self._in_title = False
+        if tag in self.BLOCKS:
+            if self._in_heading and tag in self.HEADINGS:
+                # The chapter heading becomes the title rather than a paragraph
+                self.heading = " ".join("".join(self._current).split())
+                self._current = []
+                self._in_heading = False
+            self._end_paragraph()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip:
+            self._current.append(data)
+
+    def text(self) -> Tuple[str, str]:
+        self._end_paragraph()
+        return self.heading or self.title.strip(), "\n".join(self.paragraphs)
+
+
+def read_epub(file: BinaryIO, encoding: str = "utf-8") -> Iterator[ParsedChapter]:
+    """EPUB 2/3: every spine document with text becomes a chapter, in reading order
+
+    The file must be seekable (zip keeps its index at the end).
+    """
+    try:
+        book = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ImportFormatError("Not an EPUB file")
+    with book:
+        try:
+            container = ElementTree.fromstring(book.read("META-INF/container.xml"))
+            rootfile = container.find(".//c:rootfile", _CONTAINER_NS)
+            opf_path = rootfile.get("full-path")
+            package = ElementTree.fromstring(book.read(opf_path))
+        except (KeyError, AttributeError, ElementTree.ParseError):
+            raise ImportFormatError("EPUB has no readable package document")
+        base = posixpath.dirname(opf_path)
+        manifest = {
+            item.get("id"): item.get("href") for item in package.iterfind("opf:manifest/opf:item", _OPF_NS)
+        }
+        position = 0
+        for itemref in package.iterfind("opf:spine/opf:itemref", _OPF_NS):
+            if itemref.get("linear") == "no" or itemref.get("idref") not in manifest:
+                continue
+            position += 1
+            path = posixpath.normpath(posixpath.join(base, unquote(manifest[itemref.get("idref")])))
+            try:
+                document = book.read(path).decode("utf-8")
+            except KeyError:
+                yield ParsedChapter(position, "", "", f"Missing document {path}")
+                continue
+            except UnicodeDecodeError:
+                yield ParsedChapter(position, "", "", f"{path} is not valid UTF-8")
+                continue
+            parser = _XHTMLText()
+            parser.feed(document)
+            parser.close()
+            title, content = parser.text()
+            if not content:
+                # Cover, title page and other image-only documents
+                position -= 1
+                continue
+            yield _checked(position, title or f"第{position}章", content)
+
+
+READERS = {"txt": read_txt, "jsonl": read_jsonl, "epub": read_epub}
@@ -0,0 +1,91 @@
+"""
+Tokenization for full-text search.
+
+Neither SQLite's unicode61 tokenizer nor PostgreSQL's `simple` parser can
+split Chinese, which has no spaces between words. Text is therefore turned
+into space-separated tokens here before it reaches the database: runs of CJK
+characters become overlapping bigrams, everything else becomes lowercased
+words. The database then only has to split on spaces, and a CJK query matches
+any substring as a phrase of consecutive bigrams.
+"""
+import re
+from typing import List, Optional, Tuple
+
+# Kana, CJK ideographs (with extension A and compatibility forms) and Hangul
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+def _is_cjk(run: str) -> bool:
+    return bool(_CJK_RE.match(run))
+
+
+def index_tokens(text: str) -> str:
+    """Tokens for indexing `text`, space-separated
+
+    Each CJK run becomes its bigrams plus its last character on its own, so
+    every character starts a token and single-character prefix queries work.
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if _is_cjk(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run.lower())
+    return " ".join(tokens)
+
+
+def query_terms(query: str) -> List[Tuple]:
+    """Split a search query into (tokens, prefix) terms that must all match
+
+    A term matches where its tokens appear as a phrase; a single CJK character
+    is searched as a prefix of the indexed bigrams instead.
+    """
+    terms = []
+    for word in query.split():
+        tokens = []
+        for run in _TOKEN_RE.findall(word):
+            if _is_cjk(run) and len(run) > 1:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            else:
+                tokens.append(run if _is_cjk(run) else run.lower())
+        if tokens:
+            prefix = len(tokens) == 1 and _is_cjk(tokens[0]) and len(tokens[0]) == 1
+            terms.append((tokens, prefix))
+    return terms
+
+
+def fts5_match_query(terms: List[Tuple]) -> str:
+    """SQLite FTS5 MATCH expression for query_terms() output"""
+    # Tokens only contain word characters, so quoting them needs no escaping
+    return " ".join(
+        f'"{tokens[0]}" *' if prefix else '"' + " ".join(tokens) + '"' for tokens, prefix in terms
+    )
+
+
+def tsquery(terms: List[Tuple]) -> str:
+    """PostgreSQL to_tsquery('simple', ...) expression for query_terms() output"""
+    return " & ".join(
+        f"'{tokens[0]}':*" if prefix else "(" + " <-> ".join(f"'{t}'" for t in tokens) + ")"
+        for tokens, prefix in terms
+    )
+
+
+def snippet(text: Optional[str], query: str, before: int = 30, length: int = 120) -> str:
+    """A short excerpt of `text` around the first query word found in it"""
+    text = " ".join((text or "").split())
+    lowered = text.lower()
+    start = -1
+    for word in query.split():
+        start = lowered.find(word.lower())
+        if start >= 0:
+            break
+    start = max(start - before, 0)
+    excerpt = text[start:start + length]
+    if start > 0:
+        excerpt = "…" + excerpt
+    if start + length < len(text):
+        excerpt += "…"
+    return excerpt
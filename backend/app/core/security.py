@@ -1,20 +1,119 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
+
+
+# "scope" claim of stream tokens; login tokens have none, and neither is accepted in place of the other
+STREAM_TOKEN_SCOPE = "events"
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password operations are already queued in this worker"""
+
+
+class PasswordHasherUnavailable(Exception):
+    """The hashing processes keep dying or cannot be started"""
+
+
+def _is_weaker(hashed_password: str) -> bool:
+    """Whether a stored hash uses lower Argon2 parameters than the current settings"""
+    try:
+        parsed = pwd_context.handler("argon2").from_string(hashed_password)
+    except ValueError:
+        return True
+    return (
+        parsed.rounds < settings.ARGON2_TIME_COST
+        or parsed.memory_cost < settings.ARGON2_MEMORY_COST
+        or parsed.parallelism < settings.ARGON2_PARALLELISM
+    )
+
+
+# The two functions below run in the hashing processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    return True, pwd_context.hash(plain_password) if _is_weaker(hashed_password) else None
+
+
+# Argon2 holds the CPU (and ARGON2_MEMORY_COST of RAM) for a long time on purpose,
+# so it runs in separate processes and request threads only wait for the result.
+# The semaphore bounds what may pile up: past the limit callers fail fast instead
+# of queueing behind a login burst
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_QUEUE_LIMIT)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs request threads can copy held locks
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        if settings.PASSWORD_HASH_WORKERS <= 0:
+            return fn(*args)
+        # A hashing process can die (e.g. killed for memory), which breaks the whole
+        # pool: retry once on a fresh one, and give up if that breaks as well
+        for _ in range(2):
+            pool = _get_pool()
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                _discard_pool(pool)
+        raise PasswordHasherUnavailable()
+    finally:
+        _slots.release()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_upgrade_password(plain_password, hashed_password)[0]
+
+
+def verify_and_upgrade_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; on success also returns a new hash if the stored one is weaker than the current parameters"""
+    return _run(_verify, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _run(_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -28,6 +127,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def create_stream_token(user_id: int) -> str:
+    """Short-lived token that only opens event streams, for clients that must put it in the URL"""
+    return create_access_token(
+        {"sub": str(user_id), "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=settings.EVENTS_TOKEN_EXPIRE_SECONDS),
+    )
+
+
 def decode_access_token(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
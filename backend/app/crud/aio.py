@@ -0,0 +1,36 @@
+"""
+Async variants of the crud reads behind the async routes (settings.ASYNC_DB).
+
+Each one runs the sync crud function through AsyncSession.run_sync: SQLAlchemy
+executes it in a greenlet that awaits the async driver (aiosqlite/asyncpg) on
+every round trip, so the event loop is never blocked on the database while
+the queries, paragraph loading and caching stay defined once in app/crud.
+"""
+from functools import wraps
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import chapter, merge_request, novel, search as search_crud
+
+
+def _run_sync(fn):
+    @wraps(fn)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(fn, *args, **kwargs)
+    return wrapper
+
+
+get_novel = _run_sync(novel.get_novel)
+get_novel_version = _run_sync(novel.get_novel_version)
+get_novels = _run_sync(novel.get_novels)
+
+get_chapter_version = _run_sync(chapter.get_chapter_version)
+get_chapter_detail = _run_sync(chapter.get_chapter_detail)
+get_chapter_gzip_parts = _run_sync(chapter.get_chapter_gzip_parts)
+get_chapters_by_novel = _run_sync(chapter.get_chapters_by_novel)
+get_main_chapters = _run_sync(chapter.get_main_chapters)
+get_novel_chapters_version = _run_sync(chapter.get_novel_chapters_version)
+
+get_merge_requests_by_novel = _run_sync(merge_request.get_merge_requests_by_novel)
+
+search = _run_sync(search_crud.search)
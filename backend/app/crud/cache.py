@@ -0,0 +1,384 @@
+"""
+Read-through cache for hot crud reads.
+
+Every worker keeps its own LRU caches, bounded in entries (and optionally in
+approximate bytes), with a TTL on each entry. Entries are grouped: a key is a
+tuple whose first element is the group (e.g. a novel id), and writes drop
+whole groups through invalidate("<cache>:<group>").
+
+invalidate() must be called inside the writing transaction. The keys are
+dropped in this worker when the transaction commits, and the invalidation
+backend tells the other workers:
+
+- DatabaseInvalidationBackend (default) appends the keys to the
+  cache_invalidations table in the same transaction. Before serving from
+  cache, a worker reads the rows added since it last looked, at most once
+  every CACHE_POLL_INTERVAL_SECONDS, so other workers stop serving a
+  stale entry within that interval.
+- LocalInvalidationBackend only invalidates the current process, for a
+  single worker and for tests.
+
+Endpoints that send an ETag pass the version they computed it from to
+cached(). An entry loaded for another version is then reloaded instead of
+served, so a body is never older than the ETag it is sent under, even
+before this worker has seen the invalidation.
+
+Another backend (e.g. Redis pub/sub) only has to implement publish() and
+poll().
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, or_
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.models.cache_invalidation import CacheInvalidation
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(
+        self, name: str, max_entries: int, ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None, sizeof: Optional[Callable[[object], int]] = None
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        # key -> (expires_at, size, version, value)
+        self._entries: "OrderedDict[tuple, Tuple[float, int, Hashable, object]]" = OrderedDict()
+        self._groups: Dict[Hashable, set] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        # Bumped by every invalidation; set() skips values loaded before one
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = self.stale = 0
+
+    def _ttl(self) -> float:
+        return settings.CACHE_TTL_SECONDS if self.ttl is None else self.ttl
+
+    def _remove(self, key: tuple):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+        group = self._groups.get(key[0])
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._groups[key[0]]
+
+    def get(self, key: tuple, version: Hashable = None):
+        """The cached value, or _MISSING; with a version, also _MISSING if the entry was loaded for another one"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            if version is not None and entry[2] != version:
+                self._remove(key)
+                self.stale += 1
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def set(self, key: tuple, value, generation: Optional[int] = None, version: Hashable = None):
+        """Store a value loaded for `version`; skipped if an invalidation happened since `generation` was read"""
+        size = self.sizeof(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self._ttl(), size, version, value)
+            self._groups.setdefault(key[0], set()).add(key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_group(self, group: Hashable):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            for key in list(self._groups.get(group, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._groups.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes if self.max_bytes is not None else None,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale": self.stale,
+            }
+
+
+def _rows_size(rows: List[dict]) -> int:
+    """Rough memory footprint of a list of row dicts, dominated by their strings"""
+    return sum(
+        sys.getsizeof(value) if isinstance(value, str) else 16 for row in rows for value in row.values()
+    ) + 64 * len(rows)
+
+
+CACHES: Dict[str, LRUCache] = {}
+
+
+def _register(cache: LRUCache) -> LRUCache:
+    CACHES[cache.name] = cache
+    return cache
+
+
+# Keyed (novel_id,)
+novel_cache = _register(LRUCache("novel", max_entries=2000))
+# Keyed (novel_id, fields); previews may include chapter bodies, hence the byte budget
+main_chapters_cache = _register(
+    LRUCache("main_chapters", max_entries=500, max_bytes=64 * 1024 * 1024, sizeof=_rows_size)
+)
+# Keyed (novel_id, choices); resolved reading paths, popular ones stay hot
+reading_path_cache = _register(LRUCache(
+    "reading_path", max_entries=2000, max_bytes=32 * 1024 * 1024, sizeof=lambda path: _rows_size(path["chapters"])
+))
+# Keyed (user_id,); the principal behind every authenticated request
+user_cache = _register(LRUCache("user", max_entries=5000, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS))
+# Keyed (token,): verified access tokens -> (user_id, expires_at). A token's
+# signature never changes, so this needs no invalidation; revoking access
+# goes through user_cache
+token_cache = _register(LRUCache("token", max_entries=20000))
+
+
+def _drop(message: str):
+    """Apply an invalidation message of the form "<cache>:<group>" ("*" clears everything)"""
+    if message == "*":
+        for cache in CACHES.values():
+            cache.clear()
+        return
+    name, _, group = message.partition(":")
+    cache = CACHES.get(name)
+    if cache is not None:
+        cache.invalidate_group(int(group) if group.isdigit() else group)
+
+
+class LocalInvalidationBackend:
+    """Invalidations stay in this process"""
+
+    def publish(self, db: Session, messages: Iterable[str]) -> None:
+        pass
+
+    def poll(self, db: Session) -> List[str]:
+        return []
+
+
+class DatabaseInvalidationBackend:
+    """Invalidations shared through the cache_invalidations table
+
+    Rows are read past a high-water mark of the ids seen so far. Ids do not
+    commit in order on PostgreSQL: a transaction can take id 11, and commit
+    after id 12 has already been read. So every id skipped over is kept as a
+    gap and read again on each poll, until its row shows up or
+    GAP_TIMEOUT_SECONDS pass (ids of rolled-back transactions never do).
+    """
+
+    # Pruning happens on every Nth publish of a worker
+    PRUNE_EVERY = 200
+    # Longer than any writing transaction stays open after taking its id
+    GAP_TIMEOUT_SECONDS = 120
+    MAX_GAPS = 10_000
+
+    def __init__(self):
+        self._last_id: Optional[int] = None
+        # Skipped id -> time.monotonic() when it was first skipped
+        self._gaps: Dict[int, float] = {}
+        self._publishes = 0
+        self._lock = threading.Lock()
+
+    def _retention(self) -> timedelta:
+        # A worker that has not polled for longer than this has no live entries left
+        return timedelta(seconds=2 * (settings.CACHE_TTL_SECONDS + settings.CACHE_POLL_INTERVAL_SECONDS) + 60)
+
+    def publish(self, db: Session, messages: Iterable[str]) -> None:
+        db.add_all([CacheInvalidation(key=message) for message in messages])
+        with self._lock:
+            self._publishes += 1
+            prune = self._publishes % self.PRUNE_EVERY == 0
+        if prune:
+            db.query(CacheInvalidation).filter(
+                CacheInvalidation.created_at < datetime.utcnow() - self._retention()
+            ).delete(synchronize_session=False)
+
+    def _advance(self, ids: List[int]):
+        """Move the high-water mark over `ids` (sorted), recording the ids skipped; holds self._lock"""
+        now = time.monotonic()
+        for seen in ids:
+            self._gaps.pop(seen, None)
+            if seen > self._last_id:
+                for missing in range(self._last_id + 1, seen):
+                    self._gaps[missing] = now
+                self._last_id = seen
+        # Oldest first, as inserted
+        for gap, skipped_at in list(self._gaps.items()):
+            if now - skipped_at < self.GAP_TIMEOUT_SECONDS and len(self._gaps) <= self.MAX_GAPS:
+                break
+            del self._gaps[gap]
+
+    def poll(self, db: Session) -> List[str]:
+        with self._lock:
+            last_id = self._last_id
+            gaps = list(self._gaps)
+        if last_id is None:
+            # Nothing is cached yet, so earlier invalidations do not matter, except
+            # those still to commit below the newest id: the recent ids seed the gaps
+            newest = db.query(func.max(CacheInvalidation.id)).scalar() or 0
+            recent = [
+                row_id for row_id, in db.query(CacheInvalidation.id).filter(
+                    CacheInvalidation.id > newest - self.MAX_GAPS
+                ).order_by(CacheInvalidation.id)
+            ]
+            with self._lock:
+                if self._last_id is None:
+                    self._last_id = recent[0] if recent else 0
+                    self._advance(recent)
+            return []
+        condition = CacheInvalidation.id > last_id
+        if gaps:
+            condition = or_(condition, CacheInvalidation.id.in_(gaps))
+        rows = db.query(CacheInvalidation.id, CacheInvalidation.key).filter(condition).order_by(CacheInvalidation.id).all()
+        if not rows:
+            return []
+        with self._lock:
+            # Another thread may have applied some of them meanwhile: reapplying is harmless
+            self._advance([row.id for row in rows])
+        return [row.key for row in rows]
+
+
+_backend = DatabaseInvalidationBackend() if settings.CACHE_BACKEND == "database" else LocalInvalidationBackend()
+_poll_lock = threading.Lock()
+_last_poll = 0.0
+_PENDING = "cache_invalidations"
+
+
+def set_backend(backend) -> None:
+    """Swap the invalidation backend, e.g. for a Redis-backed one or a fake in tests"""
+    global _backend
+    _backend = backend
+    for cache in CACHES.values():
+        cache.clear()
+
+
+def _sync(db: Session) -> None:
+    """Apply invalidations from other workers, at most once per poll interval"""
+    global _last_poll
+    now = time.monotonic()
+    with _poll_lock:
+        if now - _last_poll < settings.CACHE_POLL_INTERVAL_SECONDS:
+            return
+        _last_poll = now
+    for message in _backend.poll(db):
+        _drop(message)
+
+
+def cached(db: Session, cache: LRUCache, key: tuple, load: Callable[[], object], version: Hashable = None):
+    """Return cache[key], calling load() and caching its result on a miss
+
+    `version` is the current version of what load() reads, as read from the
+    database by the caller beforehand; an entry loaded for another version
+    is reloaded. load() runs after that read, so it never returns anything
+    older than `version`.
+    """
+    if not settings.CACHE_ENABLED:
+        return load()
+    _sync(db)
+    value = cache.get(key, version)
+    if value is not _MISSING:
+        return value
+    generation = cache.generation
+    value = load()
+    # Misses are not cached: nothing invalidates the key when the row is created later
+    if value is not None:
+        cache.set(key, value, generation, version)
+    return value
+
+
+def _snapshot(obj) -> Optional[tuple]:
+    if obj is None:
+        return None
+    mapper = inspect(obj).mapper
+    return mapper.class_, {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+
+
+def _restore(db: Session, snapshot: Optional[tuple]):
+    """Attach a cached row to `db` as a persistent object, without querying"""
+    if snapshot is None:
+        return None
+    model, values = snapshot
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return db.merge(obj, load=False)
+
+
+def cached_object(
+    db: Session, cache: LRUCache, key: tuple, load: Callable[[], object], version: Hashable = None
+):
+    """cached() for a single ORM object: the cache holds its column values, and
+    each caller gets an instance attached to its own session"""
+    return _restore(db, cached(db, cache, key, lambda: _snapshot(load()), version))
+
+
+def invalidate(db: Session, *messages: str) -> None:
+    """Drop "<cache>:<group>" entries once the current transaction commits, in every worker"""
+    if not settings.CACHE_ENABLED:
+        return
+    db.info.setdefault(_PENDING, set()).update(messages)
+    _backend.publish(db, messages)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_invalidations(session):
+    for message in session.info.pop(_PENDING, ()):
+        _drop(message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session):
+    session.info.pop(_PENDING, None)
+
+
+def cache_stats() -> dict:
+    return {
+        "enabled": settings.CACHE_ENABLED,
+        "backend": type(_backend).__name__,
+        "caches": {name: cache.stats() for name, cache in CACHES.items()},
+    }
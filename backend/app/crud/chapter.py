@@ -1,36 +1,327 @@
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, insert, literal, or_, select
+from sqlalchemy.orm import Session, aliased
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.core.events import make_event, publish
+from app.crud.cache import cached, invalidate, main_chapters_cache, reading_path_cache
+from app.crud.chapter_diff import drop_chapter_diffs
+from app.crud.novel_stats import BRANCH_COUNTERS, add_stats
+from app.crud.share import ACCEPTED_BRANCHES, add_contributions
+from app.crud.pagination import keyset_paginate
+from app.crud.search import index_chapter, index_chapters, remove_chapter
 from app.models.chapter import Chapter, BranchType
+from app.models.chapter_body import ChapterBody
+from app.models.paragraph import load_paragraph_segments, load_paragraphs, parse_hashes
+from app.models.user import User
+from app.core.importers import ParsedChapter
 from app.schemas.chapter import ChapterCreate
 
+_ParentChapter = aliased(Chapter)
+_BranchChapter = aliased(Chapter)
+
+# Fields a chapter listing can select, mapped to the SQL expression behind them
+CHAPTER_FIELDS = {
+    "id": Chapter.id,
+    "novel_id": Chapter.novel_id,
+    "title": Chapter.title,
+    # Selected as the paragraph hash list and reassembled by _fill_content
+    "content": ChapterBody.paragraph_hashes,
+    "chapter_number": Chapter.chapter_number,
+    "parent_chapter_id": Chapter.parent_chapter_id,
+    "branch_type": Chapter.branch_type,
+    "author_id": Chapter.author_id,
+    "created_at": Chapter.created_at,
+    "updated_at": Chapter.updated_at,
+    "author_username": User.username,
+    "parent_chapter_title": _ParentChapter.title,
+}
+# Listings leave the chapter body out unless it is asked for
+CHAPTER_SUMMARY_FIELDS = tuple(name for name in CHAPTER_FIELDS if name != "content")
+# Fields carried by each node of a fork tree
+CHAPTER_TREE_FIELDS = (
+    "id", "title", "chapter_number", "parent_chapter_id", "branch_type",
+    "author_id", "author_username", "created_at",
+)
+
+# Fields carried by each chapter of a reading path
+CHAPTER_PATH_FIELDS = (
+    "id", "title", "chapter_number", "parent_chapter_id", "branch_type",
+    "author_id", "author_username", "updated_at",
+)
+
+
+def _chapter_listing_query(db: Session, fields: Sequence[str] = CHAPTER_SUMMARY_FIELDS):
+    """Select only the requested chapter fields, joining users/parents when needed"""
+    query = db.query(*[CHAPTER_FIELDS[name].label(name) for name in fields]).select_from(Chapter)
+    if "author_username" in fields:
+        query = query.join(User, Chapter.author_id == User.id)
+    if "parent_chapter_title" in fields:
+        query = query.outerjoin(_ParentChapter, Chapter.parent_chapter_id == _ParentChapter.id)
+    if "content" in fields:
+        query = query.outerjoin(ChapterBody, ChapterBody.chapter_id == Chapter.id)
+    return query
+
+
+def _fill_content(db: Session, items: List[dict]) -> List[dict]:
+    """Turn selected paragraph hash lists back into chapter bodies, batched across rows"""
+    if items and "content" in items[0]:
+        hash_lists = [parse_hashes(item["content"] or "") for item in items]
+        texts = load_paragraphs(db, (h for hashes in hash_lists for h in hashes))
+        for item, hashes in zip(items, hash_lists):
+            item["content"] = "\n".join(texts[h] for h in hashes)
+    return items
+
+
+def _rows_to_dicts(db: Session, rows) -> List[dict]:
+    return _fill_content(db, [row._asdict() for row in rows])
+
+
+def _chapter_event(type: str, chapter: Chapter, users: Sequence[int] = ()) -> dict:
+    return make_event(type, chapter.novel_id, {
+        "id": chapter.id, "title": chapter.title, "chapter_number": chapter.chapter_number,
+        "parent_chapter_id": chapter.parent_chapter_id, "branch_type": BranchType(chapter.branch_type).value,
+        "author_id": chapter.author_id,
+    }, users)
+
 
 def get_chapter(db: Session, chapter_id: int) -> Chapter:
     return db.query(Chapter).filter(Chapter.id == chapter_id).first()
 
 
-def get_chapters_by_novel(db: Session, novel_id: int, skip: int = 0, limit: int = 100) -> List[Chapter]:
-    return db.query(Chapter).filter(Chapter.novel_id == novel_id).offset(skip).limit(limit).all()
+def get_chapter_detail(db: Session, chapter_id: int) -> Optional[dict]:
+    """Get a chapter together with its author username and parent title"""
+    row = _chapter_listing_query(db, fields=list(CHAPTER_FIELDS)).filter(Chapter.id == chapter_id).first()
+    return _rows_to_dicts(db, [row])[0] if row else None
 
 
-def get_main_chapters(db: Session, novel_id: int) -> List[Chapter]:
-    return db.query(Chapter).filter(
-        Chapter.novel_id == novel_id,
-        Chapter.branch_type == BranchType.MAIN
-    ).order_by(Chapter.chapter_number).all()
+def get_chapter_version(db: Session, chapter_id: int):
+    """What a chapter's detail view depends on, without reading the body
+
+    Returns (updated_at, content_hash, parent_updated_at), or None if the
+    chapter does not exist. The parent is included for parent_chapter_title.
+    """
+    return db.query(
+        Chapter.updated_at, ChapterBody.content_hash, _ParentChapter.updated_at.label("parent_updated_at")
+    ).select_from(Chapter).outerjoin(
+        ChapterBody, ChapterBody.chapter_id == Chapter.id
+    ).outerjoin(
+        _ParentChapter, Chapter.parent_chapter_id == _ParentChapter.id
+    ).filter(Chapter.id == chapter_id).first()
+
+
+def _chapter_set_version(db: Session, *criteria) -> Tuple[int, Optional[datetime]]:
+    """Row count and latest updated_at of the chapters matching `criteria`
+
+    Any insert, update or delete among them changes one of the two.
+    """
+    count, last_updated = db.query(func.count(Chapter.id), func.max(Chapter.updated_at)).filter(*criteria).one()
+    return count, last_updated
+
+
+def get_novel_chapters_version(db: Session, novel_id: int) -> Tuple[int, Optional[datetime]]:
+    """Version of every chapter listing scoped to a novel"""
+    return _chapter_set_version(db, Chapter.novel_id == novel_id)
+
+
+def get_child_chapters_version(db: Session, parent_chapter_id: int) -> Tuple[int, Optional[datetime]]:
+    """Version of the fork/merged listings of a parent chapter, including the parent's own title"""
+    return _chapter_set_version(
+        db, or_(Chapter.id == parent_chapter_id, Chapter.parent_chapter_id == parent_chapter_id)
+    )
+
+
+def get_chapter_gzip_parts(db: Session, chapter_id: int) -> Optional[dict]:
+    """Everything needed to stream a chapter as precompressed JSON
+
+    Returns the chapter metadata plus the stored paragraph segments and body
+    checksum, for app.core.compression.gzip_json_with_content.
+    """
+    fields = [name for name in CHAPTER_FIELDS if name != "content"]
+    row = _chapter_listing_query(db, fields).add_columns(
+        ChapterBody.paragraph_hashes, ChapterBody.json_crc32, ChapterBody.json_size
+    ).join(ChapterBody, ChapterBody.chapter_id == Chapter.id).filter(Chapter.id == chapter_id).first()
+    if row is None:
+        return None
+    metadata = row._asdict()
+    hashes = parse_hashes(metadata.pop("paragraph_hashes"))
+    crc = metadata.pop("json_crc32")
+    size = metadata.pop("json_size")
+    segments = load_paragraph_segments(db, hashes)
+    return {
+        "metadata": metadata,
+        "segments": [segments[h] for h in hashes],
+        "crc": crc,
+        "size": size,
+    }
+
+
+def get_chapters_by_novel(
+    db: Session, novel_id: int, cursor: Optional[str] = None, limit: int = 100,
+    fields: Sequence[str] = CHAPTER_SUMMARY_FIELDS
+) -> Tuple[List[dict], Optional[str]]:
+    """Get one page of a novel's chapters ordered by (chapter_number, id) and the next cursor"""
+    query = _chapter_listing_query(db, fields).filter(Chapter.novel_id == novel_id)
+    items, next_cursor = keyset_paginate(query, (Chapter.chapter_number, Chapter.id), cursor, limit)
+    return _fill_content(db, items), next_cursor
+
+
+def get_main_chapters(
+    db: Session, novel_id: int, fields: Sequence[str] = CHAPTER_SUMMARY_FIELDS, version: Optional[tuple] = None
+) -> List[dict]:
+    """Main-line chapters in order, from cache; `version` is get_novel_chapters_version, if the caller read it"""
+    def load():
+        rows = _chapter_listing_query(db, fields).filter(
+            Chapter.novel_id == novel_id,
+            Chapter.branch_type == BranchType.MAIN
+        ).order_by(Chapter.chapter_number).all()
+        return _rows_to_dicts(db, rows)
+
+    # Copies, so callers cannot change the cached rows
+    return [dict(row) for row in cached(db, main_chapters_cache, (novel_id, tuple(fields)), load, version)]
 
 
 def create_chapter(db: Session, chapter: ChapterCreate, novel_id: int, author_id: int) -> Chapter:
     db_chapter = Chapter(**chapter.model_dump(), novel_id=novel_id, author_id=author_id)
     db.add(db_chapter)
+    db.flush()
+    index_chapter(db, db_chapter)
+    add_stats(db, novel_id, touched=True, **{BRANCH_COUNTERS[db_chapter.branch_type]: 1})
+    if db_chapter.branch_type in ACCEPTED_BRANCHES:
+        add_contributions(db, novel_id, {author_id: 1})
+    invalidate(db, f"main_chapters:{novel_id}", f"reading_path:{novel_id}")
+    publish(db, _chapter_event("chapter.created", db_chapter))
     db.commit()
     db.refresh(db_chapter)
     return db_chapter
 
 
+# Chapters fetched per round trip by iter_main_chapters
+EXPORT_BATCH_SIZE = 100
+
+
+def iter_main_chapters(db: Session, novel_id: int) -> Iterator[dict]:
+    """A novel's main-line chapters with their bodies, in chapter_number order
+
+    Rows come through a server-side cursor (yield_per) and paragraph text is
+    loaded one batch at a time, so memory does not grow with the novel.
+    """
+    query = _chapter_listing_query(db, ("id", "title", "chapter_number", "content")).filter(
+        Chapter.novel_id == novel_id,
+        Chapter.branch_type == BranchType.MAIN
+    ).order_by(Chapter.chapter_number, Chapter.id).yield_per(EXPORT_BATCH_SIZE)
+    batch = []
+    for row in query:
+        batch.append(row._asdict())
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield from _fill_content(db, batch)
+            batch = []
+    yield from _fill_content(db, batch)
+
+
+# Chapters inserted per flush by import_chapters
+IMPORT_BATCH_SIZE = 200
+# Per-chapter errors kept for the import summary; further ones are only counted
+MAX_IMPORT_ERRORS = 500
+
+
+def import_chapters(
+    db: Session, novel_id: int, author_id: int, chapters: Iterable[ParsedChapter]
+) -> Iterator[dict]:
+    """Append parsed chapters to a novel's main line, all in one transaction
+
+    Chapters are numbered after the current last main chapter and inserted
+    IMPORT_BATCH_SIZE at a time. Yields {"event": "progress", ...} after each
+    batch and {"event": "done", ...} once committed; chapters with a parse
+    error are skipped and listed in the summary. If reading fails part way,
+    the exception propagates and nothing is committed.
+    """
+    last_number = db.query(func.max(Chapter.chapter_number)).filter(
+        Chapter.novel_id == novel_id, Chapter.branch_type == BranchType.MAIN
+    ).scalar() or 0
+    next_number = last_number + 1
+    imported = failed = 0
+    errors: List[dict] = []
+    batch: List[Tuple[int, ParsedChapter]] = []
+
+    def flush_batch():
+        # Core INSERT ... RETURNING: the ORM unit of work inserts self-referential
+        # rows one statement at a time. Ids are matched back by chapter number,
+        # since a multi-row RETURNING does not promise to keep the row order
+        rows = db.execute(
+            insert(Chapter).returning(Chapter.id, Chapter.chapter_number),
+            [
+                {
+                    "novel_id": novel_id, "title": parsed.title, "chapter_number": number,
+                    "branch_type": BranchType.MAIN, "author_id": author_id,
+                }
+                for number, parsed in batch
+            ]
+        ).all()
+        ids = {row.chapter_number: row.id for row in rows}
+        bodies = []
+        for number, parsed in batch:
+            body = ChapterBody(chapter_id=ids[number])
+            body.set_text(parsed.content)
+            bodies.append(body)
+        db.add_all(bodies)
+        db.flush()
+        index_chapters(db, [(ids[number], novel_id, parsed.title, parsed.content) for number, parsed in batch])
+        # Keep the identity map from growing with the book
+        for body in bodies:
+            db.expunge(body)
+        batch.clear()
+
+    for parsed in chapters:
+        if parsed.error:
+            failed += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({"position": parsed.position, "title": parsed.title, "error": parsed.error})
+            continue
+        batch.append((next_number, parsed))
+        next_number += 1
+        imported += 1
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush_batch()
+            yield {"event": "progress", "imported": imported, "failed": failed}
+    if batch:
+        flush_batch()
+    if imported:
+        add_stats(db, novel_id, touched=True, chapter_count=imported)
+        add_contributions(db, novel_id, {author_id: imported})
+        invalidate(db, f"main_chapters:{novel_id}", f"reading_path:{novel_id}")
+        publish(db, make_event("chapter.imported", novel_id, {
+            "count": imported, "first_chapter_number": last_number + 1, "last_chapter_number": next_number - 1,
+        }))
+    db.commit()
+    yield {
+        "event": "done",
+        "imported": imported,
+        "failed": failed,
+        "first_chapter_number": last_number + 1 if imported else None,
+        "last_chapter_number": next_number - 1 if imported else None,
+        "errors": errors,
+    }
+
+
 def update_chapter(db: Session, chapter_id: int, chapter_data: dict) -> Chapter:
     db_chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
+    old_branch = db_chapter.branch_type
+    old_hash = db_chapter.body.content_hash if "content" in chapter_data and db_chapter.body else None
     for key, value in chapter_data.items():
         setattr(db_chapter, key, value)
+    if old_hash and db_chapter.body.content_hash != old_hash:
+        drop_chapter_diffs(db, [old_hash])
+    if "title" in chapter_data or "content" in chapter_data:
+        index_chapter(db, db_chapter)
+    moves = {}
+    if db_chapter.branch_type != old_branch:
+        new_branch = BranchType(db_chapter.branch_type)
+        moves = {BRANCH_COUNTERS[old_branch]: -1, BRANCH_COUNTERS[new_branch]: 1}
+        accepted = (new_branch in ACCEPTED_BRANCHES) - (old_branch in ACCEPTED_BRANCHES)
+        add_contributions(db, db_chapter.novel_id, {db_chapter.author_id: accepted})
+    add_stats(db, db_chapter.novel_id, touched=True, **moves)
+    invalidate(db, f"main_chapters:{db_chapter.novel_id}", f"reading_path:{db_chapter.novel_id}")
+    publish(db, _chapter_event("chapter.updated", db_chapter))
     db.commit()
     db.refresh(db_chapter)
     return db_chapter
@@ -39,6 +330,14 @@ def update_chapter(db: Session, chapter_id: int, chapter_data: dict) -> Chapter:
 def delete_chapter(db: Session, chapter_id: int) -> bool:
     db_chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
     if db_chapter:
+        remove_chapter(db, chapter_id)
+        content_hash = db.query(ChapterBody.content_hash).filter(ChapterBody.chapter_id == chapter_id).scalar()
+        drop_chapter_diffs(db, [content_hash])
+        add_stats(db, db_chapter.novel_id, **{BRANCH_COUNTERS[db_chapter.branch_type]: -1})
+        if db_chapter.branch_type in ACCEPTED_BRANCHES:
+            add_contributions(db, db_chapter.novel_id, {db_chapter.author_id: -1})
+        invalidate(db, f"main_chapters:{db_chapter.novel_id}", f"reading_path:{db_chapter.novel_id}")
+        publish(db, _chapter_event("chapter.deleted", db_chapter))
         db.delete(db_chapter)
         db.commit()
         return True
@@ -57,30 +356,155 @@ def fork_chapter(db: Session, chapter_id: int, author_id: int, title: str, conte
         author_id=author_id
     )
     db.add(db_chapter)
+    db.flush()
+    index_chapter(db, db_chapter)
+    add_stats(db, db_chapter.novel_id, touched=True, fork_count=1)
+    # Paths through the parent now offer one more branch
+    invalidate(db, f"reading_path:{db_chapter.novel_id}")
+    # The parent's author hears about forks of their chapter even without following the novel
+    publish(db, _chapter_event("chapter.forked", db_chapter, users=[original_chapter.author_id]))
     db.commit()
     db.refresh(db_chapter)
     return db_chapter
 
 
-def get_fork_chapters(db: Session, parent_chapter_id: int) -> List[Chapter]:
+def get_fork_chapters(db: Session, parent_chapter_id: int, fields: Sequence[str] = CHAPTER_SUMMARY_FIELDS) -> List[dict]:
     """Get all fork chapters of a parent chapter (excluding merged ones)"""
-    return db.query(Chapter).filter(
+    rows = _chapter_listing_query(db, fields).filter(
         Chapter.parent_chapter_id == parent_chapter_id,
         Chapter.branch_type == BranchType.FORK
     ).all()
+    return _rows_to_dicts(db, rows)
 
 
-def get_merged_chapters(db: Session, novel_id: int) -> List[Chapter]:
+def get_merged_chapters(db: Session, novel_id: int, fields: Sequence[str] = CHAPTER_SUMMARY_FIELDS) -> List[dict]:
     """Get all merged chapters for a novel"""
-    return db.query(Chapter).filter(
+    rows = _chapter_listing_query(db, fields).filter(
         Chapter.novel_id == novel_id,
         Chapter.branch_type == BranchType.MERGED
     ).order_by(Chapter.chapter_number).all()
+    return _rows_to_dicts(db, rows)
 
 
-def get_merged_chapters_for_parent(db: Session, parent_chapter_id: int) -> List[Chapter]:
+def get_merged_chapters_for_parent(
+    db: Session, parent_chapter_id: int, fields: Sequence[str] = CHAPTER_SUMMARY_FIELDS
+) -> List[dict]:
     """Get all merged chapters that were forked from a specific parent chapter"""
-    return db.query(Chapter).filter(
+    rows = _chapter_listing_query(db, fields).filter(
         Chapter.parent_chapter_id == parent_chapter_id,
         Chapter.branch_type == BranchType.MERGED
     ).all()
+    return _rows_to_dicts(db, rows)
+
+
+def _chapter_tree(db: Session, anchor, max_depth: int, max_nodes: int) -> Tuple[List[dict], int, bool]:
+    """Walk the fork tree below the chapters matched by `anchor` in one recursive CTE
+
+    Returns (root nodes with nested `children`, node count, truncated). Nodes come
+    back breadth-first, so when `max_nodes` cuts the result every kept node still
+    has its parent.
+    """
+    tree = select(
+        Chapter.id, literal(0).label("depth")
+    ).where(anchor).cte("chapter_tree", recursive=True)
+    # Recurse one level past max_depth so a depth cut can be reported
+    tree = tree.union_all(
+        select(Chapter.id, tree.c.depth + 1).where(
+            Chapter.parent_chapter_id == tree.c.id,
+            tree.c.depth <= max_depth
+        )
+    )
+    rows = _chapter_listing_query(db, CHAPTER_TREE_FIELDS).add_columns(tree.c.depth.label("depth")).join(
+        tree, tree.c.id == Chapter.id
+    ).order_by(tree.c.depth, Chapter.chapter_number, Chapter.id).limit(max_nodes + 1).all()
+
+    kept = [row for row in rows[:max_nodes] if row.depth <= max_depth]
+    truncated = len(kept) < len(rows)
+    nodes = {}
+    roots = []
+    for row in kept:
+        node = row._asdict()
+        node["children"] = []
+        nodes[node["id"]] = node
+        parent = nodes.get(node["parent_chapter_id"]) if node["depth"] > 0 else None
+        if parent is not None:
+            parent["children"].append(node)
+        else:
+            roots.append(node)
+    return roots, len(nodes), truncated
+
+
+def get_chapter_tree(db: Session, chapter_id: int, max_depth: int = 20, max_nodes: int = 500):
+    """Get the fork tree rooted at a chapter"""
+    roots, count, truncated = _chapter_tree(db, Chapter.id == chapter_id, max_depth, max_nodes)
+    return {"roots": roots, "node_count": count, "truncated": truncated}
+
+
+def get_novel_chapter_tree(db: Session, novel_id: int, max_depth: int = 20, max_nodes: int = 500):
+    """Get the fork trees of every top-level chapter in a novel"""
+    anchor = (Chapter.novel_id == novel_id) & Chapter.parent_chapter_id.is_(None)
+    roots, count, truncated = _chapter_tree(db, anchor, max_depth, max_nodes)
+    return {"roots": roots, "node_count": count, "truncated": truncated}
+
+
+def get_reading_path(db: Session, novel_id: int, choices: Sequence[int] = ()) -> dict:
+    """Resolve the chapters a reader goes through, given the branches they picked
+
+    The path follows the main line in chapter order. Where a chapter on it is
+    the parent of a chosen fork or merged chapter, the path takes that branch
+    instead and follows it down through further chosen children, ending at the
+    last one; a branch does not rejoin the main line. When several choices
+    share a parent the first one given wins; choices that are never reached
+    (other novels, other storylines, deleted chapters) are returned in
+    `ignored_choices`.
+
+    Each chapter carries its prev/next neighbours on the path and
+    `branch_count`, the number of forks and merged chapters branching off it.
+    All chapters come from one query; results are cached per novel.
+    """
+    choices = tuple(dict.fromkeys(choices))
+
+    def load():
+        branch_count = select(func.count(_BranchChapter.id)).where(
+            _BranchChapter.parent_chapter_id == Chapter.id,
+            _BranchChapter.branch_type.in_((BranchType.FORK, BranchType.MERGED))
+        ).correlate(Chapter).scalar_subquery()
+        on_path = Chapter.branch_type == BranchType.MAIN
+        if choices:
+            on_path = or_(on_path, Chapter.id.in_(choices))
+        rows = _chapter_listing_query(db, CHAPTER_PATH_FIELDS).add_columns(
+            branch_count.label("branch_count")
+        ).filter(Chapter.novel_id == novel_id, on_path).order_by(Chapter.chapter_number, Chapter.id).all()
+
+        by_id = {row.id: row for row in rows}
+        chosen = {}
+        for chapter_id in choices:
+            row = by_id.get(chapter_id)
+            if row is not None and row.branch_type != BranchType.MAIN:
+                chosen.setdefault(row.parent_chapter_id, row)
+        main_line = iter([row for row in rows if row.branch_type == BranchType.MAIN])
+        path = []
+        row = next(main_line, None)
+        while row is not None:
+            path.append(row._asdict())
+            branch = chosen.pop(row.id, None)
+            if branch is not None:
+                row = branch
+            elif row.branch_type == BranchType.MAIN:
+                row = next(main_line, None)
+            else:
+                row = None
+        for index, chapter in enumerate(path):
+            chapter["prev_chapter_id"] = path[index - 1]["id"] if index else None
+            chapter["next_chapter_id"] = path[index + 1]["id"] if index + 1 < len(path) else None
+        taken = {chapter["id"] for chapter in path}
+        return {
+            "novel_id": novel_id,
+            "choices": [chapter_id for chapter_id in choices if chapter_id in taken],
+            "ignored_choices": [chapter_id for chapter_id in choices if chapter_id not in taken],
+            "chapters": path,
+        }
+
+    path = cached(db, reading_path_cache, (novel_id, choices), load)
+    # Copies, so callers cannot change the cached rows
+    return {**path, "chapters": [dict(chapter) for chapter in path["chapters"]]}
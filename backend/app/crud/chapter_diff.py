@@ -0,0 +1,98 @@
+import json
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, aliased
+
+from app.core.database import insert_ignore
+from app.core.diff import diff_paragraphs
+from app.crud.job import job_handler
+from app.models.chapter import Chapter
+from app.models.chapter_body import ChapterBody
+from app.models.chapter_diff import ChapterDiff
+from app.models.merge_request import MergeRequest, MergeStatus
+from app.models.paragraph import load_paragraphs, parse_hashes
+
+
+def get_chapter_diff(db: Session, base_chapter_id: int, head_chapter_id: int, store: bool = True) -> Optional[str]:
+    """JSON diff from one chapter's body to another's, computed once per pair of contents
+
+    `store=False` computes a missing diff without keeping it, for requests
+    that are no longer reviewed. Returns None if either chapter has no body.
+    """
+    hashes = dict(
+        db.query(ChapterBody.chapter_id, ChapterBody.content_hash)
+        .filter(ChapterBody.chapter_id.in_([base_chapter_id, head_chapter_id]))
+    )
+    if base_chapter_id not in hashes or head_chapter_id not in hashes:
+        return None
+    base_hash, head_hash = hashes[base_chapter_id], hashes[head_chapter_id]
+
+    cached = db.query(ChapterDiff.diff).filter(
+        ChapterDiff.base_hash == base_hash, ChapterDiff.head_hash == head_hash
+    ).scalar()
+    if cached is not None:
+        return cached
+
+    paragraph_hashes = dict(
+        db.query(ChapterBody.chapter_id, ChapterBody.paragraph_hashes)
+        .filter(ChapterBody.chapter_id.in_([base_chapter_id, head_chapter_id]))
+    )
+    base_paragraphs = parse_hashes(paragraph_hashes[base_chapter_id])
+    head_paragraphs = parse_hashes(paragraph_hashes[head_chapter_id])
+    texts = load_paragraphs(db, base_paragraphs + head_paragraphs)
+    diff = json.dumps(
+        diff_paragraphs(base_paragraphs, head_paragraphs, texts), ensure_ascii=False, separators=(",", ":")
+    )
+    if not store:
+        return diff
+    # Two reviewers may compute the same diff at once; either copy is fine
+    insert_ignore(
+        db, ChapterDiff, [{"base_hash": base_hash, "head_hash": head_hash, "diff": diff}],
+        index_elements=["base_hash", "head_hash"]
+    )
+    db.commit()
+    return diff
+
+
+def drop_chapter_diffs(db: Session, content_hashes: Iterable[Optional[str]]):
+    """Delete the cached diffs from or to these contents, in the caller's transaction
+
+    For chapters whose content changed or that were deleted. Another chapter
+    with the same content just computes its diff again.
+    """
+    hashes = sorted({content_hash for content_hash in content_hashes if content_hash})
+    if not hashes:
+        return
+    for column in (ChapterDiff.base_hash, ChapterDiff.head_hash):
+        db.query(ChapterDiff).filter(column.in_(hashes)).delete(synchronize_session=False)
+
+
+def drop_merge_request_diffs(db: Session, from_chapter_ids: Sequence[int]):
+    """Delete the cached diffs of merge requests that left pending, in the caller's transaction"""
+    if not from_chapter_ids:
+        return
+    parent_body = aliased(ChapterBody)
+    pairs = db.query(parent_body.content_hash, ChapterBody.content_hash).select_from(Chapter).join(
+        ChapterBody, ChapterBody.chapter_id == Chapter.id
+    ).join(
+        parent_body, parent_body.chapter_id == Chapter.parent_chapter_id
+    ).filter(Chapter.id.in_(from_chapter_ids)).all()
+    if pairs:
+        db.query(ChapterDiff).filter(
+            tuple_(ChapterDiff.base_hash, ChapterDiff.head_hash).in_([tuple(pair) for pair in pairs])
+        ).delete(synchronize_session=False)
+
+
+@job_handler("merge_request.diff")
+def precompute_merge_request_diff(db: Session, payload: dict):
+    """Compute a new merge request's diff before its reviewer opens it"""
+    chapter = db.query(Chapter.id, Chapter.parent_chapter_id).join(
+        MergeRequest, MergeRequest.from_chapter_id == Chapter.id
+    ).filter(
+        MergeRequest.id == payload["merge_request_id"], MergeRequest.status == MergeStatus.PENDING
+    ).first()
+    # Reviewed already, gone or not a branch any more: nobody is waiting for this diff
+    if chapter is None or chapter.parent_chapter_id is None:
+        return
+    get_chapter_diff(db, base_chapter_id=chapter.parent_chapter_id, head_chapter_id=chapter.id)
@@ -0,0 +1,29 @@
+from sqlalchemy.orm import Session
+from typing import Set
+from app.core.database import insert_ignore
+from app.core.events import make_event, publish
+from app.models.novel import Novel
+from app.models.novel_follow import NovelFollow
+
+
+def follow_novel(db: Session, user_id: int, novel_id: int):
+    """Follow a novel; following it again changes nothing"""
+    insert_ignore(db, NovelFollow, [{"user_id": user_id, "novel_id": novel_id}], ["user_id", "novel_id"])
+    # Open streams of this user start receiving the novel's events
+    publish(db, make_event("follow.changed", None, {"novel_id": novel_id, "following": True}, users=[user_id]))
+    db.commit()
+
+
+def unfollow_novel(db: Session, user_id: int, novel_id: int):
+    db.query(NovelFollow).filter(
+        NovelFollow.user_id == user_id, NovelFollow.novel_id == novel_id
+    ).delete(synchronize_session=False)
+    publish(db, make_event("follow.changed", None, {"novel_id": novel_id, "following": False}, users=[user_id]))
+    db.commit()
+
+
+def get_followed_novel_ids(db: Session, user_id: int) -> Set[int]:
+    """Novels whose events a user receives: those they follow and those they wrote"""
+    followed = db.query(NovelFollow.novel_id).filter(NovelFollow.user_id == user_id)
+    authored = db.query(Novel.id).filter(Novel.author_id == user_id)
+    return {novel_id for novel_id, in followed} | {novel_id for novel_id, in authored}
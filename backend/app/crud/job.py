@@ -0,0 +1,195 @@
+"""
+Durable background jobs kept in the jobs table.
+
+enqueue() only adds a row to the caller's session, so a job is committed
+together with the change that needs it, or not at all. Workers
+(python -m app.worker) claim due jobs under a lease, run their handler and
+mark them done. A failed attempt is retried with exponential backoff until
+max_attempts, after which the job stays as failed. A job may run more than
+once (its worker can die after the handler committed but before the job was
+marked done), so handlers must be idempotent.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Sequence
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job, JobStatus
+
+JobHandler = Callable[[Session, dict], None]
+_HANDLERS: Dict[str, JobHandler] = {}
+
+# job_stats reports the jobs finished within this window
+STATS_WINDOW = timedelta(hours=1)
+STATS_SAMPLE_LIMIT = 10_000
+PRUNE_BATCH_SIZE = 1000
+# Tail of the traceback kept in last_error
+MAX_ERROR_LENGTH = 4000
+
+
+def job_handler(kind: str):
+    """Register the decorated function(db, payload) as the handler of `kind` jobs
+
+    The handler runs in a session of its own that the worker commits after
+    it returns; raising fails the attempt and rolls that session back.
+    """
+    def register(function: JobHandler) -> JobHandler:
+        _HANDLERS[kind] = function
+        return function
+    return register
+
+
+def get_job_handler(kind: str) -> Optional[JobHandler]:
+    return _HANDLERS.get(kind)
+
+
+def enqueue(
+    db: Session, kind: str, payload: Optional[dict] = None, delay: float = 0, max_attempts: Optional[int] = None
+) -> Job:
+    """Add a job to the caller's transaction; workers see it once that commits"""
+    now = datetime.utcnow()
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}, ensure_ascii=False, default=str),
+        status=JobStatus.QUEUED,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    db.add(job)
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before retrying a job that failed its `attempts`-th attempt"""
+    return min(settings.JOBS_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.JOBS_RETRY_BACKOFF_MAX_SECONDS)
+
+
+def claim_jobs(db: Session, worker: str, limit: int = 1, now: Optional[datetime] = None) -> list:
+    """Lease up to `limit` due jobs to `worker` and commit
+
+    Returns rows of (id, kind, payload, attempts, max_attempts), attempts
+    counting the one just started. The claim happens in the UPDATE that
+    reads the jobs, so two workers never get the same job within a lease.
+    """
+    now = now or datetime.utcnow()
+    due = (Job.finished_at.is_(None), Job.run_at <= now)
+    # A lease that ran out on the final attempt (its worker died) is not retried again
+    db.execute(
+        update(Job).where(*due, Job.status == JobStatus.RUNNING, Job.attempts >= Job.max_attempts).values(
+            status=JobStatus.FAILED, finished_at=now, locked_by=None,
+            last_error="Lease expired on the final attempt"
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    # SKIP LOCKED lets concurrent PostgreSQL workers claim different jobs; SQLite ignores it
+    claim = select(Job.id).where(*due).order_by(Job.run_at, Job.id).limit(limit).with_for_update(skip_locked=True)
+    rows = db.execute(
+        update(Job).where(Job.id.in_(claim), *due).values(
+            status=JobStatus.RUNNING, attempts=Job.attempts + 1, locked_by=worker, started_at=now,
+            run_at=now + timedelta(seconds=settings.JOBS_VISIBILITY_TIMEOUT_SECONDS)
+        ).returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts),
+        execution_options={"synchronize_session": False}
+    ).all()
+    db.commit()
+    return sorted(rows, key=lambda row: row.id)
+
+
+def _release(db: Session, job_id: int, worker: str, **values) -> bool:
+    """Update a job still leased to `worker` and commit; False if the lease was lost"""
+    result = db.execute(
+        update(Job).where(Job.id == job_id, Job.locked_by == worker, Job.status == JobStatus.RUNNING).values(
+            locked_by=None, **values
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def complete_job(db: Session, job_id: int, worker: str, now: Optional[datetime] = None) -> bool:
+    return _release(db, job_id, worker, status=JobStatus.DONE, finished_at=now or datetime.utcnow())
+
+
+def fail_job(db: Session, job, worker: str, error: str, now: Optional[datetime] = None) -> bool:
+    """Record a failed attempt of a claimed job: requeue it after a backoff, or give up after max_attempts"""
+    now = now or datetime.utcnow()
+    error = error[-MAX_ERROR_LENGTH:]
+    if job.attempts >= job.max_attempts:
+        return _release(db, job.id, worker, status=JobStatus.FAILED, finished_at=now, last_error=error)
+    return _release(
+        db, job.id, worker, status=JobStatus.QUEUED, last_error=error,
+        run_at=now + timedelta(seconds=retry_delay(job.attempts))
+    )
+
+
+def prune_jobs(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete jobs finished more than JOBS_RETENTION_HOURS ago, one commit per batch"""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=settings.JOBS_RETENTION_HOURS)
+    deleted = 0
+    while True:
+        batch = select(Job.id).where(Job.finished_at < cutoff).limit(PRUNE_BATCH_SIZE)
+        count = db.execute(
+            delete(Job).where(Job.id.in_(batch)), execution_options={"synchronize_session": False}
+        ).rowcount
+        db.commit()
+        deleted += count
+        if count < PRUNE_BATCH_SIZE:
+            return deleted
+
+
+def _percentiles_ms(seconds: Sequence[float]) -> dict:
+    values = sorted(seconds)
+    if not values:
+        return {"samples": 0, "p50": None, "p95": None, "p99": None, "max": None}
+
+    def pick(p: float) -> float:
+        return round(values[min(int(len(values) * p), len(values) - 1)] * 1000, 1)
+
+    return {"samples": len(values), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1] * 1000, 1)}
+
+
+def job_stats(db: Session, now: Optional[datetime] = None) -> dict:
+    """Queue depth per kind, and counts and latency of the jobs finished in the last STATS_WINDOW
+
+    wait_ms runs from enqueue to the start of the attempt that finished the
+    job (retry backoff included), run_ms is that attempt's duration.
+    """
+    now = now or datetime.utcnow()
+    queue: Dict[str, Dict[str, int]] = {}
+    totals = {"queued": 0, "ready": 0, "running": 0, "expired_leases": 0}
+    oldest_ready: Optional[datetime] = None
+    depth = db.query(
+        Job.kind, Job.status, func.count(), func.sum(case((Job.run_at <= now, 1), else_=0)), func.min(Job.run_at)
+    ).filter(Job.finished_at.is_(None)).group_by(Job.kind, Job.status)
+    for kind, status, count, due, first_run_at in depth:
+        counts = queue.setdefault(kind, {"queued": 0, "ready": 0, "running": 0, "expired_leases": 0})
+        if status == JobStatus.RUNNING:
+            updates = {"running": count, "expired_leases": due}
+        else:
+            updates = {"queued": count, "ready": due}
+            if due and (oldest_ready is None or first_run_at < oldest_ready):
+                oldest_ready = first_run_at
+        for name, value in updates.items():
+            counts[name] += value
+            totals[name] += value
+
+    finished = db.query(
+        Job.status, Job.attempts, Job.created_at, Job.started_at, Job.finished_at
+    ).filter(Job.finished_at >= now - STATS_WINDOW).order_by(Job.finished_at.desc()).limit(STATS_SAMPLE_LIMIT).all()
+    done = [row for row in finished if row.status == JobStatus.DONE]
+    return {
+        **totals,
+        "oldest_ready_seconds": round((now - oldest_ready).total_seconds(), 1) if oldest_ready else None,
+        "queue": queue,
+        "last_hour": {
+            "done": len(done),
+            "failed": len(finished) - len(done),
+            "retried": sum(1 for row in done if row.attempts > 1),
+            "wait_ms": _percentiles_ms([(row.started_at - row.created_at).total_seconds() for row in done]),
+            "run_ms": _percentiles_ms([(row.finished_at - row.started_at).total_seconds() for row in done]),
+        },
+    }
@@ -1,18 +1,62 @@
+from sqlalchemy import exists, select, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
+from app.core.events import make_event, publish
+from app.crud.cache import invalidate
+from app.crud.chapter_diff import drop_merge_request_diffs
+from app.crud.job import enqueue
+from app.crud.novel_stats import add_stats
+from app.crud.pagination import keyset_paginate
+from app.crud.share import add_contributions
+from app.models.chapter import BranchType, Chapter
 from app.models.merge_request import MergeRequest, MergeStatus
+from app.models.user import User
 from app.schemas.merge_request import MergeRequestCreate
 
+# Fields a merge request listing can select, mapped to the SQL expression behind them
+MERGE_REQUEST_FIELDS = {
+    "id": MergeRequest.id,
+    "from_chapter_id": MergeRequest.from_chapter_id,
+    "to_novel_id": MergeRequest.to_novel_id,
+    "status": MergeRequest.status,
+    "requested_by": MergeRequest.requested_by,
+    "review_comment": MergeRequest.review_comment,
+    "created_at": MergeRequest.created_at,
+    "reviewed_at": MergeRequest.reviewed_at,
+    "from_chapter_title": Chapter.title,
+    "requester_username": User.username,
+}
+
+
+def _merge_request_listing_query(db: Session, fields: Sequence[str]):
+    """Select only the requested merge request fields, joining chapters/users when needed"""
+    query = db.query(
+        *[MERGE_REQUEST_FIELDS[name].label(name) for name in fields]
+    ).select_from(MergeRequest)
+    if "from_chapter_title" in fields:
+        query = query.outerjoin(Chapter, MergeRequest.from_chapter_id == Chapter.id)
+    if "requester_username" in fields:
+        query = query.join(User, MergeRequest.requested_by == User.id)
+    return query
+
 
 def get_merge_request(db: Session, mr_id: int) -> MergeRequest:
     return db.query(MergeRequest).filter(MergeRequest.id == mr_id).first()
 
 
-def get_merge_requests_by_novel(db: Session, novel_id: int, skip: int = 0, limit: int = 100) -> List[MergeRequest]:
-    return db.query(MergeRequest).filter(
-        MergeRequest.to_novel_id == novel_id
-    ).offset(skip).limit(limit).all()
+def get_merge_requests_by_novel(
+    db: Session, novel_id: int, cursor: Optional[str] = None, limit: int = 100,
+    fields: Sequence[str] = tuple(MERGE_REQUEST_FIELDS), statuses: Optional[Sequence[MergeStatus]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Get one page of a novel's merge requests ordered by (created_at, id) and the next cursor
+
+    `statuses` limits the page to requests in those states.
+    """
+    query = _merge_request_listing_query(db, fields).filter(MergeRequest.to_novel_id == novel_id)
+    if statuses:
+        query = query.filter(MergeRequest.status.in_(statuses))
+    return keyset_paginate(query, (MergeRequest.created_at, MergeRequest.id), cursor, limit)
 
 
 def get_pending_merge_request_for_chapter(db: Session, chapter_id: int) -> MergeRequest:
@@ -23,29 +67,178 @@ def get_pending_merge_request_for_chapter(db: Session, chapter_id: int) -> Merge
     ).first()
 
 
+def get_submission_states(db: Session, chapter_ids: Sequence[int]) -> Dict[int, tuple]:
+    """What decides whether each chapter can be submitted, in one query for any number of chapters
+
+    Maps each existing chapter id to ((id, branch_type, author_id), status),
+    where status is that of its pending or approved merge request, if any;
+    approved wins when both exist.
+    """
+    rows = db.query(
+        Chapter.id, Chapter.branch_type, Chapter.author_id, MergeRequest.status
+    ).outerjoin(
+        MergeRequest,
+        (MergeRequest.from_chapter_id == Chapter.id)
+        & MergeRequest.status.in_([MergeStatus.PENDING, MergeStatus.APPROVED])
+    ).filter(Chapter.id.in_(chapter_ids)).all()
+    states = {}
+    for row in rows:
+        status = states[row.id][1] if row.id in states else None
+        if status is None or row.status == MergeStatus.APPROVED:
+            status = row.status
+        states[row.id] = (row, status)
+    return states
+
+
 def create_merge_request(db: Session, mr: MergeRequestCreate, novel_id: int, requested_by: int) -> MergeRequest:
     db_mr = MergeRequest(**mr.model_dump(), to_novel_id=novel_id, requested_by=requested_by)
     db.add(db_mr)
+    db.flush()
+    add_stats(db, novel_id, pending_merge_requests=1)
+    # The diff is ready by the time the reviewer opens it
+    enqueue(db, "merge_request.diff", {"merge_request_id": db_mr.id})
+    publish(db, make_event("merge_request.created", novel_id, {
+        "id": db_mr.id, "from_chapter_id": db_mr.from_chapter_id, "requested_by": requested_by,
+    }))
     db.commit()
     db.refresh(db_mr)
     return db_mr
 
 
-def approve_merge_request(db: Session, mr_id: int) -> MergeRequest:
-    db_mr = db.query(MergeRequest).filter(MergeRequest.id == mr_id).first()
-    db_mr.status = MergeStatus.APPROVED
-    db_mr.reviewed_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_mr)
-    return db_mr
+def review_merge_requests(
+    db: Session, novel_id: int, reviews: Sequence[Tuple[int, MergeStatus, Optional[str]]]
+) -> List[dict]:
+    """Approve or reject merge requests of one novel in a single transaction
+
+    `reviews` holds (mr_id, APPROVED or REJECTED, review_comment); a None
+    comment leaves the existing one. Only pending requests of this novel
+    change, and approved forks become MERGED chapters in the same commit; a
+    request whose chapter is no longer a fork (deleted or already merged)
+    cannot be approved. Returns {"id", "outcome", "status"} per review, in the
+    given order, with outcome "approved", "rejected", "not_found",
+    "not_pending", "conflict" (left pending, its fork is gone) or "duplicate".
+    """
+    ids = [mr_id for mr_id, _, _ in reviews]
+    if db.get_bind().dialect.name != "sqlite":
+        # Lock in id order so concurrent reviews of overlapping batches cannot deadlock.
+        # SQLite has no row locks; its single writer lock comes with the first UPDATE
+        db.query(MergeRequest.id).filter(MergeRequest.id.in_(ids)).order_by(MergeRequest.id).with_for_update().all()
+        # Their chapters too, so a fork cannot change between the approval and the merge
+        db.query(Chapter.id).filter(
+            Chapter.id.in_(select(MergeRequest.from_chapter_id).where(MergeRequest.id.in_(ids)))
+        ).order_by(Chapter.id).with_for_update().all()
 
+    # One UPDATE per (decision, comment) pair; usually one or two in total
+    groups: Dict[Tuple[MergeStatus, Optional[str]], List[int]] = {}
+    seen = set()
+    for mr_id, decision, comment in reviews:
+        if mr_id not in seen:
+            seen.add(mr_id)
+            groups.setdefault((decision, comment), []).append(mr_id)
+    now = datetime.utcnow()
+    reviewed: Dict[int, MergeStatus] = {}
+    reviewed_chapter_ids, merged_chapter_ids = [], []
+    for (decision, comment), group_ids in groups.items():
+        values = {"status": decision, "reviewed_at": now}
+        if comment is not None:
+            values["review_comment"] = comment
+        # The status condition makes the UPDATE the arbiter: a request reviewed
+        # concurrently is simply not returned here
+        conditions = [
+            MergeRequest.id.in_(group_ids),
+            MergeRequest.to_novel_id == novel_id,
+            MergeRequest.status == MergeStatus.PENDING,
+        ]
+        if decision == MergeStatus.APPROVED:
+            # Only a chapter that is still a fork can be merged
+            conditions.append(exists().where(
+                Chapter.id == MergeRequest.from_chapter_id, Chapter.branch_type == BranchType.FORK
+            ))
+        rows = db.execute(
+            update(MergeRequest).where(*conditions).values(**values).returning(
+                MergeRequest.id, MergeRequest.from_chapter_id, MergeRequest.requested_by
+            ),
+            execution_options={"synchronize_session": False}
+        ).all()
+        for row in rows:
+            reviewed[row.id] = decision
+            reviewed_chapter_ids.append(row.from_chapter_id)
+            if decision == MergeStatus.APPROVED:
+                merged_chapter_ids.append(row.from_chapter_id)
+            # The requester hears the outcome even without following the novel
+            publish(db, make_event(
+                "merge_request.approved" if decision == MergeStatus.APPROVED else "merge_request.rejected",
+                novel_id,
+                {"id": row.id, "from_chapter_id": row.from_chapter_id, "requested_by": row.requested_by,
+                 "review_comment": values.get("review_comment")},
+                users=[row.requested_by],
+            ))
+    merged_by_novel: Dict[int, Dict[int, int]] = {}
+    if merged_chapter_ids:
+        merged = db.execute(
+            update(Chapter).where(
+                Chapter.id.in_(merged_chapter_ids), Chapter.branch_type == BranchType.FORK
+            ).values(branch_type=BranchType.MERGED, updated_at=now).returning(Chapter.novel_id, Chapter.author_id),
+            execution_options={"synchronize_session": False}
+        ).all()
+        for row in merged:
+            authors = merged_by_novel.setdefault(row.novel_id, {})
+            authors[row.author_id] = authors.get(row.author_id, 0) + 1
+    if reviewed:
+        add_stats(db, novel_id, pending_merge_requests=-len(reviewed))
+        # Only open requests keep a precomputed diff
+        drop_merge_request_diffs(db, reviewed_chapter_ids)
+    for chapter_novel_id, authors in merged_by_novel.items():
+        count = sum(authors.values())
+        add_stats(db, chapter_novel_id, touched=True, fork_count=-count, merged_count=count)
+        # Merged chapters earn their authors shares
+        add_contributions(db, chapter_novel_id, authors)
+        invalidate(db, f"reading_path:{chapter_novel_id}")
 
-def reject_merge_request(db: Session, mr_id: int, review_comment: str = None) -> MergeRequest:
-    db_mr = db.query(MergeRequest).filter(MergeRequest.id == mr_id).first()
-    db_mr.status = MergeStatus.REJECTED
-    db_mr.reviewed_at = datetime.utcnow()
-    if review_comment:
-        db_mr.review_comment = review_comment
+    unchanged = [mr_id for mr_id in seen if mr_id not in reviewed]
+    current = {
+        row.id: row for row in db.query(MergeRequest.id, MergeRequest.status, MergeRequest.to_novel_id).filter(
+            MergeRequest.id.in_(unchanged)
+        )
+    } if unchanged else {}
     db.commit()
-    db.refresh(db_mr)
-    return db_mr
+
+    outcomes, reported = [], set()
+    for mr_id, _, _ in reviews:
+        if mr_id in reported:
+            status = reviewed.get(mr_id) or (current[mr_id].status if mr_id in current else None)
+            outcomes.append({"id": mr_id, "outcome": "duplicate", "status": status})
+        elif mr_id in reviewed:
+            status = reviewed[mr_id]
+            outcomes.append({
+                "id": mr_id, "status": status,
+                "outcome": "approved" if status == MergeStatus.APPROVED else "rejected",
+            })
+        elif mr_id in current and current[mr_id].to_novel_id == novel_id:
+            status = current[mr_id].status
+            # Still pending after its review: an approval whose fork is gone
+            outcome = "conflict" if status == MergeStatus.PENDING else "not_pending"
+            outcomes.append({"id": mr_id, "outcome": outcome, "status": status})
+        else:
+            # Requests of other novels are reported like missing ones
+            outcomes.append({"id": mr_id, "outcome": "not_found", "status": None})
+        reported.add(mr_id)
+    return outcomes
+
+
+def approve_merge_request(db: Session, mr: MergeRequest) -> Optional[MergeRequest]:
+    """Approve a pending request and merge its chapter in one transaction
+
+    None if it was not pending, or if its chapter is no longer a fork (the
+    request then stays pending).
+    """
+    outcome = review_merge_requests(db, mr.to_novel_id, [(mr.id, MergeStatus.APPROVED, None)])[0]
+    db.refresh(mr)
+    return mr if outcome["outcome"] == "approved" else None
+
+
+def reject_merge_request(db: Session, mr: MergeRequest, review_comment: str = None) -> Optional[MergeRequest]:
+    """Reject a pending request; None if it was not pending"""
+    outcome = review_merge_requests(db, mr.to_novel_id, [(mr.id, MergeStatus.REJECTED, review_comment or None)])[0]
+    db.refresh(mr)
+    return mr if outcome["outcome"] == "rejected" else None
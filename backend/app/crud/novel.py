@@ -1,20 +1,80 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Sequence, Tuple
+from app.crud.cache import cached_object, invalidate, novel_cache
+from app.crud.novel_stats import delete_stats, init_stats
+from app.crud.share import delete_shares, init_shares
+from app.crud.pagination import keyset_paginate
+from app.crud.search import index_novel, remove_novel
 from app.models.novel import Novel
+from app.models.novel_stats import NovelStats
 from app.schemas.novel import NovelCreate
 
+# Fields a novel listing can select
+NOVEL_FIELDS = {
+    "id": Novel.id,
+    "title": Novel.title,
+    "description": Novel.description,
+    "author_id": Novel.author_id,
+    "created_at": Novel.created_at,
+    "updated_at": Novel.updated_at,
+    # Maintained by app.crud.novel_stats
+    "chapter_count": NovelStats.chapter_count,
+    "fork_count": NovelStats.fork_count,
+    "merged_count": NovelStats.merged_count,
+    "pending_merge_requests": NovelStats.pending_merge_requests,
+    "last_chapter_at": NovelStats.last_chapter_at,
+}
+NOVEL_STATS_FIELDS = ("chapter_count", "fork_count", "merged_count", "pending_merge_requests", "last_chapter_at")
+# Listing orders: name -> (keyset columns, descending). Stats orders put the largest
+# or most recent first and walk the novel_stats indexes
+NOVEL_SORTS = {
+    "created_at": ((Novel.created_at, Novel.id), False),
+    "chapter_count": ((NovelStats.chapter_count, NovelStats.novel_id), True),
+    "fork_count": ((NovelStats.fork_count, NovelStats.novel_id), True),
+    "pending_merge_requests": ((NovelStats.pending_merge_requests, NovelStats.novel_id), True),
+    "last_chapter_at": ((NovelStats.last_chapter_at, NovelStats.novel_id), True),
+}
 
-def get_novel(db: Session, novel_id: int) -> Novel:
-    return db.query(Novel).filter(Novel.id == novel_id).first()
 
+def get_novel(db: Session, novel_id: int, version: Optional[datetime] = None) -> Novel:
+    """The novel, from cache; `version` is its updated_at per get_novel_version, if the caller read it"""
+    return cached_object(
+        db, novel_cache, (novel_id,), lambda: db.query(Novel).filter(Novel.id == novel_id).first(), version
+    )
 
-def get_novels(db: Session, skip: int = 0, limit: int = 100) -> List[Novel]:
-    return db.query(Novel).offset(skip).limit(limit).all()
+
+def get_novel_version(db: Session, novel_id: int):
+    """A row holding the novel's updated_at, or None if it does not exist"""
+    return db.query(Novel.updated_at).filter(Novel.id == novel_id).first()
+
+
+def get_novels(
+    db: Session, cursor: Optional[str] = None, limit: int = 100,
+    fields: Sequence[str] = tuple(NOVEL_FIELDS), sort: str = "created_at"
+) -> Tuple[List[dict], Optional[str]]:
+    """Get one page of novels in a NOVEL_SORTS order and the cursor of the next page
+
+    Stats come from the novel_stats row, so neither selecting nor sorting by
+    them aggregates over chapters or merge requests.
+    """
+    keys, descending = NOVEL_SORTS[sort]
+    query = db.query(*[NOVEL_FIELDS[name].label(name) for name in fields]).select_from(Novel)
+    if sort != "created_at":
+        # Driven from novel_stats so the page is read in index order
+        query = query.join(NovelStats, NovelStats.novel_id == Novel.id)
+    elif any(name in NOVEL_STATS_FIELDS for name in fields):
+        query = query.outerjoin(NovelStats, NovelStats.novel_id == Novel.id)
+    return keyset_paginate(query, keys, cursor, limit, descending=descending)
 
 
 def create_novel(db: Session, novel: NovelCreate, author_id: int) -> Novel:
     db_novel = Novel(**novel.model_dump(), author_id=author_id)
     db.add(db_novel)
+    db.flush()
+    index_novel(db, db_novel)
+    init_stats(db, db_novel)
+    init_shares(db, db_novel)
     db.commit()
     db.refresh(db_novel)
     return db_novel
@@ -24,6 +84,9 @@ def update_novel(db: Session, novel_id: int, novel_data: dict) -> Novel:
     db_novel = db.query(Novel).filter(Novel.id == novel_id).first()
     for key, value in novel_data.items():
         setattr(db_novel, key, value)
+    if "title" in novel_data or "description" in novel_data:
+        index_novel(db, db_novel)
+    invalidate(db, f"novel:{novel_id}")
     db.commit()
     db.refresh(db_novel)
     return db_novel
@@ -32,6 +95,10 @@ def update_novel(db: Session, novel_id: int, novel_data: dict) -> Novel:
 def delete_novel(db: Session, novel_id: int) -> bool:
     db_novel = db.query(Novel).filter(Novel.id == novel_id).first()
     if db_novel:
+        remove_novel(db, novel_id)
+        delete_stats(db, novel_id)
+        delete_shares(db, novel_id)
+        invalidate(db, f"novel:{novel_id}", f"main_chapters:{novel_id}", f"reading_path:{novel_id}")
         db.delete(db_novel)
         db.commit()
         return True
@@ -0,0 +1,137 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+from app.core.database import insert_ignore
+from app.models.chapter import BranchType, Chapter
+from app.models.merge_request import MergeRequest, MergeStatus
+from app.models.novel import Novel
+from app.models.novel_stats import NovelStats
+
+# The counter each branch type is tallied in
+BRANCH_COUNTERS = {
+    BranchType.MAIN: "chapter_count",
+    BranchType.FORK: "fork_count",
+    BranchType.MERGED: "merged_count",
+}
+STAT_COUNTERS = ("chapter_count", "fork_count", "merged_count", "pending_merge_requests")
+# Novels recomputed per round trip by reconcile_stats
+RECONCILE_BATCH_SIZE = 500
+
+
+def init_stats(db: Session, novel: Novel):
+    """Add the zeroed stats row of a novel just flushed, in the caller's transaction"""
+    db.add(NovelStats(novel_id=novel.id, last_chapter_at=novel.created_at))
+
+
+def delete_stats(db: Session, novel_id: int):
+    db.query(NovelStats).filter(NovelStats.novel_id == novel_id).delete(synchronize_session=False)
+
+
+def add_stats(db: Session, novel_id: int, touched: bool = False, **deltas: int):
+    """Apply counter deltas to a novel's stats in the caller's transaction
+
+    A single UPDATE of counter = counter + delta, so concurrent writers never
+    lose each other's increments. `touched` marks a chapter as just written.
+    Novels created before the stats table get their row computed from the
+    current (flushed) state instead, which already includes this change.
+    """
+    values = {name: getattr(NovelStats, name) + delta for name, delta in deltas.items() if delta}
+    if touched:
+        values["last_chapter_at"] = datetime.utcnow()
+    if not values:
+        return
+    result = db.execute(
+        update(NovelStats).where(NovelStats.novel_id == novel_id).values(**values),
+        execution_options={"synchronize_session": False}
+    )
+    if result.rowcount == 0:
+        db.flush()
+        insert_ignore(db, NovelStats, compute_stats(db, [novel_id]), ["novel_id"])
+
+
+def compute_stats(db: Session, novel_ids: Sequence[int]) -> List[dict]:
+    """Stats rows of the given novels recomputed from chapters and merge requests"""
+    if not novel_ids:
+        return []
+    rows = {
+        novel_id: {
+            "novel_id": novel_id, **dict.fromkeys(STAT_COUNTERS, 0), "last_chapter_at": created_at,
+        }
+        for novel_id, created_at in db.query(Novel.id, Novel.created_at).filter(Novel.id.in_(novel_ids))
+    }
+    chapters = db.query(
+        Chapter.novel_id, Chapter.branch_type, func.count(Chapter.id), func.max(Chapter.updated_at)
+    ).filter(Chapter.novel_id.in_(rows)).group_by(Chapter.novel_id, Chapter.branch_type)
+    for novel_id, branch_type, count, last_updated in chapters:
+        row = rows[novel_id]
+        row[BRANCH_COUNTERS[branch_type]] = count
+        if last_updated and last_updated > row["last_chapter_at"]:
+            row["last_chapter_at"] = last_updated
+    pending = db.query(MergeRequest.to_novel_id, func.count(MergeRequest.id)).filter(
+        MergeRequest.to_novel_id.in_(rows), MergeRequest.status == MergeStatus.PENDING
+    ).group_by(MergeRequest.to_novel_id)
+    for novel_id, count in pending:
+        rows[novel_id]["pending_merge_requests"] = count
+    return list(rows.values())
+
+
+def create_missing_stats(db: Session) -> int:
+    """Compute the stats rows of novels that have none yet; returns how many were added"""
+    missing = [
+        novel_id for novel_id, in db.query(Novel.id).outerjoin(
+            NovelStats, NovelStats.novel_id == Novel.id
+        ).filter(NovelStats.novel_id.is_(None))
+    ]
+    for start in range(0, len(missing), RECONCILE_BATCH_SIZE):
+        insert_ignore(db, NovelStats, compute_stats(db, missing[start:start + RECONCILE_BATCH_SIZE]), ["novel_id"])
+        db.commit()
+    return len(missing)
+
+
+def reconcile_stats(db: Session, fix: bool = True, batch_size: int = RECONCILE_BATCH_SIZE) -> List[dict]:
+    """Recompute every novel's counters from scratch and report the ones that drifted
+
+    Returns {"novel_id", "missing", column: {"stored", "actual"}, ...} per
+    novel whose stored counters differ from the recomputed ones (or that has
+    no stats row). With `fix`, those rows are rewritten, one commit per batch.
+    last_chapter_at is rewritten along with them but not reported: it is not
+    moved back when the newest chapter is deleted, so it may lag by design.
+    """
+    drift = []
+    last_id = 0
+    while True:
+        novel_ids = [
+            novel_id for novel_id, in db.query(Novel.id).filter(Novel.id > last_id).order_by(Novel.id).limit(batch_size)
+        ]
+        if not novel_ids:
+            break
+        last_id = novel_ids[-1]
+        stored: Dict[int, NovelStats] = {
+            row.novel_id: row for row in db.query(NovelStats).filter(NovelStats.novel_id.in_(novel_ids))
+        }
+        stale, missing = [], []
+        for actual in compute_stats(db, novel_ids):
+            row: Optional[NovelStats] = stored.get(actual["novel_id"])
+            if row is None:
+                missing.append(actual)
+                drift.append({"novel_id": actual["novel_id"], "missing": True})
+                continue
+            changed = {
+                name: {"stored": getattr(row, name), "actual": actual[name]}
+                for name in STAT_COUNTERS if getattr(row, name) != actual[name]
+            }
+            if changed:
+                stale.append(actual)
+                drift.append({"novel_id": actual["novel_id"], "missing": False, **changed})
+        if fix:
+            if stale:
+                db.execute(update(NovelStats), stale)
+            insert_ignore(db, NovelStats, missing, ["novel_id"])
+            db.commit()
+        db.expunge_all()
+    if fix:
+        # Rows left behind by novels deleted outside delete_novel
+        db.query(NovelStats).filter(NovelStats.novel_id.not_in(select(Novel.id))).delete(synchronize_session=False)
+        db.commit()
+    return drift
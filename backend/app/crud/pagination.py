@@ -0,0 +1,71 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encode the sort-key values of the last row into an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> tuple:
+    """Decode a cursor back into sort-key values typed like `keys`"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != len(keys):
+        raise InvalidCursor("Invalid cursor")
+    values = []
+    for key, value in zip(keys, payload):
+        if isinstance(key.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise InvalidCursor("Invalid cursor")
+        values.append(value)
+    return tuple(values)
+
+
+def keyset_paginate(
+    query, keys: Sequence, cursor: Optional[str], limit: int, descending: bool = False
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page of `query` ordered by `keys`, starting after `cursor`
+
+    `keys` must end with a unique column (normally the primary key) so the
+    ordering is total. Each page is a single index range scan, so deep pages
+    cost the same as the first one and concurrent inserts never shift rows
+    between pages. `descending` reverses every key, which an index on them
+    serves by scanning backwards.
+    """
+    key_labels = [f"_cursor_{i}" for i in range(len(keys))]
+    query = query.add_columns(*[key.label(label) for key, label in zip(keys, key_labels)])
+    if cursor:
+        after = tuple_(*decode_cursor(cursor, keys))
+        query = query.filter(tuple_(*keys) < after if descending else tuple_(*keys) > after)
+    order = [key.desc() for key in keys] if descending else list(keys)
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    items = []
+    for row in rows[:limit]:
+        item = row._asdict()
+        for label in key_labels:
+            item.pop(label)
+        items.append(item)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]._asdict()
+        next_cursor = encode_cursor([last[label] for label in key_labels])
+    return items, next_cursor
@@ -0,0 +1,70 @@
+"""
+Removal of paragraphs that no chapter body references any more.
+
+Bodies share paragraphs by hash and drop references whenever a chapter is
+edited or deleted. Whether a paragraph is still used is only known after
+reading every body: a reference count would instead turn each widely
+shared paragraph (blank lines, recurring headings) into a row updated by
+every chapter write. sweep_paragraphs is run by scripts/sweep_paragraphs.py.
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.chapter import Chapter
+from app.models.chapter_body import ChapterBody
+from app.models.paragraph import IN_BATCH_SIZE, Paragraph, lock_paragraphs, parse_hashes
+
+# Rows fetched per round trip while scanning bodies and paragraphs
+SCAN_BATCH_SIZE = 1000
+# Bodies written from this long before the scan started are read again under the
+# lock; longer than any transaction that writes a body
+RECHECK_MARGIN = timedelta(minutes=10)
+
+
+def _referenced_hashes(db: Session, since: Optional[datetime] = None) -> Set[str]:
+    """Paragraph hashes used by chapter bodies (of chapters updated since `since`)"""
+    query = db.query(ChapterBody.paragraph_hashes)
+    if since is not None:
+        # Setting a chapter's content bumps its updated_at; new chapters start with it
+        query = query.join(Chapter, Chapter.id == ChapterBody.chapter_id).filter(Chapter.updated_at >= since)
+    referenced = set()
+    for (hashes,) in query.yield_per(SCAN_BATCH_SIZE):
+        referenced.update(parse_hashes(hashes))
+    return referenced
+
+
+def sweep_paragraphs(db: Session, dry_run: bool = False) -> dict:
+    """Delete the paragraphs no chapter body references; returns what was found
+
+    Bodies and paragraphs are scanned without locks. Only the candidates
+    found that way are then checked again, under lock_paragraphs, against
+    the bodies written since the scan started, so chapter writes wait for
+    that short recheck and the delete, not for the scan.
+    """
+    started = datetime.utcnow()
+    referenced = _referenced_hashes(db)
+    stored = 0
+    candidates = set()
+    for (paragraph,) in db.query(Paragraph.hash).yield_per(SCAN_BATCH_SIZE):
+        stored += 1
+        if paragraph not in referenced:
+            candidates.add(paragraph)
+    db.rollback()
+    result = {"paragraphs": stored, "referenced": len(referenced), "unused": len(candidates), "deleted": 0, "bytes": 0}
+    if dry_run or not candidates:
+        return result
+
+    lock_paragraphs(db, exclusive=True)
+    unused = sorted(candidates - _referenced_hashes(db, started - RECHECK_MARGIN))
+    for start in range(0, len(unused), IN_BATCH_SIZE):
+        batch = unused[start:start + IN_BATCH_SIZE]
+        result["bytes"] += db.query(func.coalesce(func.sum(func.length(Paragraph.data)), 0)).filter(
+            Paragraph.hash.in_(batch)
+        ).scalar()
+        result["deleted"] += db.query(Paragraph).filter(Paragraph.hash.in_(batch)).delete(synchronize_session=False)
+    db.commit()
+    result["unused"] = len(unused)
+    return result
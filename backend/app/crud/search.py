@@ -0,0 +1,178 @@
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, column, text
+from sqlalchemy.orm import Session
+
+from app.core.search import fts5_match_query, index_tokens, query_terms, snippet, tsquery
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.models.chapter import Chapter
+from app.models.chapter_body import ChapterBody
+from app.models.novel import Novel
+from app.models.paragraph import IN_BATCH_SIZE, load_paragraphs, parse_hashes
+from app.models.search_index import (
+    CHAPTER_DOCUMENT, NOVEL_DOCUMENT, SEARCH_TABLE, document_key, document_rowid
+)
+
+# Sort key of ranked results; lower scores rank first on both backends
+_CURSOR_KEYS = (column("score", Float), column("rowid", Integer))
+
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _write_documents(db: Session, documents: Iterable[Tuple[int, int, str, str]]) -> None:
+    """Upsert (rowid, novel_id, title, body) documents, one executemany per statement"""
+    params = [
+        {"rowid": rowid, "novel_id": novel_id, "title": index_tokens(title), "body": index_tokens(body)}
+        for rowid, novel_id, title, body in documents
+    ]
+    if not params:
+        return
+    if _is_postgresql(db):
+        db.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, novel_id, tsv) VALUES (:rowid, :novel_id, "
+            "setweight(to_tsvector('simple', :title), 'A') || setweight(to_tsvector('simple', :body), 'B')) "
+            "ON CONFLICT (rowid) DO UPDATE SET novel_id = excluded.novel_id, tsv = excluded.tsv"
+        ), params)
+    else:
+        # FTS5 tables have no upsert
+        db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"), params)
+        db.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, body, novel_id) VALUES (:rowid, :title, :body, :novel_id)"
+        ), params)
+
+
+def _delete_documents(db: Session, rowids: Iterable[int]) -> None:
+    rowids = list(rowids)
+    for start in range(0, len(rowids), IN_BATCH_SIZE):
+        batch = rowids[start:start + IN_BATCH_SIZE]
+        params = {f"r{i}": rowid for i, rowid in enumerate(batch)}
+        placeholders = ", ".join(f":{name}" for name in params)
+        db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})"), params)
+
+
+def index_novel(db: Session, novel: Novel) -> None:
+    """Add or refresh a novel's search entry; the caller commits"""
+    _write_documents(
+        db, [(document_rowid(NOVEL_DOCUMENT, novel.id), novel.id, novel.title, novel.description or "")]
+    )
+
+
+def index_chapter(db: Session, chapter: Chapter) -> None:
+    """Add or refresh a chapter's search entry; the caller commits"""
+    index_chapters(db, [(chapter.id, chapter.novel_id, chapter.title, chapter.content)])
+
+
+def index_chapters(db: Session, chapters: Iterable[Tuple[int, int, str, str]]) -> None:
+    """index_chapter() for many (chapter_id, novel_id, title, content) at once, e.g. a bulk import"""
+    _write_documents(db, [
+        (document_rowid(CHAPTER_DOCUMENT, chapter_id), novel_id, title, content)
+        for chapter_id, novel_id, title, content in chapters
+    ])
+
+
+def remove_chapter(db: Session, chapter_id: int) -> None:
+    _delete_documents(db, [document_rowid(CHAPTER_DOCUMENT, chapter_id)])
+
+
+def remove_novel(db: Session, novel_id: int) -> None:
+    """Drop a novel's search entry together with those of all its chapters"""
+    chapter_ids = [row.id for row in db.query(Chapter.id).filter(Chapter.novel_id == novel_id)]
+    _delete_documents(
+        db,
+        [document_rowid(NOVEL_DOCUMENT, novel_id)]
+        + [document_rowid(CHAPTER_DOCUMENT, chapter_id) for chapter_id in chapter_ids]
+    )
+
+
+def _ranked_hits(
+    db: Session, query: str, kind: Optional[int], novel_id: Optional[int], cursor: Optional[str], limit: int
+) -> Optional[list]:
+    """One page of (rowid, score) hits, best first; None if the query has no searchable terms"""
+    terms = query_terms(query)
+    if not terms:
+        return None
+    params = {"limit": limit + 1}
+    if _is_postgresql(db):
+        params["query"] = tsquery(terms)
+        hits = (
+            f"SELECT rowid, -ts_rank_cd(tsv, q) AS score FROM {SEARCH_TABLE}, "
+            "to_tsquery('simple', :query) AS q WHERE tsv @@ q"
+        )
+    else:
+        params["query"] = fts5_match_query(terms)
+        # Title matches weigh ten times as much as body matches
+        hits = (
+            f"SELECT rowid, bm25({SEARCH_TABLE}, 10.0, 1.0) AS score FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH :query"
+        )
+    if kind is not None:
+        hits += " AND rowid % 2 = :kind"
+        params["kind"] = kind
+    if novel_id is not None:
+        hits += " AND novel_id = :novel_id"
+        params["novel_id"] = novel_id
+
+    statement = f"SELECT rowid, score FROM ({hits}) AS hits"
+    if cursor:
+        params["after_score"], params["after_rowid"] = decode_cursor(cursor, _CURSOR_KEYS)
+        statement += " WHERE (score, rowid) > (:after_score, :after_rowid)"
+    statement += " ORDER BY score, rowid LIMIT :limit"
+    return db.execute(text(statement), params).all()
+
+
+def search(
+    db: Session, query: str, kind: Optional[int] = None, novel_id: Optional[int] = None,
+    cursor: Optional[str] = None, limit: int = 20
+) -> Tuple[List[dict], Optional[str]]:
+    """Rank novels and chapters matching `query` and return one page plus the next cursor
+
+    Results are ordered by relevance. The cursor carries the last score, so
+    a page stays consistent as long as the matching documents do not change.
+    """
+    rows = _ranked_hits(db, query, kind, novel_id, cursor, limit)
+    if not rows:
+        return [], None
+    next_cursor = encode_cursor([rows[limit - 1].score, rows[limit - 1].rowid]) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    keys = [document_key(row.rowid) for row in rows]
+    novel_ids = {doc_id for doc_kind, doc_id in keys if doc_kind == NOVEL_DOCUMENT}
+    chapter_ids = [doc_id for doc_kind, doc_id in keys if doc_kind == CHAPTER_DOCUMENT]
+
+    chapters = {}
+    if chapter_ids:
+        chapter_rows = db.query(
+            Chapter.id, Chapter.novel_id, Chapter.title, Chapter.chapter_number,
+            Chapter.branch_type, ChapterBody.paragraph_hashes
+        ).outerjoin(ChapterBody, ChapterBody.chapter_id == Chapter.id).filter(Chapter.id.in_(chapter_ids)).all()
+        hash_lists = {row.id: parse_hashes(row.paragraph_hashes or "") for row in chapter_rows}
+        texts = load_paragraphs(db, (h for hashes in hash_lists.values() for h in hashes))
+        for row in chapter_rows:
+            chapters[row.id] = row
+            novel_ids.add(row.novel_id)
+        bodies = {chapter_id: "\n".join(texts[h] for h in hashes) for chapter_id, hashes in hash_lists.items()}
+    novels = {
+        row.id: row for row in db.query(Novel.id, Novel.title, Novel.description).filter(Novel.id.in_(novel_ids))
+    } if novel_ids else {}
+
+    items = []
+    for row, (doc_kind, doc_id) in zip(rows, keys):
+        # The document may have been deleted since it was ranked
+        if doc_kind == NOVEL_DOCUMENT and doc_id in novels:
+            novel = novels[doc_id]
+            items.append({
+                "kind": "novel", "id": novel.id, "novel_id": novel.id, "novel_title": novel.title,
+                "title": novel.title, "snippet": snippet(novel.description, query), "score": -row.score,
+            })
+        elif doc_kind == CHAPTER_DOCUMENT and doc_id in chapters:
+            chapter = chapters[doc_id]
+            novel = novels.get(chapter.novel_id)
+            items.append({
+                "kind": "chapter", "id": chapter.id, "novel_id": chapter.novel_id,
+                "novel_title": novel.title if novel else None, "title": chapter.title,
+                "chapter_number": chapter.chapter_number, "branch_type": chapter.branch_type,
+                "snippet": snippet(bodies[doc_id], query), "score": -row.score,
+            })
+    return items, next_cursor
@@ -0,0 +1,315 @@
+"""
+Contributor share ledger, kept in step with accepted chapters.
+
+novel_shareholders holds each contributor's accepted chapter count and
+shares, and novel_share_pools the novel's configuration and running total.
+Both are updated by add_contributions in the same transaction as the
+chapter change (creation, import, branch move, deletion, merge approval),
+with counter = counter + delta statements so concurrent writers never lose
+an award. Ratios and payouts are not stored: a new award dilutes every
+holder, so they are computed for all holders at once when read, as arrays.
+"""
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import insert_ignore, insert_or_add
+from app.models.chapter import BranchType, Chapter
+from app.models.novel import Novel
+from app.models.novel_share import NovelSharePool, NovelShareholder
+from app.models.user import User
+
+# Branch types that count as accepted contributions
+ACCEPTED_BRANCHES = (BranchType.MAIN, BranchType.MERGED)
+# Novels rebuilt per round trip by create_missing_shares / reconcile_shares
+RECONCILE_BATCH_SIZE = 500
+
+
+def _new_pool(novel_id: int, founder_id: int) -> dict:
+    """Pool row of a novel with no contributions, configured from settings"""
+    floor = settings.SHARE_FOUNDER_FLOOR
+    base = settings.SHARE_BASE_TOTAL
+    return {
+        "novel_id": novel_id,
+        "founder_id": founder_id,
+        "base_shares": base,
+        # Founder block that makes floor + block / base × (1 - floor) the initial ratio
+        "founder_shares": round(base * (settings.SHARE_FOUNDER_RATIO - floor) / (1 - floor)),
+        "founder_floor": floor,
+        "shares_per_chapter": settings.SHARES_PER_CHAPTER,
+        "awarded_shares": 0,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def init_shares(db: Session, novel: Novel):
+    """Add the share pool of a novel just flushed, in the caller's transaction"""
+    db.add(NovelSharePool(**_new_pool(novel.id, novel.author_id)))
+
+
+def delete_shares(db: Session, novel_id: int):
+    db.query(NovelShareholder).filter(NovelShareholder.novel_id == novel_id).delete(synchronize_session=False)
+    db.query(NovelSharePool).filter(NovelSharePool.novel_id == novel_id).delete(synchronize_session=False)
+
+
+def add_contributions(db: Session, novel_id: int, chapters_by_author: Dict[int, int]):
+    """Award (or, for negative counts, take back) shares for accepted chapters
+
+    `chapters_by_author` maps author ids to the change in their accepted
+    chapter count. The founder's own chapters earn nothing; they hold the
+    founder block. Novels created before the ledger get it rebuilt from
+    their current (flushed) chapters instead, which includes this change.
+    """
+    chapters_by_author = {author_id: count for author_id, count in chapters_by_author.items() if count}
+    if not chapters_by_author:
+        return
+    pool = db.query(
+        NovelSharePool.founder_id, NovelSharePool.shares_per_chapter
+    ).filter(NovelSharePool.novel_id == novel_id).first()
+    if pool is None:
+        db.flush()
+        rebuild_shares(db, [novel_id])
+        return
+    chapters_by_author.pop(pool.founder_id, None)
+    if not chapters_by_author:
+        return
+    insert_or_add(
+        db, NovelShareholder,
+        [
+            {"novel_id": novel_id, "user_id": author_id, "chapters": count, "shares": count * pool.shares_per_chapter}
+            for author_id, count in chapters_by_author.items()
+        ],
+        ["novel_id", "user_id"], ("chapters", "shares")
+    )
+    awarded = sum(chapters_by_author.values()) * pool.shares_per_chapter
+    db.execute(
+        update(NovelSharePool).where(NovelSharePool.novel_id == novel_id).values(
+            awarded_shares=NovelSharePool.awarded_shares + awarded, updated_at=datetime.utcnow()
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    if any(count < 0 for count in chapters_by_author.values()):
+        db.query(NovelShareholder).filter(
+            NovelShareholder.novel_id == novel_id,
+            NovelShareholder.user_id.in_([author_id for author_id, count in chapters_by_author.items() if count < 0]),
+            NovelShareholder.chapters <= 0,
+        ).delete(synchronize_session=False)
+
+
+def compute_shares(db: Session, novel_ids: Sequence[int]) -> Tuple[Dict[int, dict], List[dict]]:
+    """Pool and holder rows of the given novels recomputed from their chapters
+
+    Existing pools keep their configuration; novels without one get a new
+    pool configured from settings. Returns ({novel_id: pool row}, holder rows).
+    """
+    if not novel_ids:
+        return {}, []
+    pools = {
+        row.novel_id: {
+            "novel_id": row.novel_id, "founder_id": row.founder_id, "base_shares": row.base_shares,
+            "founder_shares": row.founder_shares, "founder_floor": row.founder_floor,
+            "shares_per_chapter": row.shares_per_chapter, "awarded_shares": 0, "updated_at": datetime.utcnow(),
+        }
+        for row in db.query(NovelSharePool).filter(NovelSharePool.novel_id.in_(novel_ids))
+    }
+    for novel_id, author_id in db.query(Novel.id, Novel.author_id).filter(
+        Novel.id.in_(novel_ids), Novel.id.not_in(list(pools))
+    ):
+        pools[novel_id] = _new_pool(novel_id, author_id)
+    holders = []
+    counts = db.query(Chapter.novel_id, Chapter.author_id, func.count(Chapter.id)).filter(
+        Chapter.novel_id.in_(pools), Chapter.branch_type.in_(ACCEPTED_BRANCHES)
+    ).group_by(Chapter.novel_id, Chapter.author_id)
+    for novel_id, author_id, count in counts:
+        pool = pools[novel_id]
+        if author_id == pool["founder_id"]:
+            continue
+        shares = count * pool["shares_per_chapter"]
+        pool["awarded_shares"] += shares
+        holders.append({"novel_id": novel_id, "user_id": author_id, "chapters": count, "shares": shares})
+    return pools, holders
+
+
+def rebuild_shares(db: Session, novel_ids: Sequence[int]):
+    """Rewrite the ledger of the given novels from their chapters, in the caller's transaction"""
+    pools, holders = compute_shares(db, novel_ids)
+    if not pools:
+        return
+    db.query(NovelShareholder).filter(NovelShareholder.novel_id.in_(list(pools))).delete(synchronize_session=False)
+    existing = {
+        novel_id for novel_id, in db.query(NovelSharePool.novel_id).filter(NovelSharePool.novel_id.in_(list(pools)))
+    }
+    stale = [pool for novel_id, pool in pools.items() if novel_id in existing]
+    if stale:
+        db.execute(update(NovelSharePool), [
+            {"novel_id": pool["novel_id"], "awarded_shares": pool["awarded_shares"], "updated_at": pool["updated_at"]}
+            for pool in stale
+        ])
+    insert_ignore(db, NovelSharePool, [pool for novel_id, pool in pools.items() if novel_id not in existing], ["novel_id"])
+    insert_ignore(db, NovelShareholder, holders, ["novel_id", "user_id"])
+
+
+def create_missing_shares(db: Session) -> int:
+    """Build the ledger of novels that have no share pool yet; returns how many were added"""
+    missing = [
+        novel_id for novel_id, in db.query(Novel.id).outerjoin(
+            NovelSharePool, NovelSharePool.novel_id == Novel.id
+        ).filter(NovelSharePool.novel_id.is_(None))
+    ]
+    for start in range(0, len(missing), RECONCILE_BATCH_SIZE):
+        rebuild_shares(db, missing[start:start + RECONCILE_BATCH_SIZE])
+        db.commit()
+    return len(missing)
+
+
+def reconcile_shares(db: Session, fix: bool = True, batch_size: int = RECONCILE_BATCH_SIZE) -> List[dict]:
+    """Recompute every novel's ledger from its chapters and report the ones that drifted
+
+    Returns {"novel_id", "missing", "holders": [{"user_id", "stored", "actual"}],
+    "awarded_shares": {"stored", "actual"}} per novel whose stored holdings
+    differ from the recomputed ones (or that has no pool). With `fix`, those
+    novels are rebuilt, one commit per batch.
+    """
+    drift = []
+    last_id = 0
+    while True:
+        novel_ids = [
+            novel_id for novel_id, in db.query(Novel.id).filter(Novel.id > last_id).order_by(Novel.id).limit(batch_size)
+        ]
+        if not novel_ids:
+            break
+        last_id = novel_ids[-1]
+        stored_awarded = dict(
+            db.query(NovelSharePool.novel_id, NovelSharePool.awarded_shares).filter(NovelSharePool.novel_id.in_(novel_ids))
+        )
+        stored_holders: Dict[int, Dict[int, int]] = {}
+        for novel_id, user_id, shares in db.query(
+            NovelShareholder.novel_id, NovelShareholder.user_id, NovelShareholder.shares
+        ).filter(NovelShareholder.novel_id.in_(novel_ids)):
+            stored_holders.setdefault(novel_id, {})[user_id] = shares
+        pools, holders = compute_shares(db, novel_ids)
+        actual_holders: Dict[int, Dict[int, int]] = {}
+        for holder in holders:
+            actual_holders.setdefault(holder["novel_id"], {})[holder["user_id"]] = holder["shares"]
+        stale = []
+        for novel_id, pool in pools.items():
+            stored, actual = stored_holders.get(novel_id, {}), actual_holders.get(novel_id, {})
+            if novel_id not in stored_awarded:
+                drift.append({"novel_id": novel_id, "missing": True})
+            elif stored != actual or stored_awarded[novel_id] != pool["awarded_shares"]:
+                drift.append({
+                    "novel_id": novel_id, "missing": False,
+                    "holders": [
+                        {"user_id": user_id, "stored": stored.get(user_id, 0), "actual": actual.get(user_id, 0)}
+                        for user_id in sorted(stored.keys() | actual.keys()) if stored.get(user_id) != actual.get(user_id)
+                    ],
+                    "awarded_shares": {"stored": stored_awarded[novel_id], "actual": pool["awarded_shares"]},
+                })
+            else:
+                continue
+            stale.append(novel_id)
+        if fix and stale:
+            rebuild_shares(db, stale)
+            db.commit()
+    return drift
+
+
+def _total_shares(pool) -> Tuple[int, int]:
+    """(shares issued so far, unawarded shares left in the current pool)
+
+    A pool as large as the first is issued each time the previous one is
+    fully awarded, so the total only ever grows in whole pools. A novel
+    configured without a pool (founder block >= base) has only the founder
+    block.
+    """
+    pool_size = pool.base_shares - pool.founder_shares
+    if pool_size <= 0:
+        return pool.founder_shares, 0
+    pools_issued = max(1, math.ceil(pool.awarded_shares / pool_size))
+    return pool.founder_shares + pools_issued * pool_size, pools_issued * pool_size - pool.awarded_shares
+
+
+def split_payout(amount: int, weights: np.ndarray) -> np.ndarray:
+    """Split an amount in minor units (e.g. 分) in proportion to weights
+
+    Largest remainder: everyone gets the floor of their exact part and the
+    units left over go to the largest fractions (earlier entries on ties),
+    so the parts are whole and add up to the amount exactly.
+    """
+    total = weights.sum()
+    if amount <= 0 or total <= 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    exact = weights * (amount / total)
+    parts = np.floor(exact).astype(np.int64)
+    left = amount - int(parts.sum())
+    if left:
+        parts[np.argsort(parts - exact, kind="stable")[:left]] += 1
+    return parts
+
+
+def get_shares(db: Session, novel_id: int, limit: Optional[int] = None, payout: Optional[int] = None) -> Optional[dict]:
+    """A novel's cap table from the ledger: totals, and holders largest first
+
+    Each holder's equity is shares / total × (1 - floor), plus the floor for
+    the founder; the unawarded rest of the pool holds the remainder, so the
+    equities of holders and pool add up to 1. `payout` (minor units) is
+    split among the holders only, in proportion to their equity. `limit`
+    cuts the holder list after the computation. None if the novel has no
+    ledger (no such novel).
+    """
+    found = db.query(NovelSharePool, User.username).join(
+        User, User.id == NovelSharePool.founder_id
+    ).filter(NovelSharePool.novel_id == novel_id).first()
+    if found is None:
+        return None
+    pool, founder = found
+    rows = db.query(
+        NovelShareholder.user_id, NovelShareholder.chapters, NovelShareholder.shares, User.username
+    ).join(User, User.id == NovelShareholder.user_id).filter(
+        NovelShareholder.novel_id == novel_id
+    ).order_by(NovelShareholder.shares.desc(), NovelShareholder.user_id.desc()).all()
+
+    total, pool_remaining = _total_shares(pool)
+    unlocked = 1 - pool.founder_floor
+    # Founder first, then contributors in ledger order
+    shares = np.empty(len(rows) + 1, dtype=np.int64)
+    shares[0] = pool.founder_shares
+    shares[1:] = np.fromiter((row.shares for row in rows), dtype=np.int64, count=len(rows))
+    if total > pool.founder_shares:
+        equity = shares / total * unlocked
+        equity[0] += pool.founder_floor
+    else:
+        # No pool to award from: the founder owns the whole novel
+        equity = np.zeros(len(shares))
+        equity[0] = 1.0
+    payouts = split_payout(payout, equity) if payout is not None else None
+
+    holders = [{
+        "user_id": pool.founder_id, "username": founder, "founder": True,
+        "chapters": None, "shares": pool.founder_shares,
+    }] + [{
+        "user_id": row.user_id, "username": row.username, "founder": False,
+        "chapters": row.chapters, "shares": row.shares,
+    } for row in rows]
+    count = len(holders) if limit is None else min(limit, len(holders))
+    equity_list = equity[:count].tolist()
+    payout_list = payouts[:count].tolist() if payouts is not None else [None] * count
+    for holder, holder_equity, holder_payout in zip(holders, equity_list, payout_list):
+        holder["equity"] = holder_equity
+        holder["payout"] = holder_payout
+    return {
+        "novel_id": novel_id,
+        "total_shares": total,
+        "awarded_shares": pool.awarded_shares,
+        "pool_remaining": pool_remaining,
+        "pool_equity": pool_remaining / total * unlocked if total > pool.founder_shares else 0.0,
+        "founder_floor": pool.founder_floor,
+        "holder_count": len(holders),
+        "payout": payout,
+        "holders": holders[:count],
+    }
@@ -1,12 +1,13 @@
 from sqlalchemy.orm import Session
 from typing import Optional
+from app.crud.cache import cached_object, invalidate, user_cache
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, verify_and_upgrade_password
 
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
-    return db.query(User).filter(User.id == user_id).first()
+    return cached_object(db, user_cache, (user_id,), lambda: db.query(User).filter(User.id == user_id).first())
 
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
@@ -34,6 +35,21 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     user = get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    verified, new_hash = verify_and_upgrade_password(password, user.password_hash)
+    if not verified:
         return None
+    if new_hash:
+        # Stored with weaker Argon2 parameters than configured now: upgrade while we have the password
+        user.password_hash = new_hash
+        invalidate(db, f"user:{user.id}")
+        db.commit()
+    return user
+
+
+def set_user_active(db: Session, user: User, is_active: bool) -> User:
+    """Enable or disable a user; a disabled user's tokens stop working on the next request"""
+    user.is_active = is_active
+    invalidate(db, f"user:{user.id}")
+    db.commit()
+    db.refresh(user)
     return user
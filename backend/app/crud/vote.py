@@ -0,0 +1,330 @@
+"""
+Monthly ticket votes: buffered ingestion, capped spending, flushed totals and leaderboards.
+
+A vote goes through three stages:
+
+1. VoteIngester queues it in the worker and a single thread writes whatever
+   has queued up as one transaction (record_votes), so a burst of votes
+   costs a handful of statements and one commit instead of one each.
+2. record_votes locks the batch's readers, checks their caps against their
+   ledger rows for the month and appends the accepted votes to the
+   ticket_votes ledger. Nothing is updated, on `novels` or elsewhere.
+3. flush_votes, run every VOTE_FLUSH_INTERVAL_SECONDS by a flusher thread
+   that each worker starts with the app (whether votes are batched or
+   written inline), adds newly appended votes to novel_ticket_totals and
+   rewrites the affected leaderboards, so reading one is a single indexed
+   query.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, insert_ignore, insert_or_add, lock_for_write
+from app.models.novel import Novel
+from app.models.vote import (
+    ALL_TIME, NovelTicketTotal, TicketLeaderboardEntry, TicketVote, VoteFlushState,
+)
+
+# Novel age brackets of the leaderboards, in days since the novel was created:
+# 新人 (< 3 months), 成长 (3-12 months), 成熟 (> 12 months)
+AGE_BRACKETS = {
+    "all": (None, None),
+    "new": (None, 90),
+    "growing": (90, 365),
+    "mature": (365, None),
+}
+# Ledger rows added to the totals per flush_votes call
+FLUSH_BATCH_SIZE = 50_000
+
+# First key of the PostgreSQL advisory locks taken per reader by record_votes
+_VOTER_LOCK_NAMESPACE = 21
+
+logger = logging.getLogger(__name__)
+
+
+class VoteQueueFull(Exception):
+    """Too many votes are waiting to be written in this worker"""
+
+
+def month_key(moment: datetime) -> int:
+    return moment.year * 100 + moment.month
+
+
+def month_label(month: int) -> str:
+    return f"{month // 100:04d}-{month % 100:02d}"
+
+
+def parse_month(label: str) -> int:
+    """YYYY-MM -> YYYYMM; raises ValueError"""
+    return month_key(datetime.strptime(label, "%Y-%m"))
+
+
+def _month_end(month: int) -> datetime:
+    year, number = divmod(month, 100)
+    return datetime(year + number // 12, number % 12 + 1, 1)
+
+
+def _lock_voters(db: Session, user_ids: Sequence[int]):
+    """Serialize batches that involve the same readers until this transaction ends
+
+    PostgreSQL takes a transaction-scoped advisory lock per reader, in id
+    order so overlapping batches cannot deadlock; SQLite takes its single
+    write lock.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, id) FROM unnest(CAST(:ids AS integer[])) AS id ORDER BY id"),
+            {"namespace": _VOTER_LOCK_NAMESPACE, "ids": sorted(user_ids)}
+        )
+    else:
+        lock_for_write(db)
+
+
+def record_votes(
+    db: Session, votes: Sequence[Tuple[int, int, int]], now: Optional[datetime] = None
+) -> List[dict]:
+    """Check and record a batch of (user_id, novel_id, tickets) votes in one transaction
+
+    Votes are applied in order, so a reader's later votes in the batch see
+    their earlier ones. Returns one dict per vote with "outcome":
+    "accepted", "not_found", "own_novel", "cooldown" (with "retry_after"
+    seconds), "novel_limit" or "monthly_limit", plus the reader's usage
+    after the vote.
+    """
+    now = now or datetime.utcnow()
+    month = month_key(now)
+    cooldown = timedelta(seconds=settings.VOTE_COOLDOWN_SECONDS)
+    authors = dict(
+        db.query(Novel.id, Novel.author_id).filter(Novel.id.in_({novel_id for _, novel_id, _ in votes}))
+    )
+    voters = {user_id for user_id, novel_id, _ in votes if authors.get(novel_id) not in (None, user_id)}
+    monthly: Dict[int, int] = defaultdict(int)
+    # (user_id, novel_id) -> [tickets, last voted at]
+    per_novel: Dict[Tuple[int, int], list] = {}
+    if voters:
+        _lock_voters(db, voters)
+        spent = db.execute(
+            select(TicketVote.user_id, TicketVote.novel_id, TicketVote.tickets, TicketVote.created_at).where(
+                TicketVote.user_id.in_(voters), TicketVote.month == month
+            )
+        )
+        for user_id, novel_id, tickets, created_at in spent:
+            monthly[user_id] += tickets
+            usage = per_novel.setdefault((user_id, novel_id), [0, created_at])
+            usage[0] += tickets
+            usage[1] = max(usage[1], created_at)
+
+    results, ledger = [], []
+    for user_id, novel_id, tickets in votes:
+        result = {"novel_id": novel_id, "tickets": tickets, "month": month_label(month)}
+        results.append(result)
+        if novel_id not in authors:
+            result["outcome"] = "not_found"
+            continue
+        if authors[novel_id] == user_id:
+            result["outcome"] = "own_novel"
+            continue
+        usage = per_novel.setdefault((user_id, novel_id), [0, None])
+        if usage[1] and usage[1] + cooldown > now:
+            result["outcome"] = "cooldown"
+            result["retry_after"] = int((usage[1] + cooldown - now).total_seconds()) + 1
+        elif usage[0] + tickets > settings.TICKETS_PER_NOVEL_MONTH:
+            result["outcome"] = "novel_limit"
+        elif monthly[user_id] + tickets > settings.TICKETS_PER_USER_MONTH:
+            result["outcome"] = "monthly_limit"
+        else:
+            result["outcome"] = "accepted"
+            usage[0] += tickets
+            usage[1] = now
+            monthly[user_id] += tickets
+            ledger.append({
+                "user_id": user_id, "novel_id": novel_id, "month": month, "tickets": tickets,
+                "created_at": now, "flushed": False,
+            })
+        result["novel_used"] = usage[0]
+        result["monthly_used"] = monthly[user_id]
+    if ledger:
+        # Core executemany: ORM bulk inserts cost more than the database does here
+        db.execute(insert(TicketVote.__table__), ledger)
+    db.commit()
+    return results
+
+
+def flush_votes(db: Session, now: Optional[datetime] = None, limit: int = FLUSH_BATCH_SIZE) -> int:
+    """Add unflushed ledger rows to the totals and rebuild the affected leaderboards
+
+    Claims up to `limit` rows by marking them flushed in the same UPDATE that
+    reads them, so a vote is counted exactly once even if its transaction
+    committed after a later-numbered one. Returns how many votes were added.
+    """
+    now = now or datetime.utcnow()
+    # Every worker polls: an idle one only reads the (indexed) unflushed tail
+    if db.query(TicketVote.id).filter(TicketVote.flushed.is_(False)).first() is None:
+        return 0
+    # One flush at a time across workers: the leaderboard rewrite is not mergeable
+    insert_ignore(db, VoteFlushState, [{"id": 1}], ["id"])
+    db.execute(update(VoteFlushState).where(VoteFlushState.id == 1).values(flushed_at=now))
+    claim = select(TicketVote.id).where(TicketVote.flushed.is_(False)).order_by(TicketVote.id).limit(limit)
+    rows = db.execute(
+        update(TicketVote).where(TicketVote.flushed.is_(False), TicketVote.id.in_(claim)).values(flushed=True).returning(
+            TicketVote.novel_id, TicketVote.month, TicketVote.tickets
+        ),
+        execution_options={"synchronize_session": False}
+    ).all()
+    if not rows:
+        db.commit()
+        return 0
+    totals: Dict[Tuple[int, int], int] = defaultdict(int)
+    for row in rows:
+        totals[(row.novel_id, row.month)] += row.tickets
+        totals[(row.novel_id, ALL_TIME)] += row.tickets
+    insert_or_add(
+        db, NovelTicketTotal,
+        [{"novel_id": novel_id, "period": period, "tickets": tickets} for (novel_id, period), tickets in sorted(totals.items())],
+        ["novel_id", "period"], ["tickets"]
+    )
+    for period in sorted({period for _, period in totals}):
+        _rebuild_leaderboard(db, period, now)
+    db.commit()
+    return len(rows)
+
+
+def _rebuild_leaderboard(db: Session, period: int, now: datetime):
+    """Rewrite every age bracket of one period's leaderboard from novel_ticket_totals
+
+    Monthly brackets use the novel's age at the end of that month.
+    """
+    as_of = now if period == ALL_TIME else min(now, _month_end(period))
+    db.query(TicketLeaderboardEntry).filter(TicketLeaderboardEntry.period == period).delete(synchronize_session=False)
+    entries = []
+    for bracket, (min_days, max_days) in AGE_BRACKETS.items():
+        query = db.query(NovelTicketTotal.novel_id, NovelTicketTotal.tickets).join(
+            Novel, Novel.id == NovelTicketTotal.novel_id
+        ).filter(NovelTicketTotal.period == period, NovelTicketTotal.tickets > 0)
+        if min_days is not None:
+            query = query.filter(Novel.created_at <= as_of - timedelta(days=min_days))
+        if max_days is not None:
+            query = query.filter(Novel.created_at > as_of - timedelta(days=max_days))
+        top = query.order_by(NovelTicketTotal.tickets.desc(), NovelTicketTotal.novel_id).limit(settings.LEADERBOARD_SIZE)
+        entries.extend(
+            {
+                "period": period, "bracket": bracket, "rank": rank, "novel_id": novel_id,
+                "tickets": tickets, "generated_at": now,
+            }
+            for rank, (novel_id, tickets) in enumerate(top, 1)
+        )
+    if entries:
+        db.execute(insert(TicketLeaderboardEntry), entries)
+
+
+def get_leaderboard(db: Session, period: int, bracket: str = "all", limit: int = 100) -> List[dict]:
+    """A precomputed leaderboard in rank order: rank, novel_id, title, tickets, generated_at"""
+    rows = db.query(
+        TicketLeaderboardEntry.rank, TicketLeaderboardEntry.novel_id, Novel.title,
+        TicketLeaderboardEntry.tickets, TicketLeaderboardEntry.generated_at
+    ).join(Novel, Novel.id == TicketLeaderboardEntry.novel_id).filter(
+        TicketLeaderboardEntry.period == period, TicketLeaderboardEntry.bracket == bracket
+    ).order_by(TicketLeaderboardEntry.rank).limit(limit).all()
+    return [row._asdict() for row in rows]
+
+
+class VoteIngester:
+    """Per-worker write buffer: request handlers queue votes, one thread writes them in batches
+
+    While a batch is being committed the next one queues up, so the batch
+    size follows the load: one vote per transaction when idle, up to
+    `batch_size` under a burst. A second thread, started by start(), runs
+    flush_votes on its interval.
+    """
+
+    def __init__(
+        self, batch_size: int, queue_limit: int, flush_interval: float, session_factory=SessionLocal
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=queue_limit)
+        self._thread: Optional[threading.Thread] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = self.votes = self.flushes = 0
+
+    def start(self):
+        """Start flushing votes every flush_interval, beginning with whatever earlier runs left unflushed"""
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="vote-flusher", daemon=True)
+                self._flusher.start()
+
+    def submit(self, user_id: int, novel_id: int, tickets: int) -> Future:
+        """Queue a vote; the future resolves to its record_votes result"""
+        self._start_writer()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((user_id, novel_id, tickets, future))
+        except queue.Full:
+            raise VoteQueueFull()
+        return future
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "batches": self.batches, "votes": self.votes, "flushes": self.flushes}
+
+    def _start_writer(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="vote-ingester", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            self._write(batch)
+
+    def _write(self, batch: List[tuple]):
+        try:
+            with self.session_factory() as db:
+                results = record_votes(db, [(user_id, novel_id, tickets) for user_id, novel_id, tickets, _ in batch])
+        except Exception as exc:
+            for *_, future in batch:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.votes += len(batch)
+        for (*_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _flush_loop(self):
+        while True:
+            self._flush()
+            time.sleep(self.flush_interval)
+
+    def _flush(self):
+        try:
+            with self.session_factory() as db:
+                while flush_votes(db) == FLUSH_BATCH_SIZE:
+                    pass
+            self.flushes += 1
+        except Exception:
+            # Unflushed votes stay in the ledger and are picked up next time
+            logger.exception("Flushing votes failed")
+
+
+vote_ingester = VoteIngester(
+    batch_size=settings.VOTE_BATCH_SIZE,
+    queue_limit=settings.VOTE_QUEUE_LIMIT,
+    flush_interval=settings.VOTE_FLUSH_INTERVAL_SECONDS,
+)
@@ -1,12 +1,41 @@
-from fastapi import FastAPI, Request
+import logging
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import Base, engine
-from app.api import auth, novels, chapters, merge_requests
+from app.core.database import Base, SessionLocal, engine, engine_config, get_db
+from app.core.security import PasswordHasherBusy, PasswordHasherUnavailable
+from app.api import auth, novels, chapters, merge_requests, search, async_reads, votes, events
+from app.core.events import event_broker
+from app.crud.cache import cache_stats
+from app.crud.job import job_stats
+from app.crud.novel_stats import create_missing_stats
+from app.crud.share import create_missing_shares
+from app.crud.vote import VoteQueueFull, vote_ingester
+from app.crud.pagination import InvalidCursor
+from app.models.search_index import create_search_index
+
+logger = logging.getLogger(__name__)
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+# create_all 不会给已存在的表补建索引，这里单独检查一遍
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+# 全文检索表（SQLite 用 FTS5 虚表，PostgreSQL 用 tsvector），不在 metadata 里
+create_search_index(engine)
+# 统计表、股份账本上线前创建的小说在这里补一次（之后由写操作增量维护）
+with SessionLocal() as _db:
+    create_missing_stats(_db)
+    create_missing_shares(_db)
+# 月票汇总与投票方式无关（VOTE_BATCH_SIZE=0 时投票直接写入），每个 worker 启动即开始
+vote_ingester.start()
+if logger.isEnabledFor(logging.INFO):
+    logger.info("Database engine: %s", engine_config())
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -28,10 +57,46 @@ app.add_middleware(
 )
 
 # Include routers
+# /novels/leaderboard 要排在 /novels/{novel_id}（同步与 async 版本）之前
+app.include_router(votes.router, prefix="/api", tags=["Votes"])
+if settings.ASYNC_DB:
+    # 先注册的路由优先匹配：热点读接口由 async 版本接管，其余仍走同步路由
+    app.include_router(async_reads.router, prefix="/api", tags=["Async reads"])
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(novels.router, prefix="/api/novels", tags=["Novels"])
 app.include_router(chapters.router, prefix="/api", tags=["Chapters"])
 app.include_router(merge_requests.router, prefix="/api", tags=["Merge Requests"])
+app.include_router(events.router, prefix="/api", tags=["Events"])
+app.include_router(search.router, prefix="/api", tags=["Search"])
+
+
+@app.exception_handler(InvalidCursor)
+def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Password hashing is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(PasswordHasherUnavailable)
+def password_hasher_unavailable_handler(request: Request, exc: PasswordHasherUnavailable):
+    # Not a load problem, so no Retry-After: the hashing processes could not be (re)started
+    return JSONResponse(status_code=500, content={"detail": "Password hashing is unavailable"})
+
+
+@app.exception_handler(VoteQueueFull)
+def vote_queue_full_handler(request: Request, exc: VoteQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many votes in progress, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.get("/")
@@ -45,7 +110,31 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "database": engine_config()}
+
+
+@app.get("/health/cache")
+def cache_health():
+    """本 worker 的缓存命中率等统计（每个 worker 各自一份）"""
+    return cache_stats()
+
+
+@app.get("/health/votes")
+def votes_health():
+    """本 worker 的投票写入队列与批次统计"""
+    return vote_ingester.stats()
+
+
+@app.get("/health/events")
+def events_health():
+    """本 worker 打开的事件流数量、推送计数与发布到写入流的延迟"""
+    return event_broker.stats()
+
+
+@app.get("/health/jobs")
+def jobs_health(db: Session = Depends(get_db)):
+    """后台任务队列积压（按类型）与最近一小时完成任务的等待 / 执行耗时；由 python -m app.worker 执行"""
+    return job_stats(db)
 
 
 @app.get("/api")
@@ -1,6 +1,21 @@
 from app.models.user import User
 from app.models.novel import Novel
+from app.models.novel_stats import NovelStats
+from app.models.novel_share import NovelSharePool, NovelShareholder
+from app.models.novel_follow import NovelFollow
 from app.models.chapter import Chapter
 from app.models.merge_request import MergeRequest
+from app.models.chapter_body import ChapterBody
+from app.models.chapter_diff import ChapterDiff
+from app.models.paragraph import Paragraph
+from app.models.cache_invalidation import CacheInvalidation
+from app.models.job import Job
+from app.models.vote import (
+    NovelTicketTotal, TicketLeaderboardEntry, TicketVote, VoteFlushState
+)
 
-__all__ = ["User", "Novel", "Chapter", "MergeRequest"]
+__all__ = [
+    "User", "Novel", "NovelStats", "Chapter", "ChapterBody", "ChapterDiff", "MergeRequest", "Paragraph", "CacheInvalidation",
+    "NovelSharePool", "NovelShareholder", "NovelFollow",
+    "TicketVote", "NovelTicketTotal", "TicketLeaderboardEntry", "VoteFlushState", "Job",
+]
@@ -1,9 +1,11 @@
 from datetime import datetime
 import enum
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, String, event, inspect
+from sqlalchemy.orm import object_session, relationship
 
 from app.core.database import Base
+from app.models.chapter_body import ChapterBody
+from app.models.paragraph import load_paragraphs, parse_hashes
 
 
 class BranchType(str, enum.Enum):
@@ -18,7 +20,6 @@ class Chapter(Base):
     id = Column(Integer, primary_key=True, index=True)
     novel_id = Column(Integer, ForeignKey("novels.id"), nullable=False)
     title = Column(String(200), nullable=False)
-    content = Column(Text, nullable=False)
     chapter_number = Column(Integer, nullable=False)
     parent_chapter_id = Column(Integer, ForeignKey("chapters.id"), nullable=True)
     branch_type = Column(Enum(BranchType), default=BranchType.MAIN, nullable=False)
@@ -30,3 +31,41 @@ class Chapter(Base):
     novel = relationship("Novel", back_populates="chapters")
     author = relationship("User", back_populates="chapters")
     parent_chapter = relationship("Chapter", remote_side=[id], backref="forked_chapters")
+    # Loaded only when the body is touched, so metadata queries never read it
+    body = relationship(ChapterBody, uselist=False, lazy="select", cascade="all, delete-orphan")
+
+    @property
+    def content(self) -> str:
+        """The chapter body, reassembled from deduplicated paragraphs"""
+        if "_content" not in self.__dict__:
+            hashes = parse_hashes(self.body.paragraph_hashes) if self.body else []
+            texts = load_paragraphs(object_session(self), hashes)
+            self.__dict__["_content"] = "\n".join(texts[h] for h in hashes)
+        return self.__dict__["_content"]
+
+    @content.setter
+    def content(self, value: str):
+        if self.body is None:
+            self.body = ChapterBody()
+        old_hash = self.body.content_hash
+        self.body.set_text(value)
+        # The body lives in another table, so the chapter row would not see the change.
+        # New chapters are left alone: both timestamps get their default at the first flush
+        if self.body.content_hash != old_hash and inspect(self).persistent:
+            self.updated_at = datetime.utcnow()
+        self.__dict__["_content"] = value
+
+    __table_args__ = (
+        # get_main_chapters / get_merged_chapters
+        Index("ix_chapters_novel_branch_number", "novel_id", "branch_type", "chapter_number"),
+        # get_chapters_by_novel keyset pages
+        Index("ix_chapters_novel_number_id", "novel_id", "chapter_number", "id"),
+        # get_fork_chapters / get_merged_chapters_for_parent
+        Index("ix_chapters_parent_branch", "parent_chapter_id", "branch_type"),
+    )
+
+
+@event.listens_for(Chapter, "expire")
+@event.listens_for(Chapter, "refresh")
+def _drop_cached_content(target, *args):
+    target.__dict__.pop("_content", None)
@@ -0,0 +1,31 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String, Text
+
+from app.core.compression import content_checksum
+from app.core.database import Base
+from app.models.paragraph import join_hashes, paragraph_hash, split_paragraphs
+
+
+class ChapterBody(Base):
+    """A chapter's body, kept out of the `chapters` row
+
+    The text itself lives in deduplicated, precompressed `paragraphs`; this row
+    holds their order plus what is needed to serve them without re-encoding.
+    """
+    __tablename__ = "chapter_bodies"
+
+    chapter_id = Column(Integer, ForeignKey("chapters.id", ondelete="CASCADE"), primary_key=True)
+    # Space-separated paragraph hashes in reading order
+    paragraph_hashes = Column(Text, nullable=False)
+    # Hash of the whole body, for caches keyed on content
+    content_hash = Column(String(32), nullable=False)
+    # CRC32 and length of '{"content":"<escaped body>' for gzip responses
+    json_crc32 = Column(BigInteger, nullable=False)
+    json_size = Column(Integer, nullable=False)
+
+    def set_text(self, text: str):
+        paragraphs = split_paragraphs(text)
+        self.paragraph_hashes = join_hashes(h for h, _ in paragraphs)
+        self.content_hash = paragraph_hash(text)
+        self.json_crc32, self.json_size = content_checksum(p for _, p in paragraphs)
+        # Stored by the before_flush hook in app.models.paragraph
+        self.__dict__["_pending_paragraphs"] = dict(paragraphs)
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, String, Text
+
+from app.core.database import Base
+
+
+class ChapterDiff(Base):
+    """Cached diff between two chapter bodies, keyed by their content hashes
+
+    Entries never go stale: editing either chapter changes its content hash,
+    so the next lookup simply misses and computes a new entry. They are
+    deleted once nothing needs them (app.crud.chapter_diff.drop_chapter_diffs
+    and drop_merge_request_diffs), so the table stays as large as the open
+    review queue.
+    """
+    __tablename__ = "chapter_diffs"
+    __table_args__ = (
+        # drop_chapter_diffs deletes by either side; the primary key covers base_hash
+        Index("ix_chapter_diffs_head_hash", "head_hash"),
+    )
+
+    base_hash = Column(String(32), primary_key=True)
+    head_hash = Column(String(32), primary_key=True)
+    # JSON from app.core.diff.diff_paragraphs
+    diff = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,54 @@
+"""
+Background jobs, run by the worker process (python -m app.worker).
+
+A job is claimable while it is unfinished and its run_at has passed. run_at
+means "not before" while the job is queued and "lease expires" while it is
+running, so a job whose worker died becomes claimable again by itself once
+its lease runs out, with no separate sweeper.
+"""
+from datetime import datetime
+import enum
+from sqlalchemy import Column, DateTime, Enum, Index, Integer, String, Text
+
+from app.core.database import Base
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    # Name of the handler (app.crud.job.job_handler) that runs it
+    kind = Column(String(100), nullable=False)
+    # JSON object passed to the handler
+    payload = Column(Text, nullable=False, default="{}")
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Worker holding the lease of a running job
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Start of the latest attempt
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # claim_jobs reads the unfinished jobs due first; finished ones stay out of the index
+        Index(
+            "ix_jobs_unfinished_run_at", "run_at", "id",
+            sqlite_where=finished_at.is_(None), postgresql_where=finished_at.is_(None)
+        ),
+        # job_stats and prune_jobs read recently / long finished jobs
+        Index(
+            "ix_jobs_finished_at", "finished_at",
+            sqlite_where=finished_at.isnot(None), postgresql_where=finished_at.isnot(None)
+        ),
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
 import enum
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, Text
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, Text
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -28,3 +28,12 @@ class MergeRequest(Base):
     novel = relationship("Novel", back_populates="merge_requests")
     requester = relationship("User", foreign_keys=[requested_by], back_populates="merge_requests")
     from_chapter = relationship("Chapter", foreign_keys=[from_chapter_id])
+
+    __table_args__ = (
+        # get_pending_merge_request_for_chapter
+        Index("ix_merge_requests_from_chapter_status", "from_chapter_id", "status"),
+        # get_merge_requests_by_novel keyset pages
+        Index("ix_merge_requests_novel_created_id", "to_novel_id", "created_at", "id"),
+        # get_merge_requests_by_novel with a status filter (the reviewer's inbox)
+        Index("ix_merge_requests_novel_status_created_id", "to_novel_id", "status", "created_at", "id"),
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -19,3 +19,10 @@ class Novel(Base):
     author = relationship("User", back_populates="novels")
     chapters = relationship("Chapter", back_populates="novel", cascade="all, delete-orphan")
     merge_requests = relationship("MergeRequest", back_populates="novel")
+
+    __table_args__ = (
+        # get_novels keyset pages
+        Index("ix_novels_created_id", "created_at", "id"),
+        # get_followed_novel_ids: a user's own novels
+        Index("ix_novels_author_id", "author_id"),
+    )
@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+
+from app.core.database import Base
+
+
+class NovelFollow(Base):
+    """A reader following a novel: its events reach the reader's GET /api/events streams"""
+    __tablename__ = "novel_follows"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    novel_id = Column(Integer, ForeignKey("novels.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,51 @@
+"""
+Community shares (社区股份制): who holds how much of a novel.
+
+The founder (the novel's author) is given a fixed block of shares plus a
+locked floor ratio that never dilutes. Every accepted contribution, a MAIN
+or MERGED chapter by someone else, awards shares from the community pool,
+and a new pool of the same size is issued whenever it runs out, diluting
+everyone's unlocked part. Only share counts are stored; ratios depend on
+the current total and are derived when read (app.crud.share).
+"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer
+
+from app.core.database import Base
+
+
+class NovelSharePool(Base):
+    """A novel's share configuration and running total, one row per novel
+
+    The configuration is copied from settings when the row is created, so
+    changing the defaults never rewrites existing novels.
+    """
+    __tablename__ = "novel_share_pools"
+
+    novel_id = Column(Integer, ForeignKey("novels.id", ondelete="CASCADE"), primary_key=True)
+    founder_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Founder shares plus the first community pool
+    base_shares = Column(Integer, nullable=False)
+    founder_shares = Column(Integer, nullable=False)
+    # Ratio of the novel the founder keeps however many shares are issued
+    founder_floor = Column(Float, nullable=False)
+    shares_per_chapter = Column(Integer, nullable=False)
+    # Shares held by contributors, i.e. the sum of novel_shareholders.shares
+    awarded_shares = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class NovelShareholder(Base):
+    """Contributor holdings; the founder's block lives on the pool row"""
+    __tablename__ = "novel_shareholders"
+
+    novel_id = Column(Integer, ForeignKey("novels.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Accepted chapters and the shares they earned
+    chapters = Column(Integer, nullable=False, default=0)
+    shares = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # get_shares lists a novel's holders, largest first
+        Index("ix_novel_shareholders_novel_shares", "novel_id", "shares", "user_id"),
+    )
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+
+from app.core.database import Base
+
+
+class NovelStats(Base):
+    """Denormalized per-novel counters, one row per novel
+
+    Written by app.crud.novel_stats in the same transaction as the change they
+    count, so listings can show and sort by them without aggregate queries.
+    scripts/reconcile_novel_stats.py recomputes them from the source tables.
+    """
+    __tablename__ = "novel_stats"
+
+    novel_id = Column(Integer, ForeignKey("novels.id", ondelete="CASCADE"), primary_key=True)
+    # Chapters by branch type
+    chapter_count = Column(Integer, nullable=False, default=0)
+    fork_count = Column(Integer, nullable=False, default=0)
+    merged_count = Column(Integer, nullable=False, default=0)
+    pending_merge_requests = Column(Integer, nullable=False, default=0)
+    # When a chapter was last written; the novel's creation time until then
+    last_chapter_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # get_novels sorted by a counter
+        Index("ix_novel_stats_chapter_count", "chapter_count", "novel_id"),
+        Index("ix_novel_stats_fork_count", "fork_count", "novel_id"),
+        Index("ix_novel_stats_pending_merge_requests", "pending_merge_requests", "novel_id"),
+        Index("ix_novel_stats_last_chapter_at", "last_chapter_at", "novel_id"),
+    )
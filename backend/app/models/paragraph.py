@@ -0,0 +1,113 @@
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import Column, LargeBinary, String, event, text
+from sqlalchemy.orm import Session
+
+from app.core.compression import deflate_segment, escape_json_text, inflate_segment, unescape_json_text
+from app.core.database import Base, insert_ignore, lock_for_write
+
+
+# Older SQLite builds cap a statement at 999 bound parameters
+IN_BATCH_SIZE = 500
+# Key of the PostgreSQL advisory lock taken by lock_paragraphs
+_PARAGRAPH_LOCK_KEY = (22, 0)
+
+
+class Paragraph(Base):
+    """Deduplicated paragraph text, addressed by a 128-bit BLAKE2b digest"""
+    __tablename__ = "paragraphs"
+
+    hash = Column(String(32), primary_key=True)
+    # JSON-escaped text as a concatenable DEFLATE segment (see app.core.compression)
+    data = Column(LargeBinary, nullable=False)
+
+
+def paragraph_hash(text: str) -> str:
+    # 128 bits keeps the per-paragraph reference short; collisions stay out of reach
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def split_paragraphs(content: str) -> List[Tuple[str, str]]:
+    """Split a chapter body into (hash, text) paragraphs, one per line
+
+    Joining the texts with "\\n" gives back the original body exactly.
+    """
+    return [(paragraph_hash(line), line) for line in content.split("\n")]
+
+
+def encode_paragraph(text: str) -> bytes:
+    return deflate_segment(escape_json_text(text))
+
+
+def decode_paragraph(data: bytes) -> str:
+    return unescape_json_text(inflate_segment(data))
+
+
+def join_hashes(hashes: Iterable[str]) -> str:
+    return " ".join(hashes)
+
+
+def parse_hashes(paragraph_hashes: str) -> List[str]:
+    return paragraph_hashes.split(" ") if paragraph_hashes else []
+
+
+def load_paragraph_segments(db: Session, hashes: Iterable[str]) -> Dict[str, bytes]:
+    """Fetch the stored segments of many paragraphs with batched IN queries"""
+    wanted = list(set(hashes))
+    segments = {}
+    for start in range(0, len(wanted), IN_BATCH_SIZE):
+        batch = wanted[start:start + IN_BATCH_SIZE]
+        rows = db.query(Paragraph.hash, Paragraph.data).filter(Paragraph.hash.in_(batch)).all()
+        segments.update((row.hash, row.data) for row in rows)
+    return segments
+
+
+def load_paragraphs(db: Session, hashes: Iterable[str]) -> Dict[str, str]:
+    """Fetch the text of many paragraphs with batched IN queries"""
+    return {h: decode_paragraph(data) for h, data in load_paragraph_segments(db, hashes).items()}
+
+
+def lock_paragraphs(db: Session, exclusive: bool = False) -> None:
+    """Keep paragraph sweeps (exclusive) and body writes (shared) apart until this transaction ends
+
+    A body write checks which of its paragraphs are stored and only inserts
+    the others, so a sweep (app.crud.paragraph) must not delete one of those
+    before the body referencing it commits. SQLite takes its single write
+    lock either way.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        db.execute(text(f"SELECT {function}(:namespace, :key)"), dict(zip(("namespace", "key"), _PARAGRAPH_LOCK_KEY)))
+    else:
+        lock_for_write(db)
+
+
+def store_paragraphs(db: Session, paragraphs: Dict[str, str]) -> None:
+    """Insert paragraphs that are not stored yet; existing hashes are left alone"""
+    if not paragraphs:
+        return
+    existing = set()
+    hashes = list(paragraphs)
+    for start in range(0, len(hashes), IN_BATCH_SIZE):
+        batch = hashes[start:start + IN_BATCH_SIZE]
+        existing.update(row.hash for row in db.query(Paragraph.hash).filter(Paragraph.hash.in_(batch)))
+    missing = [
+        {"hash": h, "data": encode_paragraph(text)} for h, text in paragraphs.items() if h not in existing
+    ]
+    # Another worker may store the same paragraph between the check and the insert
+    insert_ignore(db, Paragraph, missing, index_elements=["hash"])
+
+
+@event.listens_for(Session, "before_flush")
+def _store_pending_paragraphs(session, flush_context, instances):
+    """Write the paragraphs of chapter bodies set since the last flush"""
+    pending = {}
+    for obj in list(session.new) + list(session.dirty):
+        paragraphs = obj.__dict__.pop("_pending_paragraphs", None)
+        if paragraphs:
+            pending.update(paragraphs)
+    if pending:
+        with session.no_autoflush:
+            lock_paragraphs(session)
+            store_paragraphs(session, pending)
@@ -0,0 +1,44 @@
+"""
+Full-text search index over novels and chapters.
+
+This is not an ORM model: on SQLite it is an FTS5 virtual table, on
+PostgreSQL a plain table with a GIN-indexed tsvector. Both hold text already
+tokenized by app.core.search and are written through app.crud.search.
+
+Each document's rowid encodes what it is (see document_rowid), so updates
+and deletes address a single row directly.
+"""
+from sqlalchemy import text
+
+SEARCH_TABLE = "search_index"
+
+NOVEL_DOCUMENT = 0
+CHAPTER_DOCUMENT = 1
+
+
+def document_rowid(kind: int, doc_id: int) -> int:
+    return doc_id * 2 + kind
+
+
+def document_key(rowid: int):
+    """(kind, id) of a search_index rowid"""
+    return rowid % 2, rowid // 2
+
+
+def create_search_index(bind) -> None:
+    """Create the search table for the engine's dialect if it is missing"""
+    with bind.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                "rowid BIGINT PRIMARY KEY, novel_id INTEGER NOT NULL, tsv TSVECTOR NOT NULL)"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_tsv ON {SEARCH_TABLE} USING GIN (tsv)"
+            ))
+        else:
+            # Tokens are pre-split by app.core.search, so unicode61 only splits on spaces
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                "title, body, novel_id UNINDEXED, tokenize='unicode61')"
+            ))
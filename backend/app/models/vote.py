@@ -0,0 +1,72 @@
+"""
+Monthly tickets (月票): readers spend a monthly allowance of tickets on novels.
+
+Votes are appended to ticket_votes and nothing is updated per vote: the caps
+are checked against the reader's own ledger rows for the month (at most
+TICKETS_PER_USER_MONTH of them), and novel_ticket_totals and the
+leaderboard are derived from the ledger by app.crud.vote.flush_votes.
+Months are stored as YYYYMM integers.
+"""
+from datetime import datetime
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String
+
+from app.core.database import Base
+
+# novel_ticket_totals / ticket_leaderboard period holding all-time totals
+ALL_TIME = 0
+
+
+class TicketVote(Base):
+    """Append-only ledger; one row per accepted vote"""
+    __tablename__ = "ticket_votes"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    novel_id = Column(Integer, ForeignKey("novels.id", ondelete="CASCADE"), nullable=False)
+    month = Column(Integer, nullable=False)
+    tickets = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set once the vote is counted in novel_ticket_totals
+    flushed = Column(Boolean, default=False, nullable=False)
+
+    __table_args__ = (
+        # flush_votes claims the unflushed tail; the index only holds those rows
+        Index("ix_ticket_votes_unflushed", "id", sqlite_where=flushed.is_(False), postgresql_where=flushed.is_(False)),
+        # record_votes reads a reader's month to check the caps and cooldown
+        Index("ix_ticket_votes_user_month", "user_id", "month"),
+    )
+
+
+class NovelTicketTotal(Base):
+    """Flushed ticket count of a novel per month, and all-time under ALL_TIME"""
+    __tablename__ = "novel_ticket_totals"
+
+    novel_id = Column(Integer, ForeignKey("novels.id", ondelete="CASCADE"), primary_key=True)
+    period = Column(Integer, primary_key=True)
+    tickets = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Leaderboard rebuilds read a period's top novels
+        Index("ix_novel_ticket_totals_period_tickets", "period", "tickets", "novel_id"),
+    )
+
+
+class TicketLeaderboardEntry(Base):
+    """Precomputed leaderboard rows, rewritten per period by flush_votes"""
+    __tablename__ = "ticket_leaderboard"
+
+    period = Column(Integer, primary_key=True)
+    # all / new / growing / mature (app.crud.vote.AGE_BRACKETS)
+    bracket = Column(String(20), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    novel_id = Column(Integer, ForeignKey("novels.id", ondelete="CASCADE"), nullable=False)
+    tickets = Column(Integer, nullable=False)
+    generated_at = Column(DateTime, nullable=False)
+
+
+class VoteFlushState(Base):
+    """Single row; flush_votes locks it so flushes from different workers run one at a time"""
+    __tablename__ = "vote_flush_state"
+
+    id = Column(Integer, primary_key=True)
+    flushed_at = Column(DateTime, nullable=True)
@@ -1,11 +1,26 @@
 from app.schemas.user import User, UserCreate, UserLogin, Token
-from app.schemas.novel import Novel, NovelCreate, NovelUpdate
-from app.schemas.chapter import Chapter, ChapterCreate, ChapterUpdate, ChapterResponse
-from app.schemas.merge_request import MergeRequest, MergeRequestCreate, MergeRequestUpdate
+from app.schemas.novel import Novel, NovelCreate, NovelUpdate, NovelSummary
+from app.schemas.chapter import (
+    Chapter, ChapterCreate, ChapterUpdate, ChapterResponse, ChapterSummary,
+    ChapterTree, ChapterTreeNode, ReadingPath, ReadingPathChapter,
+)
+from app.schemas.pagination import Page
+from app.schemas.search import SearchResult
+from app.schemas.merge_request import (
+    MergeRequest, MergeRequestCreate, MergeRequestUpdate, MergeRequestSummary, MergeRequestDiff,
+    MergeRequestReview, MergeRequestReviewItem, MergeRequestReviewOutcome, MergeRequestReviewResult,
+)
+from app.schemas.share import NovelShares, Shareholder
+from app.schemas.vote import Leaderboard, LeaderboardEntry, VoteCreate, VoteResult
 
 __all__ = [
     "User", "UserCreate", "UserLogin", "Token",
-    "Novel", "NovelCreate", "NovelUpdate",
-    "Chapter", "ChapterCreate", "ChapterUpdate", "ChapterResponse",
-    "MergeRequest", "MergeRequestCreate", "MergeRequestUpdate",
+    "Novel", "NovelCreate", "NovelUpdate", "NovelSummary",
+    "Chapter", "ChapterCreate", "ChapterUpdate", "ChapterResponse", "ChapterSummary",
+    "ChapterTree", "ChapterTreeNode", "ReadingPath", "ReadingPathChapter",
+    "MergeRequest", "MergeRequestCreate", "MergeRequestUpdate", "MergeRequestSummary", "MergeRequestDiff",
+    "MergeRequestReview", "MergeRequestReviewItem", "MergeRequestReviewOutcome", "MergeRequestReviewResult",
+    "NovelShares", "Shareholder",
+    "VoteCreate", "VoteResult", "Leaderboard", "LeaderboardEntry",
+    "Page", "SearchResult",
 ]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from app.models.chapter import BranchType
 
 
@@ -35,3 +35,64 @@ class Chapter(ChapterBase):
 class ChapterResponse(Chapter):
     author_username: Optional[str] = None
     parent_chapter_title: Optional[str] = None
+
+
+class ChapterSummary(BaseModel):
+    """Listing view of a chapter; only the selected fields are present"""
+    id: int
+    novel_id: Optional[int] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    chapter_number: Optional[int] = None
+    parent_chapter_id: Optional[int] = None
+    branch_type: Optional[BranchType] = None
+    author_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    author_username: Optional[str] = None
+    parent_chapter_title: Optional[str] = None
+
+
+class ChapterTreeNode(BaseModel):
+    id: int
+    title: str
+    chapter_number: int
+    parent_chapter_id: Optional[int]
+    branch_type: BranchType
+    author_id: int
+    author_username: str
+    created_at: datetime
+    # Distance from the tree root (roots are 0)
+    depth: int
+    children: List["ChapterTreeNode"] = []
+
+
+class ChapterTree(BaseModel):
+    roots: List[ChapterTreeNode]
+    node_count: int
+    # True when max_depth/max_nodes cut part of the tree off
+    truncated: bool
+
+
+class ReadingPathChapter(BaseModel):
+    id: int
+    title: str
+    chapter_number: int
+    parent_chapter_id: Optional[int]
+    branch_type: BranchType
+    author_id: int
+    author_username: str
+    updated_at: datetime
+    # Neighbours on this path; None at either end
+    prev_chapter_id: Optional[int]
+    next_chapter_id: Optional[int]
+    # Forks and merged chapters branching off this chapter
+    branch_count: int
+
+
+class ReadingPath(BaseModel):
+    novel_id: int
+    # Choices the path took, and those it never reached
+    choices: List[int]
+    ignored_choices: List[int]
+    chapters: List[ReadingPathChapter]
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 from app.models.merge_request import MergeStatus
 
 
@@ -29,3 +29,70 @@ class MergeRequest(MergeRequestBase):
     reviewed_at: Optional[datetime]
     from_chapter_title: Optional[str] = None
     requester_username: Optional[str] = None
+
+
+class MergeRequestSummary(BaseModel):
+    """Listing view of a merge request; only the selected fields are present"""
+    id: int
+    from_chapter_id: Optional[int] = None
+    to_novel_id: Optional[int] = None
+    status: Optional[MergeStatus] = None
+    requested_by: Optional[int] = None
+    review_comment: Optional[str] = None
+    created_at: Optional[datetime] = None
+    reviewed_at: Optional[datetime] = None
+    from_chapter_title: Optional[str] = None
+    requester_username: Optional[str] = None
+
+
+class DiffSegment(BaseModel):
+    op: Literal["equal", "insert", "delete"]
+    text: str
+
+
+class ParagraphDiff(BaseModel):
+    op: Literal["equal", "insert", "delete", "change"]
+    # Set for equal/insert/delete paragraphs
+    text: Optional[str] = None
+    # Character-level edit, set for changed paragraphs
+    segments: Optional[List[DiffSegment]] = None
+
+
+class DiffStats(BaseModel):
+    unchanged: int
+    changed: int
+    inserted: int
+    deleted: int
+    chars_inserted: int
+    chars_deleted: int
+
+
+class MergeRequestDiff(BaseModel):
+    """Diff from the parent chapter (base) to the submitted fork (head)"""
+    merge_request_id: int
+    base_chapter_id: int
+    head_chapter_id: int
+    stats: DiffStats
+    paragraphs: List[ParagraphDiff]
+
+
+class MergeRequestReviewItem(BaseModel):
+    id: int
+    decision: Literal["approve", "reject"]
+    review_comment: Optional[str] = None
+
+
+class MergeRequestReview(BaseModel):
+    items: List[MergeRequestReviewItem] = Field(..., min_length=1, max_length=500)
+
+
+class MergeRequestReviewOutcome(BaseModel):
+    id: int
+    # approved / rejected, or why the request was left unchanged
+    outcome: Literal["approved", "rejected", "not_found", "not_pending", "conflict", "duplicate"]
+    # Status after the review; None for not_found
+    status: Optional[MergeStatus] = None
+
+
+class MergeRequestReviewResult(BaseModel):
+    items: List[MergeRequestReviewOutcome]
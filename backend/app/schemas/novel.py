@@ -23,3 +23,18 @@ class Novel(NovelBase):
     author_id: int
     created_at: datetime
     updated_at: datetime
+
+
+class NovelSummary(BaseModel):
+    """Listing view of a novel; only the selected fields are present"""
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    author_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    chapter_count: Optional[int] = None
+    fork_count: Optional[int] = None
+    merged_count: Optional[int] = None
+    pending_merge_requests: Optional[int] = None
+    last_chapter_at: Optional[datetime] = None
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+from app.models.chapter import BranchType
+
+
+class SearchResult(BaseModel):
+    kind: Literal["novel", "chapter"]
+    id: int
+    novel_id: int
+    novel_title: Optional[str] = None
+    title: str
+    # Chapter results only
+    chapter_number: Optional[int] = None
+    branch_type: Optional[BranchType] = None
+    # Excerpt of the description/content around the first query word
+    snippet: str
+    # Higher is more relevant; only comparable within one query
+    score: float
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class Shareholder(BaseModel):
+    user_id: int
+    username: str
+    founder: bool
+    # Accepted chapters; None for the founder, whose shares are the founder block
+    chapters: Optional[int] = None
+    shares: int
+    # Ratio of the novel held, founder floor included
+    equity: float
+    # Part of the requested payout, in minor units
+    payout: Optional[int] = None
+
+
+class NovelShares(BaseModel):
+    novel_id: int
+    total_shares: int
+    awarded_shares: int
+    # Shares issued but not awarded yet, and the ratio they stand for
+    pool_remaining: int
+    pool_equity: float
+    founder_floor: float
+    holder_count: int
+    payout: Optional[int] = None
+    holders: List[Shareholder]
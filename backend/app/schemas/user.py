@@ -27,3 +27,8 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+
+
+class StreamToken(BaseModel):
+    stream_token: str
+    expires_in: int
@@ -0,0 +1,36 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Literal, Optional
+
+
+class VoteCreate(BaseModel):
+    tickets: int = Field(1, ge=1)
+
+
+class VoteResult(BaseModel):
+    novel_id: int
+    tickets: int
+    # YYYY-MM the tickets were spent in
+    month: str
+    # Tickets the reader has spent this month on this novel / on all novels
+    novel_used: int
+    monthly_used: int
+    novel_remaining: int
+    monthly_remaining: int
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    novel_id: int
+    title: str
+    tickets: int
+
+
+class Leaderboard(BaseModel):
+    board: Literal["monthly", "all_time"]
+    # YYYY-MM for monthly boards
+    month: Optional[str] = None
+    bracket: str
+    # When the board was last rebuilt; None if no votes were counted yet
+    generated_at: Optional[datetime] = None
+    items: List[LeaderboardEntry]
@@ -0,0 +1,121 @@
+"""
+Background job worker: runs the jobs queued with app.crud.job.enqueue.
+
+Usage (from backend/):
+    python -m app.worker            # run until SIGINT / SIGTERM
+    python -m app.worker --once     # run the jobs that are due, then exit
+    python -m app.worker --stats    # print queue depth and latency, then exit
+
+Any number of workers, on any machines sharing the database, can run side by
+side: each job is leased to one worker at a time. On a stop signal the job
+in progress is finished first.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.crud.job import claim_jobs, complete_job, fail_job, get_job_handler, job_stats, prune_jobs
+from app.models.job import Job
+# Modules whose job handlers this worker runs
+from app.crud import chapter_diff  # noqa: F401
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+class Worker:
+    def __init__(self, name: str = ""):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.done = self.failed = 0
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def run_job(self, job) -> bool:
+        """Run one claimed job in a session of its own; False if it failed"""
+        with SessionLocal() as db:
+            try:
+                handler = get_job_handler(job.kind)
+                if handler is None:
+                    # Possibly queued by a newer release than this worker's: retried later
+                    raise LookupError(f"No handler for job kind {job.kind!r}")
+                handler(db, json.loads(job.payload))
+                db.commit()
+            except Exception:
+                db.rollback()
+                print(f"Job {job.id} ({job.kind}) failed attempt {job.attempts}/{job.max_attempts}:", file=sys.stderr)
+                traceback.print_exc(file=sys.stderr)
+                fail_job(db, job, self.name, traceback.format_exc())
+                self.failed += 1
+                return False
+            if not complete_job(db, job.id, self.name):
+                print(f"Job {job.id} ({job.kind}) finished after its lease expired", file=sys.stderr)
+            self.done += 1
+            return True
+
+    def run_due(self) -> int:
+        """Run jobs until none is due (or the worker is stopping); returns how many ran"""
+        count = 0
+        while not self.stopping.is_set():
+            with SessionLocal() as db:
+                jobs = claim_jobs(db, self.name)
+            if not jobs:
+                break
+            for job in jobs:
+                self.run_job(job)
+                count += 1
+        return count
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Worker {self.name} started", file=sys.stderr)
+        next_prune = 0.0
+        while not self.stopping.is_set():
+            if time.monotonic() >= next_prune:
+                with SessionLocal() as db:
+                    prune_jobs(db)
+                next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+            try:
+                ran = self.run_due()
+            except Exception:
+                # Database unavailable and the like: wait and try again
+                traceback.print_exc(file=sys.stderr)
+                ran = 0
+            if not ran:
+                self.stopping.wait(settings.JOBS_POLL_INTERVAL_SECONDS)
+        print(f"Worker {self.name} stopped: {self.done} done, {self.failed} failed", file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run the jobs that are due, then exit")
+    parser.add_argument("--stats", action="store_true", help="print queue depth and latency, then exit")
+    parser.add_argument("--name", default="", help="worker name recorded on leased jobs (default host:pid)")
+    args = parser.parse_args()
+
+    # The worker may start before the API has created the table
+    Job.__table__.create(bind=engine, checkfirst=True)
+    if args.stats:
+        with SessionLocal() as db:
+            print(json.dumps(job_stats(db), indent=2))
+        return 0
+    worker = Worker(args.name)
+    if args.once:
+        worker.run_due()
+        print(f"{worker.done} done, {worker.failed} failed")
+        return 1 if worker.failed else 0
+    worker.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
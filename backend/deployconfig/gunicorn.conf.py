@@ -1,12 +1,14 @@
 # Gunicorn 配置文件
 import multiprocessing
+import os
 
 # Server socket
 bind = "0.0.0.0:8000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+# 与 Settings.WORKERS 读同一个环境变量，连接池按这个数分配 DB_MAX_CONNECTIONS
+workers = int(os.environ.get("WORKERS", 0)) or multiprocessing.cpu_count() * 2 + 1
 worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 timeout = 30
@@ -0,0 +1,111 @@
+"""
+Load generator for comparing the sync and async read stacks.
+
+Start the API twice with identical settings except ASYNC_DB, e.g.
+
+    ASYNC_DB=false uvicorn app.main:app --port 8000
+    ASYNC_DB=true  uvicorn app.main:app --port 8001
+
+then run the same load against each:
+
+    python -m scripts.bench_reads --base-url http://127.0.0.1:8000 --novel-id 1
+    python -m scripts.bench_reads --base-url http://127.0.0.1:8001 --novel-id 1
+
+Each client thread keeps one keep-alive connection and cycles through the
+hot read endpoints for the given duration.
+"""
+import argparse
+import http.client
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def endpoints(novel_id: int, chapter_id: int):
+    return [
+        "/api/novels?limit=20",
+        f"/api/novels/{novel_id}",
+        f"/api/novels/{novel_id}/chapters?limit=50",
+        f"/api/novels/{novel_id}/chapters/main",
+        f"/api/chapters/{chapter_id}",
+        f"/api/novels/{novel_id}/merge-requests?limit=20",
+    ]
+
+
+def run(base_url: str, paths, concurrency: int, duration: float) -> dict:
+    target = urlsplit(base_url)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        local, failed, i = [], 0, 0
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                continue
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--novel-id", type=int, default=1)
+    parser.add_argument("--chapter-id", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    args = parser.parse_args()
+
+    result = run(args.base_url, endpoints(args.novel_id, args.chapter_id), args.concurrency, args.duration)
+    print(f"{args.base_url}  concurrency={args.concurrency}  duration={args.duration:.0f}s")
+    print(f"requests: {result['requests']}  errors: {result['errors']}  throughput: {result['rps']:.1f} req/s")
+    print(
+        f"latency ms: mean {result['mean_ms']:.1f}  p50 {result['p50_ms']:.1f}  "
+        f"p95 {result['p95_ms']:.1f}  p99 {result['p99_ms']:.1f}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Query-count regression check for the chapter listing endpoints.
+
+Seeds an in-memory SQLite database with a small novel (one chapter of each
+kind) and a large one (100 main chapters, a parent chapter with 100 forks
+and 100 merged chapters), calls every chapter listing endpoint for both, and
+counts the SQL statements each request issues. Exits non-zero if any endpoint
+issues more statements for the large novel than for the small one, i.e. if
+author names, parent titles or bodies are loaded per row again.
+
+Usage (from backend/):
+    python -m scripts.check_query_counts
+"""
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import chapters
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.crud import chapter as chapter_crud
+from app.models import Chapter, Novel, User
+from app.models.chapter import BranchType
+from app.models.search_index import create_search_index
+from app.schemas.chapter import ChapterCreate
+
+LARGE = 100
+CONTENT_FIELDS = "id,title,content,author_username,parent_chapter_title"
+
+
+def seed(db, size: int) -> dict:
+    """A novel with `size` main chapters; the first has `size` forks and `size` merged chapters"""
+    author = User(username=f"author{size}", email=f"author{size}@example.com", password_hash="x")
+    forker = User(username=f"forker{size}", email=f"forker{size}@example.com", password_hash="x")
+    db.add_all([author, forker])
+    db.flush()
+    novel = Novel(title=f"novel {size}", author_id=author.id)
+    db.add(novel)
+    db.commit()
+
+    def add(number: int, parent_id=None, branch_type=BranchType.MAIN, author_id=author.id) -> Chapter:
+        return chapter_crud.create_chapter(db, ChapterCreate(
+            title=f"chapter {number}", content=f"paragraph {number}\n\nshared paragraph",
+            chapter_number=number, parent_chapter_id=parent_id, branch_type=branch_type
+        ), novel.id, author_id)
+
+    mains = [add(number) for number in range(1, size + 1)]
+    for number in range(size):
+        add(1, mains[0].id, BranchType.FORK, forker.id)
+        add(1, mains[0].id, BranchType.MERGED, forker.id)
+    return {"novel_id": novel.id, "parent_id": mains[0].id}
+
+
+def listing_paths(ids: dict) -> dict:
+    novel_id, parent_id = ids["novel_id"], ids["parent_id"]
+    return {
+        "read_novel_chapters": f"/api/novels/{novel_id}/chapters?limit=500",
+        "read_novel_chapters[content]": f"/api/novels/{novel_id}/chapters?limit=500&fields={CONTENT_FIELDS}",
+        "read_main_chapters": f"/api/novels/{novel_id}/chapters/main",
+        "read_main_chapters[content]": f"/api/novels/{novel_id}/chapters/main?fields={CONTENT_FIELDS}",
+        "read_merged_chapters": f"/api/novels/{novel_id}/chapters/merged",
+        "read_fork_chapters": f"/api/chapters/{parent_id}/forks",
+        "read_fork_chapters[content]": f"/api/chapters/{parent_id}/forks?fields={CONTENT_FIELDS}",
+        "read_merged_chapters_for_parent": f"/api/chapters/{parent_id}/merged",
+    }
+
+
+def check() -> list:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    with Session() as db:
+        small, large = seed(db, 1), seed(db, LARGE)
+
+    app = FastAPI()
+    app.include_router(chapters.router, prefix="/api")
+
+    def override_get_db():
+        with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    # Count what a cold request costs, not a cache hit
+    caching, settings.CACHE_ENABLED = settings.CACHE_ENABLED, False
+    failures = []
+    try:
+        small_paths, large_paths = listing_paths(small), listing_paths(large)
+        for name in small_paths:
+            counts = []
+            for path, rows in ((small_paths[name], 1), (large_paths[name], LARGE)):
+                statements.clear()
+                response = client.get(path)
+                body = response.json()
+                items = body["items"] if isinstance(body, dict) else body
+                if response.status_code != 200 or len(items) < rows:
+                    failures.append((name, f"{path} returned {response.status_code} with {len(items)} row(s)"))
+                counts.append(len(statements))
+            status = "ok" if counts[0] == counts[1] else "FAIL"
+            print(f"[{status}] {name}: {counts[0]} statement(s) for 1 row, {counts[1]} for {LARGE} rows")
+            if counts[0] != counts[1]:
+                failures.append((name, f"{counts[0]} statement(s) for 1 row but {counts[1]} for {LARGE}"))
+    finally:
+        settings.CACHE_ENABLED = caching
+    return failures
+
+
+def main() -> int:
+    failures = check()
+    if failures:
+        print(f"\n{len(failures)} listing check(s) failed:")
+        for name, reason in failures:
+            print(f"- {name}: {reason}")
+        return 1
+    print("\nEvery chapter listing issues the same number of statements whatever its size.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
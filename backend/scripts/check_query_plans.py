@@ -0,0 +1,220 @@
+"""
+Query-plan regression check for the crud layer.
+
+Seeds an in-memory SQLite database, runs every read function in app/crud,
+and feeds each emitted statement to EXPLAIN QUERY PLAN. Exits non-zero if
+any statement falls back to a full table scan.
+
+Usage (from backend/):
+    python -m scripts.check_query_plans
+"""
+import re
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.crud import chapter as chapter_crud
+from app.crud import chapter_diff as chapter_diff_crud
+from app.crud import follow as follow_crud
+from app.crud import job as job_crud
+from app.crud import merge_request as merge_request_crud
+from app.crud import novel as novel_crud
+from app.crud import novel_stats as novel_stats_crud
+from app.crud import search as search_crud
+from app.crud import share as share_crud
+from app.crud import user as user_crud
+from app.crud import vote as vote_crud
+from app.models import Chapter, MergeRequest, Novel, User
+from app.models.chapter import BranchType
+from app.models.merge_request import MergeStatus
+from app.models.search_index import create_search_index
+
+NOVELS = 20
+CHAPTERS_PER_NOVEL = 50
+FORKS_PER_CHAPTER = 2
+
+
+def seed(db):
+    users = [
+        User(username=f"user{i}", email=f"user{i}@example.com", password_hash="x")
+        for i in range(10)
+    ]
+    db.add_all(users)
+    db.flush()
+
+    start = datetime(2024, 1, 1)
+    for n in range(NOVELS):
+        novel = Novel(title=f"novel {n}", author_id=users[n % 10].id, created_at=start + timedelta(hours=n))
+        db.add(novel)
+        db.flush()
+        for number in range(1, CHAPTERS_PER_NOVEL + 1):
+            main = Chapter(
+                novel_id=novel.id, title=f"chapter {number}", content="content",
+                chapter_number=number, branch_type=BranchType.MAIN, author_id=novel.author_id
+            )
+            db.add(main)
+            db.flush()
+            for f in range(FORKS_PER_CHAPTER):
+                fork = Chapter(
+                    novel_id=novel.id, title=f"fork {number}.{f}", content="content",
+                    chapter_number=number, parent_chapter_id=main.id,
+                    branch_type=BranchType.MERGED if f == 0 else BranchType.FORK,
+                    author_id=users[(n + f + 1) % 10].id
+                )
+                db.add(fork)
+                db.flush()
+                db.add(MergeRequest(
+                    from_chapter_id=fork.id, to_novel_id=novel.id, requested_by=fork.author_id,
+                    status=MergeStatus.APPROVED if f == 0 else MergeStatus.PENDING,
+                    created_at=start + timedelta(minutes=fork.id)
+                ))
+    db.flush()
+    for novel in db.query(Novel):
+        search_crud.index_novel(db, novel)
+    for chapter in db.query(Chapter):
+        search_crud.index_chapter(db, chapter)
+    db.commit()
+    novel_stats_crud.create_missing_stats(db)
+    share_crud.create_missing_shares(db)
+    for mr_id in range(1, 21):
+        job_crud.enqueue(db, "merge_request.diff", {"merge_request_id": mr_id})
+    db.commit()
+
+
+def crud_calls():
+    """(name, callable) pairs exercising every read path in app/crud"""
+    return [
+        ("user.get_user", lambda db: user_crud.get_user(db, 3)),
+        ("user.get_user_by_username", lambda db: user_crud.get_user_by_username(db, "user3")),
+        ("user.get_user_by_email", lambda db: user_crud.get_user_by_email(db, "user3@example.com")),
+        ("novel.get_novel", lambda db: novel_crud.get_novel(db, 5)),
+        ("novel.get_novel_version", lambda db: novel_crud.get_novel_version(db, 5)),
+        ("novel.get_novels", lambda db: novel_crud.get_novels(db, limit=5)),
+        ("novel.get_novels[cursor]", lambda db: novel_crud.get_novels(
+            db, cursor=novel_crud.get_novels(db, limit=5)[1], limit=5)),
+        ("novel.get_novels[sort]", lambda db: novel_crud.get_novels(db, limit=5, sort="chapter_count")),
+        ("novel.get_novels[sort, cursor]", lambda db: novel_crud.get_novels(
+            db, cursor=novel_crud.get_novels(db, limit=5, sort="last_chapter_at")[1], limit=5, sort="last_chapter_at")),
+        ("novel_stats.compute_stats", lambda db: novel_stats_crud.compute_stats(db, [3, 4, 5])),
+        ("share.compute_shares", lambda db: share_crud.compute_shares(db, [3, 4, 5])),
+        ("share.add_contributions", lambda db: share_crud.add_contributions(db, 5, {3: 1, 4: -1})),
+        ("share.get_shares", lambda db: share_crud.get_shares(db, 5)),
+        ("chapter.get_chapter", lambda db: chapter_crud.get_chapter(db, 10)),
+        ("chapter.get_chapter_detail", lambda db: chapter_crud.get_chapter_detail(db, 10)),
+        ("chapter.get_chapter_version", lambda db: chapter_crud.get_chapter_version(db, 10)),
+        ("chapter.get_novel_chapters_version", lambda db: chapter_crud.get_novel_chapters_version(db, 5)),
+        ("chapter.get_child_chapters_version", lambda db: chapter_crud.get_child_chapters_version(db, 10)),
+        ("chapter.get_chapter_gzip_parts", lambda db: chapter_crud.get_chapter_gzip_parts(db, 10)),
+        ("chapter.get_chapters_by_novel", lambda db: chapter_crud.get_chapters_by_novel(db, 5, limit=10)),
+        ("chapter.get_chapters_by_novel[cursor]", lambda db: chapter_crud.get_chapters_by_novel(
+            db, 5, cursor=chapter_crud.get_chapters_by_novel(db, 5, limit=10)[1], limit=10)),
+        ("chapter.get_main_chapters", lambda db: chapter_crud.get_main_chapters(db, 5)),
+        ("chapter.iter_main_chapters", lambda db: list(chapter_crud.iter_main_chapters(db, 5))),
+        ("chapter.get_merged_chapters", lambda db: chapter_crud.get_merged_chapters(db, 5)),
+        ("chapter.get_fork_chapters", lambda db: chapter_crud.get_fork_chapters(db, 10)),
+        ("chapter.get_merged_chapters_for_parent", lambda db: chapter_crud.get_merged_chapters_for_parent(db, 10)),
+        ("chapter.get_chapter_tree", lambda db: chapter_crud.get_chapter_tree(db, 10)),
+        ("chapter.get_novel_chapter_tree", lambda db: chapter_crud.get_novel_chapter_tree(db, 5)),
+        ("chapter.get_reading_path", lambda db: chapter_crud.get_reading_path(db, 5, [])),
+        ("chapter.get_reading_path(choices)", lambda db: chapter_crud.get_reading_path(db, 5, [100, 101])),
+        ("follow.follow_novel", lambda db: follow_crud.follow_novel(db, 3, 5)),
+        ("follow.get_followed_novel_ids", lambda db: follow_crud.get_followed_novel_ids(db, 3)),
+        ("follow.unfollow_novel", lambda db: follow_crud.unfollow_novel(db, 3, 5)),
+        ("job.claim_jobs", lambda db: job_crud.claim_jobs(db, "check", limit=5)),
+        ("job.complete_job", lambda db: job_crud.complete_job(db, 1, "check")),
+        ("job.job_stats", lambda db: job_crud.job_stats(db)),
+        ("job.prune_jobs", lambda db: job_crud.prune_jobs(db)),
+        ("chapter_diff.precompute_merge_request_diff",
+         lambda db: chapter_diff_crud.precompute_merge_request_diff(db, {"merge_request_id": 2})),
+        ("chapter_diff.drop_merge_request_diffs",
+         lambda db: chapter_diff_crud.drop_merge_request_diffs(db, [11, 12])),
+        ("merge_request.get_merge_request", lambda db: merge_request_crud.get_merge_request(db, 7)),
+        ("merge_request.get_merge_requests_by_novel", lambda db: merge_request_crud.get_merge_requests_by_novel(
+            db, 5, limit=10)),
+        ("merge_request.get_merge_requests_by_novel[cursor]", lambda db: merge_request_crud.get_merge_requests_by_novel(
+            db, 5, cursor=merge_request_crud.get_merge_requests_by_novel(db, 5, limit=10)[1], limit=10)),
+        ("merge_request.get_merge_requests_by_novel[status]", lambda db: merge_request_crud.get_merge_requests_by_novel(
+            db, 5, limit=10, statuses=[MergeStatus.PENDING])),
+        ("merge_request.get_submission_states", lambda db: merge_request_crud.get_submission_states(db, [10, 11, 12])),
+        ("merge_request.get_pending_merge_request_for_chapter",
+         lambda db: merge_request_crud.get_pending_merge_request_for_chapter(db, 11)),
+        ("vote.record_votes", lambda db: vote_crud.record_votes(db, [(3, 5, 1), (4, 5, 1), (3, 6, 2)])),
+        ("vote.flush_votes", lambda db: vote_crud.flush_votes(db)),
+        ("vote.get_leaderboard", lambda db: vote_crud.get_leaderboard(db, vote_crud.month_key(datetime.utcnow()))),
+        ("search.search", lambda db: search_crud.search(db, "chapter 章节", limit=5)),
+        ("search.search[cursor]", lambda db: search_crud.search(
+            db, "chapter", cursor=search_crud.search(db, "chapter", limit=5)[1], limit=5)),
+    ]
+
+
+def full_scans(statement, plan_rows):
+    """Plan lines that read a whole table rather than an index range"""
+    # "SCAN t" is a full table scan; "SCAN t USING INDEX ..." walks an index in
+    # order (bounded by LIMIT), which is what keyset pages on the first page do.
+    # Scanning a CTE's own work queue is how recursion runs and is not a table scan,
+    # and a virtual table scan with an index (FTS5 MATCH) is answered by the index.
+    ctes = set(re.findall(r"(\w+)(?:\([^)]*\))?\s+AS\s*\(", statement))
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        if detail.startswith("SCAN") and " USING " not in detail and "VIRTUAL TABLE INDEX" not in detail \
+                and detail.split()[1] not in ctes:
+            scans.append(detail)
+    return scans
+
+
+def check(calls=None) -> list:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    with Session() as db:
+        seed(db)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    failures = []
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        for name, call in calls or crud_calls():
+            statements.clear()
+            with Session() as db:
+                call(db)
+            captured = list(statements)
+            statements.clear()
+            with engine.connect() as conn:
+                for statement, parameters in captured:
+                    plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                    scans = full_scans(statement, plan)
+                    status = "FAIL" if scans else "ok"
+                    print(f"[{status}] {name}: " + "; ".join(row[-1] for row in plan))
+                    if scans:
+                        failures.append((name, statement, scans))
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return failures
+
+
+def main() -> int:
+    failures = check()
+    if failures:
+        print(f"\n{len(failures)} statement(s) fell back to a full table scan:")
+        for name, statement, scans in failures:
+            print(f"- {name}: {', '.join(scans)}\n  {' '.join(statement.split())}")
+        return 1
+    print("\nAll crud queries use an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Convert existing chapter bodies to the current storage layout.
+
+Bodies now live in `chapter_bodies` (paragraph order and checksums) and the
+deduplicated, precompressed `paragraphs` table. This converts databases that
+still keep them in either older layout:
+
+- inline text in chapters.content
+- plain-text paragraphs referenced from chapters.paragraph_hashes
+
+and reports how much space the new layout saves compared to inline text.
+
+Usage (from backend/):
+    python -m scripts.migrate_chapter_storage            # migrate
+    python -m scripts.migrate_chapter_storage --dry-run  # report only
+    python -m scripts.migrate_chapter_storage --keep-old # keep the old columns/tables
+"""
+import argparse
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models.chapter_body import ChapterBody
+from app.models.paragraph import IN_BATCH_SIZE, Paragraph, encode_paragraph, parse_hashes, split_paragraphs
+
+BATCH_SIZE = 500
+LEGACY_PARAGRAPHS = "paragraphs_v1"
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _columns(table: str) -> set:
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def _legacy_texts(db: Session, table: str, hash_lists) -> dict:
+    """Plain-text paragraphs from the interim `paragraphs(hash, text)` table"""
+    wanted = list({h for hashes in hash_lists for h in hashes})
+    texts = {}
+    for start in range(0, len(wanted), IN_BATCH_SIZE):
+        batch = wanted[start:start + IN_BATCH_SIZE]
+        params = {f"h{i}": h for i, h in enumerate(batch)}
+        placeholders = ", ".join(f":{name}" for name in params)
+        rows = db.execute(
+            text(f"SELECT hash, text FROM {table} WHERE hash IN ({placeholders})"), params
+        )
+        texts.update((h, t) for h, t in rows)
+    return texts
+
+
+def migrate(dry_run: bool = False, keep_old: bool = False) -> dict:
+    chapter_columns = _columns("chapters")
+    if "content" in chapter_columns:
+        source = "content"
+    elif "paragraph_hashes" in chapter_columns:
+        source = "paragraph_hashes"
+    else:
+        print("Chapter bodies are already in chapter_bodies; nothing to migrate.")
+        return {}
+
+    legacy_table = None
+    if source == "paragraph_hashes":
+        if "text" in _columns("paragraphs"):
+            legacy_table = "paragraphs"
+        elif _columns(LEGACY_PARAGRAPHS):
+            legacy_table = LEGACY_PARAGRAPHS
+    if not dry_run:
+        if legacy_table == "paragraphs":
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE paragraphs RENAME TO {LEGACY_PARAGRAPHS}"))
+            legacy_table = LEGACY_PARAGRAPHS
+        Paragraph.__table__.create(bind=engine, checkfirst=True)
+        ChapterBody.__table__.create(bind=engine, checkfirst=True)
+
+    stats = {"chapters": 0, "paragraphs": 0, "unique_paragraphs": 0, "before": 0, "after": 0}
+    seen = set()
+    with Session(engine) as db:
+        last_id = 0
+        while True:
+            rows = db.execute(
+                text(f"SELECT id, {source} FROM chapters WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": BATCH_SIZE}
+            ).all()
+            if not rows:
+                break
+            if source == "paragraph_hashes":
+                hash_lists = [parse_hashes(value or "") for _, value in rows]
+                texts = _legacy_texts(db, legacy_table, hash_lists) if legacy_table else {}
+                bodies = [
+                    (row[0], "\n".join(texts.get(h, "") for h in hashes))
+                    for row, hashes in zip(rows, hash_lists)
+                ]
+            else:
+                bodies = [(chapter_id, content or "") for chapter_id, content in rows]
+
+            done = set()
+            if not dry_run:
+                done = {
+                    chapter_id for (chapter_id,) in db.query(ChapterBody.chapter_id).filter(
+                        ChapterBody.chapter_id.in_([chapter_id for chapter_id, _ in bodies])
+                    )
+                }
+            for chapter_id, content in bodies:
+                paragraphs = split_paragraphs(content)
+                stats["chapters"] += 1
+                stats["paragraphs"] += len(paragraphs)
+                stats["before"] += len(content.encode("utf-8"))
+                # Paragraph order plus the fixed-size checksum/hash columns
+                stats["after"] += len(paragraphs) * 33 + 32 + 12
+                for h, paragraph in paragraphs:
+                    if h not in seen:
+                        seen.add(h)
+                        stats["after"] += len(h) + len(encode_paragraph(paragraph))
+                if not dry_run and chapter_id not in done:
+                    body = ChapterBody(chapter_id=chapter_id)
+                    body.set_text(content)
+                    db.add(body)
+            if not dry_run:
+                db.commit()
+            last_id = rows[-1][0]
+    stats["unique_paragraphs"] = len(seen)
+
+    if not dry_run and not keep_old:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE chapters DROP COLUMN {source}"))
+            if legacy_table:
+                conn.execute(text(f"DROP TABLE {legacy_table}"))
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only report the expected savings")
+    parser.add_argument("--keep-old", action="store_true", help="leave the old column and table in place")
+    args = parser.parse_args()
+
+    stats = migrate(dry_run=args.dry_run, keep_old=args.keep_old)
+    if not stats:
+        return 0
+    saved = stats["before"] - stats["after"]
+    ratio = saved / stats["before"] * 100 if stats["before"] else 0.0
+    print(f"Chapters:          {stats['chapters']}")
+    print(f"Paragraphs:        {stats['paragraphs']} ({stats['unique_paragraphs']} unique)")
+    print(f"Inline bodies:     {_format_bytes(stats['before'])}")
+    print(f"New storage:       {_format_bytes(stats['after'])} (chapter_bodies + unique compressed paragraphs)")
+    print(f"Saved:             {_format_bytes(saved)} ({ratio:.1f}%)")
+    if args.dry_run:
+        print("Dry run: nothing was changed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
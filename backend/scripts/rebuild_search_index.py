@@ -0,0 +1,53 @@
+"""
+Fill the full-text search index from existing novels and chapters.
+
+The index is kept up to date by the crud layer as content is written; this
+is only needed once for data created before search existed, or to recover
+from a damaged index.
+
+Usage (from backend/):
+    python -m scripts.rebuild_search_index
+"""
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.crud.search import index_chapter, index_novel
+from app.models.chapter import Chapter
+from app.models.novel import Novel
+from app.models.search_index import SEARCH_TABLE, create_search_index
+
+BATCH_SIZE = 200
+
+
+def rebuild() -> dict:
+    create_search_index(engine)
+    counts = {"novels": 0, "chapters": 0}
+    with Session(engine) as db:
+        db.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        for model, index, key in ((Novel, index_novel, "novels"), (Chapter, index_chapter, "chapters")):
+            last_id = 0
+            while True:
+                batch = db.query(model).filter(model.id > last_id).order_by(model.id).limit(BATCH_SIZE).all()
+                if not batch:
+                    break
+                for obj in batch:
+                    index(db, obj)
+                counts[key] += len(batch)
+                last_id = batch[-1].id
+                # Keep the identity map small on large databases
+                db.expunge_all()
+        db.commit()
+    return counts
+
+
+def main() -> int:
+    counts = rebuild()
+    print(f"Indexed {counts['novels']} novels and {counts['chapters']} chapters.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Rebuild the contributor share ledger (novel_shareholders / novel_share_pools) from chapters.
+
+Holdings are maintained incrementally by every chapter write and merge
+approval, so they only drift if chapters change behind the crud layer's back
+(manual SQL, a restored backup, a bug). This reports each novel whose stored
+holdings differ from those recomputed from its accepted chapters and, unless
+--check is given, rebuilds it. Pools keep their configuration.
+
+Usage (from backend/):
+    python -m scripts.reconcile_novel_shares            # report and fix
+    python -m scripts.reconcile_novel_shares --check    # report only; exit 1 on drift
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.crud.share import RECONCILE_BATCH_SIZE, reconcile_shares
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report drift, change nothing")
+    parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(engine) as db:
+        drift = reconcile_shares(db, fix=not args.check, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    for row in drift:
+        if row["missing"]:
+            print(f"novel {row['novel_id']}: no share pool")
+            continue
+        awarded = row["awarded_shares"]
+        print(f"novel {row['novel_id']}: awarded_shares {awarded['stored']} -> {awarded['actual']}, "
+              f"{len(row['holders'])} holder(s) changed")
+        for holder in row["holders"]:
+            print(f"  user {holder['user_id']}: {holder['stored']} -> {holder['actual']} shares")
+    print(f"Checked in {elapsed:.2f}s.")
+    if not drift:
+        print("No drift.")
+    elif args.check:
+        print(f"{len(drift)} novel(s) drifted; run without --check to fix.")
+        return 1
+    else:
+        print(f"Fixed {len(drift)} novel(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Recompute the per-novel statistics (novel_stats) from chapters and merge requests.
+
+The counters are maintained incrementally by every write, so they only drift
+if something changes the tables behind the crud layer's back (manual SQL, a
+restored backup, a bug). This reports each novel whose stored counters differ
+from the recomputed ones and, unless --check is given, rewrites them. A write
+committed while a batch is being recomputed can be overwritten with the
+older value; a second run picks that up.
+
+Usage (from backend/):
+    python -m scripts.reconcile_novel_stats            # report and fix
+    python -m scripts.reconcile_novel_stats --check    # report only; exit 1 on drift
+"""
+import argparse
+import sys
+
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.crud.novel_stats import RECONCILE_BATCH_SIZE, reconcile_stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report drift, change nothing")
+    parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        drift = reconcile_stats(db, fix=not args.check, batch_size=args.batch_size)
+    for row in drift:
+        if row["missing"]:
+            print(f"novel {row['novel_id']}: no stats row")
+            continue
+        changes = ", ".join(
+            f"{name} {value['stored']} -> {value['actual']}"
+            for name, value in row.items() if name not in ("novel_id", "missing")
+        )
+        print(f"novel {row['novel_id']}: {changes}")
+    if not drift:
+        print("No drift.")
+    elif args.check:
+        print(f"{len(drift)} novel(s) drifted; run without --check to fix.")
+        return 1
+    else:
+        print(f"Fixed {len(drift)} novel(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Disable or re-enable a user account.
+
+A disabled user can no longer log in, and requests with their existing
+tokens are rejected as soon as every worker has seen the cache invalidation
+(within CACHE_POLL_INTERVAL_SECONDS).
+
+Usage (from backend/):
+    python -m scripts.set_user_active <username> --disable
+    python -m scripts.set_user_active <username> --enable
+"""
+import argparse
+import sys
+
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.crud.user import get_user_by_username, set_user_active
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("username")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--disable", action="store_true")
+    group.add_argument("--enable", action="store_true")
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        user = get_user_by_username(db, args.username)
+        if user is None:
+            print(f"User not found: {args.username}")
+            return 1
+        set_user_active(db, user, is_active=args.enable)
+        print(f"{user.username} is now {'active' if user.is_active else 'disabled'}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
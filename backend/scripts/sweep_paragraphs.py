@@ -0,0 +1,52 @@
+"""
+Delete stored paragraphs that no chapter body references any more.
+
+Chapter bodies are kept as references into the shared, deduplicated
+`paragraphs` table. Editing or deleting a chapter drops its references but
+leaves the paragraphs, since other bodies may still use them. This finds
+the ones nothing uses and deletes them. It is safe to run while the app
+serves traffic; chapter writes only wait for the final recheck and delete.
+Do not run it while scripts.migrate_chapter_storage is converting bodies.
+
+Usage (from backend/):
+    python -m scripts.sweep_paragraphs            # delete unused paragraphs
+    python -m scripts.sweep_paragraphs --dry-run  # only count them
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.crud.paragraph import sweep_paragraphs
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only count unused paragraphs, delete nothing")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(engine) as db:
+        result = sweep_paragraphs(db, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - start
+    print(f"{result['paragraphs']} paragraph(s) stored, {result['referenced']} referenced by chapter bodies.")
+    if args.dry_run:
+        print(f"{result['unused']} unused; run without --dry-run to delete them.")
+    else:
+        print(f"Deleted {result['deleted']} unused paragraph(s), {_format_bytes(result['bytes'])}.")
+    print(f"Done in {elapsed:.2f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,7 +29,7 @@ export default function MergeRequestsPage() {
         mergeRequestService.getMergeRequests(novelId),
       ]);
       setNovel(novelData);
-      setMergeRequests(mrs);
+      setMergeRequests(mrs.items);
     } catch (error) {
       console.error('Failed to load data:', error);
     } finally {
@@ -21,7 +21,7 @@ export default function NovelsPage() {
   const loadNovels = async () => {
     try {
       const data = await novelService.getNovels();
-      setNovels(data);
+      setNovels(data.items);
     } catch (error) {
       console.error('Failed to load novels:', error);
     } finally {
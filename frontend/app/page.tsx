@@ -19,7 +19,7 @@ export default function HomePage() {
   const loadNovels = async () => {
     try {
       const data = await novelService.getNovels();
-      setNovels(data);
+      setNovels(data.items);
     } catch (error) {
       console.error('Failed to load novels:', error);
     } finally {
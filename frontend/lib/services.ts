@@ -1,7 +1,9 @@
 import api from './api';
 import type {
-  User, Novel, Chapter, MergeRequest,
-  LoginRequest, RegisterRequest, AuthResponse
+  User, Novel, NovelSort, Chapter, ChapterTree, ReadingPath, MergeRequest, MergeRequestDiff, Page, SearchResult,
+  ImportEvent, ImportFormat, MergeRequestReviewItem, MergeRequestReviewOutcome,
+  VoteResult, Leaderboard, LeaderboardBoard, LeaderboardBracket, NovelShares, NovelEvent, NovelEventType,
+  LoginRequest, RegisterRequest, AuthResponse, StreamToken
 } from './types';
 
 // Auth Service
@@ -43,8 +45,11 @@ export const authService = {
 
 // Novels Service
 export const novelService = {
-  getNovels: async (): Promise<Novel[]> => {
-    const response = await api.get<Novel[]>('/novels');
+  // 统计排序（chapter_count 等）按从多到少 / 从新到旧
+  getNovels: async (cursor?: string, sort: NovelSort = 'created_at'): Promise<Page<Novel>> => {
+    const response = await api.get<Page<Novel>>('/novels', {
+      params: { cursor, sort }
+    });
     return response.data;
   },
 
@@ -66,17 +71,92 @@ export const novelService = {
   deleteNovel: async (id: number): Promise<void> => {
     await api.delete(`/novels/${id}`);
   },
+
+  // 关注后，已打开的事件流会立即开始推送该小说的事件
+  followNovel: async (id: number): Promise<void> => {
+    await api.put(`/novels/${id}/follow`);
+  },
+
+  unfollowNovel: async (id: number): Promise<void> => {
+    await api.delete(`/novels/${id}/follow`);
+  },
+
+  // payout 为试算分红金额（分），按持股比例拆成整数
+  getShares: async (id: number, params?: { limit?: number; payout?: number }): Promise<NovelShares> => {
+    const response = await api.get<NovelShares>(`/novels/${id}/shares`, { params });
+    return response.data;
+  },
+
+  // 投月票；额度用完返回 400，冷却中返回 429（Retry-After 头给出剩余秒数）
+  voteForNovel: async (id: number, tickets = 1): Promise<VoteResult> => {
+    const response = await api.post<VoteResult>(`/novels/${id}/votes`, { tickets });
+    return response.data;
+  },
+
+  // 排行榜为定期预计算结果，新投的票会在几秒后计入；month 形如 2025-01，默认本月
+  getLeaderboard: async (params?: {
+    board?: LeaderboardBoard;
+    month?: string;
+    bracket?: LeaderboardBracket;
+    limit?: number;
+  }): Promise<Leaderboard> => {
+    const response = await api.get<Leaderboard>('/novels/leaderboard', { params });
+    return response.data;
+  },
+
+  // 导出无需登录，直接作为下载链接使用（<a href download>），浏览器边收边存
+  getExportUrl: (id: number, format: ImportFormat = 'txt'): string =>
+    `${api.defaults.baseURL}/novels/${id}/export?format=${format}`,
+
+  // 文件原样作为请求体上传；返回最后一个事件（done 或 error），onProgress 收到每批进度
+  importNovel: async (
+    id: number,
+    file: Blob,
+    format: ImportFormat,
+    onProgress?: (event: ImportEvent) => void,
+    encoding = 'utf-8'
+  ): Promise<ImportEvent> => {
+    const parse = (text: string): ImportEvent[] =>
+      text.split('\n').filter(Boolean).map((line) => JSON.parse(line) as ImportEvent);
+    let seen = 0;
+    const response = await api.post<string>(`/novels/${id}/import`, file, {
+      params: { format, encoding },
+      headers: { 'Content-Type': 'application/octet-stream' },
+      responseType: 'text',
+      transformResponse: (data) => data,
+      onDownloadProgress: (progress) => {
+        const text: string = (progress.event?.target as XMLHttpRequest | undefined)?.responseText ?? '';
+        // 只处理已完整收到的行
+        const events = parse(text.slice(0, text.lastIndexOf('\n') + 1));
+        events.slice(seen).forEach((event) => onProgress?.(event));
+        seen = events.length;
+      },
+    });
+    const events = parse(response.data);
+    return events[events.length - 1];
+  },
 };
 
+// 章节列表默认不返回正文；需要显示正文预览时显式请求 content 字段
+export const CHAPTER_PREVIEW_FIELDS = [
+  'id', 'novel_id', 'title', 'content', 'chapter_number', 'parent_chapter_id',
+  'branch_type', 'author_id', 'author_username', 'parent_chapter_title',
+  'created_at', 'updated_at',
+].join(',');
+
 // Chapters Service
 export const chapterService = {
-  getChapters: async (novelId: number): Promise<Chapter[]> => {
-    const response = await api.get<Chapter[]>(`/novels/${novelId}/chapters`);
+  getChapters: async (novelId: number, fields?: string, cursor?: string): Promise<Page<Chapter>> => {
+    const response = await api.get<Page<Chapter>>(`/novels/${novelId}/chapters`, {
+      params: { fields, cursor }
+    });
     return response.data;
   },
 
-  getMainChapters: async (novelId: number): Promise<Chapter[]> => {
-    const response = await api.get<Chapter[]>(`/novels/${novelId}/chapters/main`);
+  getMainChapters: async (novelId: number, fields: string = CHAPTER_PREVIEW_FIELDS): Promise<Chapter[]> => {
+    const response = await api.get<Chapter[]>(`/novels/${novelId}/chapters/main`, {
+      params: { fields }
+    });
     return response.data;
   },
 
@@ -112,26 +192,56 @@ export const chapterService = {
     return response.data;
   },
 
-  getForkChapters: async (id: number): Promise<Chapter[]> => {
-    const response = await api.get<Chapter[]>(`/chapters/${id}/forks`);
+  getForkChapters: async (id: number, fields: string = CHAPTER_PREVIEW_FIELDS): Promise<Chapter[]> => {
+    const response = await api.get<Chapter[]>(`/chapters/${id}/forks`, {
+      params: { fields }
+    });
+    return response.data;
+  },
+
+  getMergedChapters: async (novelId: number, fields: string = CHAPTER_PREVIEW_FIELDS): Promise<Chapter[]> => {
+    const response = await api.get<Chapter[]>(`/novels/${novelId}/chapters/merged`, {
+      params: { fields }
+    });
     return response.data;
   },
 
-  getMergedChapters: async (novelId: number): Promise<Chapter[]> => {
-    const response = await api.get<Chapter[]>(`/novels/${novelId}/chapters/merged`);
+  getMergedChaptersForParent: async (chapterId: number, fields: string = CHAPTER_PREVIEW_FIELDS): Promise<Chapter[]> => {
+    const response = await api.get<Chapter[]>(`/chapters/${chapterId}/merged`, {
+      params: { fields }
+    });
     return response.data;
   },
 
-  getMergedChaptersForParent: async (chapterId: number): Promise<Chapter[]> => {
-    const response = await api.get<Chapter[]>(`/chapters/${chapterId}/merged`);
+  getChapterTree: async (chapterId: number): Promise<ChapterTree> => {
+    const response = await api.get<ChapterTree>(`/chapters/${chapterId}/tree`);
+    return response.data;
+  },
+
+  getNovelChapterTree: async (novelId: number): Promise<ChapterTree> => {
+    const response = await api.get<ChapterTree>(`/novels/${novelId}/chapters/tree`);
+    return response.data;
+  },
+
+  // choices 为读者选中的分支章节 id，在其父章节处转入该分支；为空时即主线
+  getReadingPath: async (novelId: number, choices: number[] = []): Promise<ReadingPath> => {
+    const response = await api.get<ReadingPath>(`/novels/${novelId}/path`, {
+      params: choices.length ? { choices: choices.join(',') } : undefined
+    });
     return response.data;
   },
 };
 
 // Merge Requests Service
 export const mergeRequestService = {
-  getMergeRequests: async (novelId: number): Promise<MergeRequest[]> => {
-    const response = await api.get<MergeRequest[]>(`/novels/${novelId}/merge-requests`);
+  getMergeRequests: async (
+    novelId: number, cursor?: string, status?: MergeRequest['status'][]
+  ): Promise<Page<MergeRequest>> => {
+    const response = await api.get<Page<MergeRequest>>(`/novels/${novelId}/merge-requests`, {
+      params: { cursor, status },
+      // status=pending&status=approved
+      paramsSerializer: { indexes: null },
+    });
     return response.data;
   },
 
@@ -143,6 +253,11 @@ export const mergeRequestService = {
     return response.data;
   },
 
+  getMergeRequestDiff: async (id: number): Promise<MergeRequestDiff> => {
+    const response = await api.get<MergeRequestDiff>(`/merge-requests/${id}/diff`);
+    return response.data;
+  },
+
   approveMergeRequest: async (id: number): Promise<MergeRequest> => {
     const response = await api.put<MergeRequest>(`/merge-requests/${id}/approve`);
     return response.data;
@@ -155,8 +270,96 @@ export const mergeRequestService = {
     return response.data;
   },
 
+  // 批量审核，一个事务内完成；按提交顺序返回每条的结果
+  reviewMergeRequests: async (
+    novelId: number, items: MergeRequestReviewItem[]
+  ): Promise<MergeRequestReviewOutcome[]> => {
+    const response = await api.post<{ items: MergeRequestReviewOutcome[] }>(
+      `/novels/${novelId}/merge-requests/review`, { items }
+    );
+    return response.data.items;
+  },
+
   canSubmitChapter: async (chapterId: number): Promise<{ can_submit: boolean; reason?: string }> => {
     const response = await api.get<{ can_submit: boolean; reason?: string }>(`/chapters/${chapterId}/can-submit`);
     return response.data;
   },
+
+  // 列表页一次查询所有分支章节，按 chapter_id 返回
+  canSubmitChapters: async (
+    chapterIds: number[]
+  ): Promise<Record<number, { can_submit: boolean; reason?: string }>> => {
+    const response = await api.post<{ items: { chapter_id: number; can_submit: boolean; reason?: string }[] }>(
+      '/chapters/can-submit', { chapter_ids: chapterIds }
+    );
+    return Object.fromEntries(response.data.items.map(({ chapter_id, ...result }) => [chapter_id, result]));
+  },
+};
+
+const EVENT_TYPES: (NovelEventType | 'reset')[] = [
+  'merge_request.created', 'merge_request.approved', 'merge_request.rejected',
+  'chapter.created', 'chapter.imported', 'chapter.updated', 'chapter.forked', 'chapter.deleted',
+  'follow.changed', 'reset',
+];
+
+// Events Service
+export const eventService = {
+  // 订阅关注的小说（及自己的小说）的事件；novelIds 额外订阅未关注的小说。
+  // 收到 reset 时流已关闭并自动重连，onReset 里应重新拉取页面数据。返回关闭函数。
+  // EventSource 不能带请求头，URL 里只放短期的 stream token，每次（重新）连接都换一个新的。
+  subscribe: (
+    onEvent: (event: NovelEvent) => void,
+    onReset?: () => void,
+    novelIds: number[] = []
+  ): (() => void) => {
+    let source: EventSource | null = null;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const reconnect = (delay: number) => {
+      source?.close();
+      source = null;
+      if (!closed) timer = setTimeout(() => connect().catch(() => reconnect(3000)), delay);
+    };
+    const connect = async () => {
+      const { data } = await api.post<StreamToken>('/events/token');
+      if (closed) return;
+      const params = new URLSearchParams({ stream_token: data.stream_token });
+      if (novelIds.length) params.set('novels', novelIds.join(','));
+      const current = new EventSource(`${api.defaults.baseURL}/events?${params}`);
+      source = current;
+      EVENT_TYPES.forEach((type) => current.addEventListener(type, (message) => {
+        if (type === 'reset') {
+          onReset?.();
+          reconnect(0);
+        } else {
+          onEvent(JSON.parse((message as MessageEvent).data) as NovelEvent);
+        }
+      }));
+      // 浏览器自带的重连会沿用已过期的 token，改为自己换新 token 重连
+      current.onerror = () => reconnect(3000);
+    };
+
+    reconnect(0);
+    return () => {
+      closed = true;
+      clearTimeout(timer);
+      source?.close();
+    };
+  },
+};
+
+// Search Service
+export const searchService = {
+  search: async (q: string, params?: {
+    kind?: 'novel' | 'chapter';
+    novel_id?: number;
+    cursor?: string;
+    limit?: number;
+  }): Promise<Page<SearchResult>> => {
+    const response = await api.get<Page<SearchResult>>('/search', {
+      params: { q, ...params }
+    });
+    return response.data;
+  },
 };
@@ -13,8 +13,16 @@ export interface Novel {
   author_id: number;
   created_at: string;
   updated_at: string;
+  // 列表接口附带的统计（novel_stats）
+  chapter_count?: number;
+  fork_count?: number;
+  merged_count?: number;
+  pending_merge_requests?: number;
+  last_chapter_at?: string;
 }
 
+export type NovelSort = 'created_at' | 'chapter_count' | 'fork_count' | 'pending_merge_requests' | 'last_chapter_at';
+
 export interface Chapter {
   id: number;
   novel_id: number;
@@ -30,6 +38,47 @@ export interface Chapter {
   updated_at: string;
 }
 
+export interface ChapterTreeNode {
+  id: number;
+  title: string;
+  chapter_number: number;
+  parent_chapter_id: number | null;
+  branch_type: 'main' | 'fork' | 'merged';
+  author_id: number;
+  author_username: string;
+  created_at: string;
+  depth: number;
+  children: ChapterTreeNode[];
+}
+
+export interface ChapterTree {
+  roots: ChapterTreeNode[];
+  node_count: number;
+  truncated: boolean;
+}
+
+// GET /novels/{id}/path：按分支选择解析出的阅读顺序
+export interface ReadingPathChapter {
+  id: number;
+  title: string;
+  chapter_number: number;
+  parent_chapter_id: number | null;
+  branch_type: 'main' | 'fork' | 'merged';
+  author_id: number;
+  author_username: string;
+  updated_at: string;
+  prev_chapter_id: number | null;
+  next_chapter_id: number | null;
+  branch_count: number;
+}
+
+export interface ReadingPath {
+  novel_id: number;
+  choices: number[];
+  ignored_choices: number[];
+  chapters: ReadingPathChapter[];
+}
+
 export interface MergeRequest {
   id: number;
   from_chapter_id: number;
@@ -43,6 +92,152 @@ export interface MergeRequest {
   requester_username?: string;
 }
 
+export interface MergeRequestReviewItem {
+  id: number;
+  decision: 'approve' | 'reject';
+  review_comment?: string;
+}
+
+export interface MergeRequestReviewOutcome {
+  id: number;
+  outcome: 'approved' | 'rejected' | 'not_found' | 'not_pending' | 'conflict' | 'duplicate';
+  status: MergeRequest['status'] | null;
+}
+
+export interface DiffSegment {
+  op: 'equal' | 'insert' | 'delete';
+  text: string;
+}
+
+export interface ParagraphDiff {
+  op: 'equal' | 'insert' | 'delete' | 'change';
+  text?: string;
+  segments?: DiffSegment[];
+}
+
+export interface MergeRequestDiff {
+  merge_request_id: number;
+  base_chapter_id: number;
+  head_chapter_id: number;
+  stats: {
+    unchanged: number;
+    changed: number;
+    inserted: number;
+    deleted: number;
+    chars_inserted: number;
+    chars_deleted: number;
+  };
+  paragraphs: ParagraphDiff[];
+}
+
+export interface SearchResult {
+  kind: 'novel' | 'chapter';
+  id: number;
+  novel_id: number;
+  novel_title: string | null;
+  title: string;
+  chapter_number: number | null;
+  branch_type: 'main' | 'fork' | 'merged' | null;
+  snippet: string;
+  score: number;
+}
+
+export type ImportFormat = 'txt' | 'jsonl' | 'epub';
+
+export interface ImportChapterError {
+  position: number;
+  title: string;
+  error: string;
+}
+
+// POST /novels/{id}/import 返回的 NDJSON 事件
+export type ImportEvent =
+  | { event: 'progress'; imported: number; failed: number }
+  | {
+      event: 'done';
+      imported: number;
+      failed: number;
+      first_chapter_number: number | null;
+      last_chapter_number: number | null;
+      errors: ImportChapterError[];
+    }
+  | { event: 'error'; detail: string };
+
+// GET /novels/{id}/shares：创始人排第一，其余按股数倒序
+export interface Shareholder {
+  user_id: number;
+  username: string;
+  founder: boolean;
+  chapters: number | null;
+  shares: number;
+  equity: number;
+  payout: number | null;
+}
+
+export interface NovelShares {
+  novel_id: number;
+  total_shares: number;
+  awarded_shares: number;
+  pool_remaining: number;
+  pool_equity: number;
+  founder_floor: number;
+  holder_count: number;
+  payout: number | null;
+  holders: Shareholder[];
+}
+
+// POST /novels/{id}/votes 的结果；本月额度按自然月（UTC）计算
+export interface VoteResult {
+  novel_id: number;
+  tickets: number;
+  month: string;
+  novel_used: number;
+  monthly_used: number;
+  novel_remaining: number;
+  monthly_remaining: number;
+}
+
+export type LeaderboardBoard = 'monthly' | 'all_time';
+export type LeaderboardBracket = 'all' | 'new' | 'growing' | 'mature';
+
+export interface LeaderboardEntry {
+  rank: number;
+  novel_id: number;
+  title: string;
+  tickets: number;
+}
+
+export interface Leaderboard {
+  board: LeaderboardBoard;
+  month: string | null;
+  bracket: LeaderboardBracket;
+  generated_at: string | null;
+  items: LeaderboardEntry[];
+}
+
+// GET /events 推送的事件；reset 表示流已关闭，应重新拉取页面数据
+export type NovelEventType =
+  | 'merge_request.created' | 'merge_request.approved' | 'merge_request.rejected'
+  | 'chapter.created' | 'chapter.imported' | 'chapter.updated' | 'chapter.forked' | 'chapter.deleted'
+  | 'follow.changed';
+
+export interface StreamToken {
+  stream_token: string;
+  expires_in: number;
+}
+
+export interface NovelEvent {
+  type: NovelEventType;
+  novel_id: number | null;
+  data: Record<string, unknown>;
+  published_at: number;
+}
+
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
 export interface LoginRequest {
   username: string;
   password: string;